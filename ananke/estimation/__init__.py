@@ -1,2 +1,3 @@
 from .automated_if import AutomatedIF
 from .counterfactual_mean import CausalEffect
+from .multi_outcome import MultiOutcomeEffect
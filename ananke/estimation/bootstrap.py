@@ -0,0 +1,181 @@
+"""
+Utilities for running bootstrap replicates of effect estimates in parallel, either by resampling
+rows or by reweighting them.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from ananke.utils import map_columnar, mapped_file
+
+# state of a bootstrap worker process: the shared data, the function evaluated on each replicate,
+# and the scheme used to draw replicates
+_worker = {}
+
+# types of replicate weights that can be used in place of resampling
+WEIGHT_SCHEMES = ["multinomial", "bayesian", "poisson"]
+
+
+def replicate_seeds(n_bootstraps, random_state=None):
+    """
+    Derive one independent seed per bootstrap replicate from a master random state, so that
+    results do not depend on how replicates are distributed over workers.
+
+    :param n_bootstraps: number of bootstrap replicates.
+    :param random_state: integer seed. If None a seed is drawn from NumPy's global random state,
+                         so np.random.seed still makes results reproducible.
+    :return: list of numpy SeedSequence objects, one per replicate.
+    """
+
+    if random_state is None:
+        random_state = np.random.randint(np.iinfo(np.int32).max)
+    return np.random.SeedSequence(random_state).spawn(n_bootstraps)
+
+
+def resample(data, seed):
+    """
+    Draw a bootstrap resample of the rows of a data frame.
+
+    :param data: pandas data frame containing the data.
+    :param seed: seed for the replicate.
+    :return: pandas data frame with rows sampled with replacement and a fresh index.
+    """
+
+    indices = np.random.default_rng(seed).integers(0, len(data), len(data))
+    return data.iloc[indices].reset_index(drop=True)
+
+
+def replicate_weights(seeds, n, scheme="multinomial"):
+    """
+    Draw bootstrap replicate weights for a batch of replicates, as an alternative to resampling rows.
+
+    Multinomial weights count how often each row appears in the resample drawn from the same seed,
+    so they reproduce the resampling bootstrap exactly. Bayesian weights are exponential draws
+    rescaled to sum to n (the Bayesian bootstrap), and Poisson weights are independent Poisson(1) counts.
+
+    :param seeds: list of seeds, one per replicate.
+    :param n: number of samples in the data.
+    :param scheme: string specifying the type of weights: multinomial, bayesian, or poisson.
+    :return: numpy array of shape (number of seeds, n) with one row of weights per replicate.
+    """
+
+    if scheme not in WEIGHT_SCHEMES:
+        raise ValueError("Invalid choice of weighting scheme: {}".format(scheme))
+
+    weights = np.empty((len(seeds), n))
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        if scheme == "multinomial":
+            weights[i] = np.bincount(rng.integers(0, n, n), minlength=n)
+        elif scheme == "bayesian":
+            draws = rng.exponential(1.0, n)
+            weights[i] = n * draws / draws.sum()
+        else:
+            weights[i] = rng.poisson(1.0, n)
+    return weights
+
+
+def _evaluate_batch(function, data, seeds, scheme):
+    """
+    Evaluate a function on a batch of bootstrap replicates, holding at most one batch of weights in memory.
+    """
+
+    if scheme == "resample":
+        return [function(resample(data, seed)) for seed in seeds]
+    return [function(data, weights) for weights in replicate_weights(seeds, len(data), scheme)]
+
+
+def _init_worker(name, shape, columns, function, scheme, memmap=None, order=None):
+    """
+    Attach a worker process to the shared data once, rather than receiving a copy with every task.
+    Columns of a memory-mapped file are mapped from the file, and only the other columns are shared.
+    """
+
+    shm = shared_memory.SharedMemory(name=name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _worker["shm"] = shm
+    data = pd.DataFrame(values, columns=columns, copy=False)
+    if memmap is not None:
+        mapped = map_columnar(memmap)
+        for column in columns:
+            mapped[column] = data[column]
+        data = mapped[order]
+    _worker["data"] = data
+    _worker["function"] = function
+    _worker["scheme"] = scheme
+
+
+def _init_worker_pickled(data, function, scheme):
+    _worker["data"] = data
+    _worker["function"] = function
+    _worker["scheme"] = scheme
+
+
+def _run_batch(seeds):
+    return _evaluate_batch(_worker["function"], _worker["data"], seeds, _worker["scheme"])
+
+
+def run_bootstrap(function, data, n_bootstraps, random_state=None, n_jobs=1, backend="process", scheme="resample",
+                  batch_size=32):
+    """
+    Evaluate a function on bootstrap replicates of the data.
+
+    Replicates are either resamples of the rows (scheme resample), or the original data together with a
+    vector of replicate weights (see replicate_weights), in which case the data is never copied.
+    Replicates are run in batches so that at most batch_size rows of weights are held in memory per worker.
+
+    With the process backend numeric data is placed in shared memory once and every worker
+    attaches to it, so only the replicate seeds are sent with each task. Columns that view a memory-mapped
+    file (see ananke.utils.as_columnar) are not copied at all, as every worker maps the same file.
+
+    :param function: picklable function that takes a data frame and returns the estimate for that replicate.
+                     For weight schemes it is called as function(data, weights).
+    :param data: pandas data frame containing the data.
+    :param n_bootstraps: number of bootstrap replicates.
+    :param random_state: integer master seed from which the seed of each replicate is derived.
+    :param n_jobs: number of workers, replicates are run in the calling process if 1.
+    :param backend: string specifying the type of worker pool: process or thread.
+    :param scheme: string specifying how replicates are drawn: resample, multinomial, bayesian, or poisson.
+    :param batch_size: number of replicates evaluated per task.
+    :return: list of estimates, in replicate order.
+    """
+
+    if backend not in ["process", "thread"]:
+        raise ValueError("Invalid choice of backend: {}".format(backend))
+    if scheme != "resample" and scheme not in WEIGHT_SCHEMES:
+        raise ValueError("Invalid choice of bootstrap scheme: {}".format(scheme))
+
+    seeds = replicate_seeds(n_bootstraps, random_state)
+    batches = [seeds[i:i + batch_size] for i in range(0, n_bootstraps, batch_size)]
+
+    if n_jobs == 1:
+        return [estimate for batch in batches for estimate in _evaluate_batch(function, data, batch, scheme)]
+
+    if backend == "thread":
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            results = executor.map(lambda batch: _evaluate_batch(function, data, batch, scheme), batches)
+            return [estimate for batch in results for estimate in batch]
+
+    # non-numeric data cannot be viewed as a single shared array, so send it once per worker instead
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in data.dtypes):
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker_pickled,
+                                 initargs=(data, function, scheme)) as executor:
+            return [estimate for batch in executor.map(_run_batch, batches) for estimate in batch]
+
+    # workers map columns of a memory-mapped file themselves, so only the remaining columns are shared
+    memmap = mapped_file(data)
+    shared = data.drop(columns=memmap["columns"]) if memmap is not None else data
+    values = shared.to_numpy(dtype=np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    try:
+        np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(shm.name, values.shape, list(shared.columns), function, scheme,
+                                           memmap, list(data.columns))) as executor:
+            return [estimate for batch in executor.map(_run_batch, batches) for estimate in batch]
+    finally:
+        shm.close()
+        shm.unlink()
@@ -3,10 +3,116 @@ Class that provides an interface to estimation strategies for the counterfactual
 """
 
 import numpy as np
+import pandas as pd
 from scipy.stats import norm
-import statsmodels.api as sm
 from ananke.identification import OneLineID
+from ananke.utils import as_columnar
+from .bootstrap import run_bootstrap
+from .fitted import FittedNuisance, RecordedStrategy
+from .glm import DesignCache, fit_glm
+from .learners import LEARNERS, LearnerStrategy
+from .nuisance import IsolatedReplicate, NuisanceCache
+from .plan import EstimationPlan, PlannedStrategy
+from .streaming import StreamingGLM, chunk_reader, fit_streaming, stream_state_spaces
+from .workspace import Workspace
+from .projection import ProjectionEngine
 import copy
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def _weighted_std(values, weights=None):
+    """
+    Standard deviation of a vector under optional frequency weights.
+
+    :param values: numpy array or pandas series of values.
+    :param weights: optional numpy array of frequency weights for each value.
+    :return: float corresponding to the (population) standard deviation.
+    """
+
+    mean = np.average(values, weights=weights)
+    return np.sqrt(np.average((values - mean) ** 2, weights=weights))
+
+
+def _wald_interval(estimate, influence_function, alpha=0.05):
+    """
+    Wald interval for an estimate from its estimated influence function.
+
+    :param estimate: float corresponding to the estimate, e.g. the ACE or the log of the odds ratio.
+    :param influence_function: numpy array of the (mean zero) influence function of the estimate for each sample.
+    :param alpha: the significance level with the default value of 0.05.
+    :return: three floats corresponding to the lower bound, upper bound, and standard error.
+    """
+
+    standard_error = np.sqrt(np.mean(influence_function ** 2) / len(influence_function))
+    z = norm.ppf(1 - alpha/2)
+    return estimate - z*standard_error, estimate + z*standard_error, standard_error
+
+
+def _combine_weights(weights, other):
+    """
+    Multiply optional frequency weights into another set of weights.
+
+    :param weights: numpy array of frequency weights or None.
+    :param other: numpy array of weights.
+    :return: numpy array of the product of weights.
+    """
+
+    if weights is None:
+        return other
+    return weights * other
+
+
+STATE_SPACES = ["binary", "categorical", "continuous"]
+
+
+def detect_state_spaces(data, columns, max_categories=10):
+    """
+    Detect the state space of columns of a data frame in a single vectorized pass: binary if every value is 0 or 1,
+    categorical if the column is not numeric or takes at most max_categories distinct values, else continuous.
+
+    :param data: pandas data frame containing the data.
+    :param columns: list of names of columns.
+    :param max_categories: maximum number of distinct values of a numeric categorical variable.
+    :return: dictionary mapping the names of columns to their state space.
+    """
+
+    numeric = [c for c in columns if pd.api.types.is_numeric_dtype(data[c])]
+    state_spaces = {c: "categorical" for c in columns if c not in numeric}
+    if len(numeric) == 0:
+        return state_spaces
+
+    X = data[numeric].to_numpy(dtype=float)
+    binary = ((X == 0) | (X == 1)).all(axis=0)
+
+    # count distinct values of the remaining columns from their sorted values
+    X = np.sort(X[:, ~binary], axis=0)
+    distinct = iter(1 + (np.diff(X, axis=0) != 0).sum(axis=0))
+    for c, is_binary in zip(numeric, binary):
+        if is_binary:
+            state_spaces[c] = "binary"
+        else:
+            state_spaces[c] = "categorical" if next(distinct) <= max_categories else "continuous"
+    return state_spaces
+
+
+def crossfit_folds(n, n_folds, random_state=None):
+    """
+    Randomly assign samples to folds of (nearly) equal size for cross-fitting.
+
+    :param n: number of samples.
+    :param n_folds: number of folds.
+    :param random_state: integer seed for the assignment.
+    :return: numpy array with the fold (0 to n_folds - 1) of each sample.
+    """
+
+    if n_folds < 2 or n_folds > n:
+        raise ValueError("Cross-fitting requires between 2 and {} folds, got {}".format(n, n_folds))
+    return np.random.default_rng(random_state).permutation(n) % n_folds
 
 
 class CausalEffect:
@@ -14,20 +120,39 @@ class CausalEffect:
     Provides an interface to various estimation strategies for the ACE: E[Y(1) - Y(0)].
     """
 
-    def __init__(self, graph, treatment, outcome):
+    def __init__(self, graph, treatment, outcome, variable_types=None, shared=None):
         """
         Constructor.
 
         :param graph: ADMG corresponding to substantive knowledge/model.
         :param treatment: name of vertex corresponding to the treatment.
         :param outcome: name of vertex corresponding to the outcome.
+        :param variable_types: optional dictionary mapping names of vertices to their state space: binary,
+                               categorical, or continuous. The state space of other vertices is detected from the data.
+        :param shared: optional CausalEffect for the same graph, treatment, and variable types (e.g. for another
+                       outcome) whose graph analysis, modeling strategies, and fitted nuisance models are shared
+                       rather than recomputed.
         """
 
-        self.graph = copy.deepcopy(graph)
+        variable_types = dict(variable_types) if variable_types else {}
+        invalid = {V: t for V, t in variable_types.items() if t not in STATE_SPACES}
+        if len(invalid) != 0:
+            raise ValueError("Invalid variable types {}, use one of {}".format(invalid, STATE_SPACES))
+        if shared is not None and (shared.treatment != treatment or shared.variable_types != variable_types):
+            raise ValueError("Shared effects must have the same treatment and variable types")
+        self.variable_types = variable_types
+
+        self._shared = shared
+        self.graph = shared.graph if shared is not None else copy.deepcopy(graph)
         self.treatment = treatment
         self.outcome = outcome
-        self.strategy = None
-        self.is_mb_shielded = self.graph.mb_shielded()
+
+        # identification and graph analyses are computed on first use, see the properties below
+        self._strategy = None
+        self._is_mb_shielded = None
+        self._one_id = None
+        self._p_order = None
+        self._n_order = None
 
         # a dictionary of names for available estimators
         self.estimators = {"ipw": self._ipw,
@@ -41,61 +166,166 @@ class CausalEffect:
                            "n-ipw": self._nested_ipw,
                            "anipw": self._augmented_nested_ipw}
 
-        # a dictionary of names for available modeling strategies
+        # estimators whose per-sample terms are influence functions (up to centering) when the propensity
+        # and outcome models are correct, which give analytic standard errors without bootstrapping.
+        # The primal estimators are excluded: the terms of apipw leave out the variability of the estimated
+        # primal and dual weights, and those of eff-aipw and eff-apipw are only influence functions if every
+        # linear projection of the pseudo-outcomes is correctly specified, so their standard errors can be
+        # several times smaller than the bootstrap ones
+        self.if_estimators = ["aipw", "anipw"]
+
+        # estimators that can be cross-fit, by fitting their nuisance models on the other folds of the data
+        self.crossfit_estimators = ["aipw", "apipw", "anipw"]
+
+        # a dictionary of names for available modeling strategies, the names of registered learners
+        # (see ananke.estimation.learners) can be used as well
         self.models = {"glm-binary": self._fit_binary_glm,
                        "glm-continuous": self._fit_continuous_glm}
 
-        # check if the query is ID
-        self.one_id = OneLineID(graph, [treatment], [outcome])
-
-        # check the fixability criteria for the treatment
-        if len(self.graph.district(treatment).intersection(self.graph.descendants([treatment]))) == 1:
-            self.strategy = "a-fixable"
-            if self.is_mb_shielded:
-                print("\n Treatment is a-fixable and graph is mb-shielded. \n\n Available estimators are:\n \n" +
-                      "1. IPW (ipw)\n" +
-                      "2. Outcome regression (gformula)\n" +
-                      "3. Generalized AIPW (aipw)\n" +
-                      "4. Efficient Generalized AIPW (eff-aipw) \n \n" +
-                      "Suggested estimator is Efficient Generalized AIPW \n")
-            else:
-                print("\n Treatment is a-fixable.\n\n Available estimators are :\n \n" +
-                      "1. IPW (ipw)\n" +
-                      "2. Outcome regression (gformula)\n" +
-                      "3. Generalized AIPW (aipw)\n \n" +
-                      "Suggested estimator is Generalized AIPW \n")
-
-        elif len(self.graph.district(treatment).intersection(self.graph.children([treatment]))) == 0:
-            self.strategy = "p-fixable"
-            if self.is_mb_shielded:
-                print("\n Treatment is p-fixable and graph is mb-shielded. \n\n Available estimators are:\n\n" +
-                      "1. Primal IPW (p-ipw)\n" +
-                      "2. Dual IPW (d-ipw)\n" +
-                      "3. APIPW (apipw)\n" +
-                      "4. Efficient APIPW (eff-apipw) \n \n" +
-                      "Suggested estimator is Efficient APIPW \n")
-            else:
-                print("\n Treatment is p-fixable. \n\n Available estimators are:\n \n" +
-                      "1. Primal IPW (p-ipw)\n" +
-                      "2. Dual IPW (d-ipw)\n" +
-                      "3. APIPW (apipw) \n\n" +
-                      "Suggested estimator is APIPW \n")
+        # fitted nuisance models shared across estimators and calls on the same data
+        self.nuisance_cache = NuisanceCache()
+
+        # design matrices shared by the default modeling strategies
+        self._designs = DesignCache()
+
+        # the fits of a shared effect are only found in its cache if they are made with its strategies
+        if shared is not None:
+            self.models = shared.models
+            self.nuisance_cache = shared.nuisance_cache
+            self._designs = shared._designs
+
+        # whether projections of pseudo-outcomes are linear regressions that can share a Gram matrix
+        self._linear_projections = True
+
+        # graph analysis, intrinsic kernel fixing sequences, and estimation plans, compiled on first use
+        self._analysis = None
+        self._kernels = shared._kernels if shared is not None else {}
+        self._plans = {}
+
+        # maps from variable names to state space of the variable (binary/categorical/continuous)
+        self.state_space_map_ = {}
+        self.fitted_ = None  # nuisance models of the estimator fit by fit, see evaluate
 
+    @property
+    def is_mb_shielded(self):
+        """
+        Whether the graph is mb-shielded, in which case the efficient estimators are available.
+        """
+
+        if self._is_mb_shielded is None:
+            self._is_mb_shielded = self._shared.is_mb_shielded if self._shared is not None else self.graph.mb_shielded()
+        return self._is_mb_shielded
+
+    @is_mb_shielded.setter
+    def is_mb_shielded(self, is_mb_shielded):
+        self._is_mb_shielded = is_mb_shielded
+        self._analysis = None
+        self._plans = {}
+
+    @property
+    def one_id(self):
+        """
+        One line ID query for the effect of the treatment on the outcome.
+        """
+
+        if self._one_id is None:
+            self._one_id = OneLineID(self.graph, [self.treatment], [self.outcome])
+        return self._one_id
+
+    @one_id.setter
+    def one_id(self, one_id):
+        self._one_id = one_id
+        self._analysis = None
+        self._plans = {}
+
+    @property
+    def strategy(self):
+        """
+        Identification strategy for the effect: a-fixable, p-fixable, nested-fixable, or Not ID.
+        """
+
+        if self._strategy is not None:
+            return self._strategy
+
+        # check the fixability criteria for the treatment, and only run the ID algorithm if neither holds
+        district_T = self.graph.district(self.treatment)
+        if len(district_T.intersection(self.graph.descendants([self.treatment]))) == 1:
+            self._strategy = "a-fixable"
+        elif len(district_T.intersection(self.graph.children([self.treatment]))) == 0:
+            self._strategy = "p-fixable"
         elif self.one_id.id():
-            self.strategy = "nested-fixable"
-            print("\n Effect is identified. \n \n Available estimators:\n \n" +
-                  "1. Nested IPW (n-ipw)\n" +
-                  "2. Augmented NIPW (anipw) \n\n" +
-                  "Suggested estimator is Augmented NIPW \n")
+            self._strategy = "nested-fixable"
+        else:
+            self._strategy = "Not ID"
 
+        if self._strategy == "Not ID":
+            logger.warning("Effect of %s on %s is not identified", self.treatment, self.outcome)
         else:
-            self.strategy = "Not ID"
-            print("Effect is not identified! \n")
+            logger.debug("Effect of %s on %s is identified, treatment is %s", self.treatment, self.outcome,
+                         self._strategy)
+        return self._strategy
+
+    @strategy.setter
+    def strategy(self, strategy):
+        self._strategy = strategy
+        self._analysis = None
+        self._plans = {}
+
+    @property
+    def available_estimators(self):
+        """
+        Names of the estimators that return valid estimates under the identification strategy, ending with
+        the suggested estimator. The efficient estimators are only available if the graph is mb-shielded.
+        """
+
+        if self.strategy == "a-fixable":
+            return ["ipw", "gformula", "aipw"] + (["eff-aipw"] if self.is_mb_shielded else [])
+        if self.strategy == "p-fixable":
+            return ["p-ipw", "d-ipw", "apipw"] + (["eff-apipw"] if self.is_mb_shielded else [])
+        if self.strategy == "nested-fixable":
+            return ["n-ipw", "anipw"]
+        return []
+
+    @property
+    def suggested_estimator(self):
+        """
+        Name of the suggested estimator under the identification strategy, None if the effect is not identified.
+        """
+
+        available = self.available_estimators
+        return available[-1] if len(available) != 0 else None
+
+    @property
+    def p_order(self):
+        """
+        Valid topological order used for a-fixable/p-fixable strategies, which does not depend on the outcome.
+        """
+
+        if self._p_order is None:
+            self._p_order = self._shared.p_order if self._shared is not None else self._find_valid_order("p-fixable")
+        return self._p_order
+
+    @p_order.setter
+    def p_order(self, order):
+        self._p_order = order
+        self._analysis = None
+        self._plans = {}
+
+    @property
+    def n_order(self):
+        """
+        Valid topological order used for nested-fixable strategies.
+        """
+
+        if self._n_order is None:
+            self._n_order = self._find_valid_order("nested-fixable")
+        return self._n_order
 
-        # finally, fix a valid topological order for estimation queries
-        self.p_order = self._find_valid_order("p-fixable") # used for a-fixable/p-fixable strategies
-        self.n_order = self._find_valid_order("nested-fixable") # used for nested-fixable strategies
-        self.state_space_map_ = {}  # maps from variable names to state space of the variable (binary/continuous)
+    @n_order.setter
+    def n_order(self, order):
+        self._n_order = order
+        self._analysis = None
+        self._plans = {}
 
     def _find_valid_order(self, order_type):
         """
@@ -125,6 +355,118 @@ class CausalEffect:
 
         return order
 
+    def _analyze_graph(self):
+        """
+        Compile the graph analysis that the estimators need, e.g. Markov pillows and the partition of
+        the vertices around the treatment, once rather than in every call to an estimator.
+
+        :return: dictionary of the compiled quantities.
+        """
+
+        if self._analysis is not None:
+            return self._analysis
+
+        vertices = self.graph.vertices
+        district_T = self.graph.district(self.treatment)
+
+        # the partition of the vertices around the treatment does not depend on the outcome
+        if self._shared is not None:
+            analysis = dict(self._shared._analyze_graph())
+        else:
+            mp = {V: self.graph.markov_pillow([V], self.p_order) for V in vertices}
+
+            # C := pre-treatment vars
+            # L := post-treatment vars in the district of T
+            # M := post treatment vars not in L (a.k.a. the rest)
+            C = self.graph.pre([self.treatment], self.p_order)
+            post = set(vertices).difference(C)
+            L = post.intersection(district_T)
+
+            analysis = {"mp": mp,
+                        "pre": {V: self.graph.pre([V], self.p_order) for V in vertices},
+                        "C": C,
+                        "post": post,
+                        "L": L,
+                        "M": post - L,
+                        # the inverse Markov pillow of the treatment outside its district, used by the dual
+                        "M_dual": set([m for m in vertices if self.treatment in mp[m]]).difference(district_T)}
+
+        analysis["mp_nested"] = {V: self.graph.markov_pillow([V], self.n_order) for V in vertices}
+        # districts of G(Y*) that intersect with the district of T, used by nested estimators
+        analysis["districts"] = [district for district in self.one_id.Gystar.districts
+                                 if len(district.intersection(district_T)) != 0]
+        self._analysis = analysis
+        return self._analysis
+
+    def _compile_kernel(self, district):
+        """
+        Compile the regressions needed to estimate an intrinsic kernel q_D(D|pa(D)), in the order they are fit.
+
+        :param district: set of vertices corresponding to an intrinsic district.
+        :return: dictionary with lists of (vertex, formula) for the fixing steps, the parents of the district,
+                 and the district itself.
+        """
+
+        # the formulas depend on the nested order, which differs between outcomes that share the cache
+        key = (frozenset(district), tuple(self.n_order))
+        if key in self._kernels:
+            return self._kernels[key]
+
+        fixes = []
+
+        # get parents of the district
+        parents = self.graph.parents(district) - district
+        # initialize with ancestral margin as fixing descendants are just sums
+        G = self.graph.subgraph(self.graph.ancestors(district))
+
+        # we know D is intrinsic because of prior checks
+        remaining_vertices = set(G.vertices) - district - parents  # is subtracting parents here ok? think so..
+
+        while not G.fixable(parents)[0]:
+
+            fixed = False
+
+            # at every step try to simplify as much as possible by fixing
+            # childless vertices as these correspond to just sums
+            # also find a backup fixable vertex in case there are no childless ones
+            iter_gen = iter(remaining_vertices)
+            i = 0
+
+            while not fixed and i < len(remaining_vertices):
+                i += 1
+                V = next(iter_gen)
+                if len(G.children([V])) == 0:
+                    G.fix([V])
+                    fixed = True
+                    remaining_vertices.remove(V)
+                elif G.fixable([V])[0]:
+                    fixable_V = V
+
+            # if we fixed something go back and see if we can fix another childless vertex
+            # or if the requirement that parents are fixable is satisfied
+            if fixed:
+                continue
+
+            # otherwise do a true fix corresponding to reweighting
+            # using the fixable V that we found
+            V = fixable_V
+            mb_V = G.markov_blanket([V])
+            fixes.append((V, V + " ~ " + '+'.join(mb_V)))
+            G.fix([V])
+            remaining_vertices.remove(V)
+
+        # get the Markov blanket of the parents in this final graph
+        mb_parents = G.markov_blanket(parents)
+
+        # formulas for the weights required to fix each parent, and for the final kernel
+        pillows = [(V, mb_parents.intersection(self.graph.pre([V], self.n_order))) for V in parents]
+        pillows += [(V, parents.union(district.intersection(self.graph.pre(V, self.n_order)))) for V in district]
+        formulas = [(V, V + " ~ " + '+'.join(mp_V) if len(mp_V) != 0 else V + " ~ -1 + 1") for V, mp_V in pillows]
+
+        self._kernels[key] = {"fixes": fixes, "parents": formulas[:len(parents)],
+                              "district": formulas[len(parents):]}
+        return self._kernels[key]
+
     def _fit_binary_glm(self, data, formula, weights=None):
         """
         Fit a binary GLM to data given a formula.
@@ -134,7 +476,7 @@ class CausalEffect:
         :return: the fitted model.
         """
 
-        return sm.GLM.from_formula(formula, data=data, family=sm.families.Binomial(), freq_weights=weights).fit()
+        return fit_glm(data, formula, "binomial", weights, self._designs, self._discrete())
 
     def _fit_continuous_glm(self, data, formula, weights=None):
         """
@@ -145,17 +487,148 @@ class CausalEffect:
         :return: the fitted model.
         """
 
-        return sm.GLM.from_formula(formula, data=data, family=sm.families.Gaussian(), freq_weights=weights).fit()
+        return fit_glm(data, formula, "gaussian", weights, self._designs, self._discrete())
+
+    def _discrete(self):
+        """
+        Get the variables whose nuisance models can be fit on unique covariate patterns.
+
+        :return: set of names of binary and categorical variables.
+        """
+
+        return {V for V, state_space in self.state_space_map_.items() if state_space in ["binary", "categorical"]}
+
+    def _formula(self, response, covariates):
+        """
+        Build the formula for a regression, so that identical regressions requested by different estimators
+        are spelled identically and can share a fit.
+
+        :param response: name of the response variable.
+        :param covariates: iterable of names of covariates.
+        :return: string encoding an R-style formula e.g: Y ~ X1+X2.
+        """
+
+        return response + " ~ " + '+'.join(covariates)
+
+    def _modeling_strategy(self, model, state_space):
+        """
+        Get the modeling strategy for binary or continuous variables.
+
+        :param model: None for the default GLM, the name of a modeling strategy in models or of a registered
+                      learner, a learner object with fit and predict methods, or a function that fits a model
+                      given data, a formula, and weights.
+        :param state_space: string specifying the type of variables: binary or continuous.
+        :return: function that fits a model given data, a formula, and weights.
+        """
 
-    def _ipw(self, data, assignment, model_binary=None, model_continuous=None):
+        if not model:
+            return self.models["glm-" + state_space]
+        if isinstance(model, str):
+            if model in self.models:
+                return self.models[model]
+            if model in LEARNERS:
+                return LearnerStrategy(model, state_space, self._designs)
+            raise ValueError("Invalid choice of modeling strategy: {}, use one of {}".format(
+                model, sorted(self.models) + sorted(LEARNERS)))
+        if hasattr(model, "fit") and hasattr(model, "predict"):
+            return LearnerStrategy(model, state_space, self._designs)
+        return model
+
+    def _predict_assigned(self, model, data):
         """
-        IPW estimator for the counterfactual mean E[Y(t)].
+        Predict from a fitted model with the treatment set to T=1 and T=0, without copying the data.
+
+        :param model: fitted model with a predict method.
+        :param data: pandas data frame containing the data.
+        :return: dictionary mapping each treatment assignment (1 and 0) to a numpy array of predictions.
+        """
+
+        # the default GLMs shift their linear predictor by the coefficient of the treatment, and learners
+        # predict both assignments in one batch
+        if hasattr(model, "predict_assigned"):
+            return model.predict_assigned(data, self.treatment, [1, 0])
+
+        # other models predict from shallow copies that share every column but the treatment
+        predictions = {}
+        for assignment in [1, 0]:
+            assigned = data.copy(deep=False)
+            assigned[self.treatment] = np.full(len(data), assignment, dtype=data[self.treatment].dtype)
+            predictions[assignment] = np.asarray(model.predict(assigned))
+        return predictions
+
+    def _statistic(self, model, name, compute):
+        """
+        Compute a statistic of the data that an estimator uses besides its models, e.g. a marginal probability or
+        a residual standard deviation. Recorded modeling strategies (see fit) keep the statistic with the fitted
+        models, or return the kept statistic when the fitted estimator is evaluated on new data.
+
+        :param model: modeling strategy passed to the estimator.
+        :param name: name of the statistic, e.g. P(T).
+        :param compute: function of no arguments that computes the statistic from the data.
+        :return: value of the statistic.
+        """
+
+        if isinstance(model, RecordedStrategy):
+            return model.statistic(name, compute)
+        return compute()
+
+    def _projections(self, data, responses, requests, model_continuous, weights=None):
+        """
+        Compute the projections E[beta | S] and E[beta | S, V] of pseudo-outcomes beta used by the efficient
+        and augmented primal estimators. With the default linear modeling strategy all projections share one
+        weighted Gram matrix, otherwise each projection is fit with the continuous modeling strategy. Recorded
+        strategies (see fit) also fit each projection, so the projections can be replayed on new data.
+
+        :param data: pandas data frame containing the data.
+        :param responses: dictionary mapping names of pseudo-outcomes to numpy arrays.
+        :param requests: list of tuples (name of pseudo-outcome, covariates S, additional covariate V or None).
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: list with, for each request, a tuple of numpy arrays E[beta | S] and E[beta | S, V]
+                 (None if V is None). E[beta | S] is the weighted average of beta if S is empty.
+        """
+
+        columns = [V for V in self.graph.vertices if pd.api.types.is_numeric_dtype(data[V])]
+        recorded = isinstance(model_continuous, RecordedStrategy)
+        if self._linear_projections and not recorded and len(columns) == len(self.graph.vertices):
+            engine = ProjectionEngine(data, columns, responses, weights)
+            results = []
+            for name, covariates, extra in requests:
+                if extra is None:
+                    results.append((engine.project(name, covariates), None))
+                else:
+                    results.append(engine.project(name, covariates, extra))
+            return results
+
+        # add the pseudo-outcomes as scratch columns of a workspace that shares the other columns of the data
+        workspace = Workspace(data)
+        for name, values in responses.items():
+            workspace.add(name, values)
+        data = workspace.frame
+        results = []
+        for name, covariates, extra in requests:
+            if len(covariates) != 0:
+                pred_S = np.asarray(model_continuous(data, self._formula(name, covariates), weights).predict(data))
+            else:
+                pred_S = np.ones(len(data)) * self._statistic(model_continuous, "E[" + name + "]",
+                                                              lambda: np.average(responses[name], weights=weights))
+            pred_SV = None
+            if extra is not None:
+                formula = self._formula(name, list(covariates) + [extra])
+                pred_SV = np.asarray(model_continuous(data, formula, weights).predict(data))
+            results.append((pred_S, pred_SV))
+        return results
+
+    def _ipw(self, data, model_binary=None, model_continuous=None, weights=None):
+        """
+        IPW estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for propensity score: e.g. glm-binary.
         :param model_continuous: this argument is ignored for IPW.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         # pedantic checks to make sure the method returns valid estimates
@@ -164,66 +637,65 @@ class CausalEffect:
 
         # extract outcome from data frame and compute Markov pillow of treatment
         Y = data[self.outcome]
-        mp_T = self.graph.markov_pillow([self.treatment], self.p_order)
+        mp_T = self._analyze_graph()["mp"][self.treatment]
 
         if len(mp_T) != 0:
             # fit T | mp(T) and compute probability of treatment for each sample
-            formula = self.treatment + " ~ " + '+'.join(mp_T) # + "+ ones"
-            model = model_binary(data, formula)
+            formula = self._formula(self.treatment, mp_T) # + "+ ones"
+            model = model_binary(data, formula, weights)
             prob_T = model.predict(data)
         else:
-            prob_T = np.ones(len(data)) * np.mean(data[self.treatment])
+            prob_T = np.ones(len(data)) * self._statistic(model_binary, "P(" + self.treatment + ")",
+                                                          lambda: np.average(data[self.treatment], weights=weights))
 
         indices_T0 = data.index[data[self.treatment] == 0]
         prob_T[indices_T0] = 1 - prob_T[indices_T0]
 
-        # compute IPW estimate
-        indices = data[self.treatment] == assignment
-        return np.mean((indices / prob_T) * Y)
+        # compute IPW terms for each assignment from the same propensity score
+        return {assignment: ((data[self.treatment] == assignment) / prob_T) * Y for assignment in [1, 0]}
 
-    def _gformula(self, data, assignment, model_binary=None, model_continuous=None):
+    def _gformula(self, data, model_binary=None, model_continuous=None, weights=None):
         """
-        Outcome regression estimator for the counterfactual mean E[Y(t)].
+        Outcome regression estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for outcome regression: e.g. glm-continuous.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         # pedantic checks to make sure the method returns valid estimates
         if self.strategy != "a-fixable":
             raise RuntimeError("g-formula will not return valid estimates as treatment is not a-fixable")
 
-        # create a dataset where T=t
-        data_assign = data.copy()
-        data_assign[self.treatment] = assignment
-
-        # fit Y | T=t, mp(T)
-        mp_T = self.graph.markov_pillow([self.treatment], self.p_order)
+        # fit Y | T, mp(T)
+        mp_T = self._analyze_graph()["mp"][self.treatment]
         if len(mp_T) != 0:
-            formula = self.outcome + " ~ " + self.treatment + '+' + '+'.join(mp_T)
+            formula = self._formula(self.outcome, [self.treatment] + list(mp_T))
             # predict outcome appropriately depending on binary vs continuous
         else:
-            formula = self.outcome + " ~ " + self.treatment
+            formula = self._formula(self.outcome, [self.treatment])
 
         if self.state_space_map_[self.outcome] == "binary":
-            model = model_binary(data, formula)
+            model = model_binary(data, formula, weights)
         else:
-            model = model_continuous(data, formula)
+            model = model_continuous(data, formula, weights)
 
-        return np.mean(model.predict(data_assign))
+        # predict outcomes under T=1 and T=0
+        return self._predict_assigned(model, data)
 
-    def _aipw(self, data, assignment, model_binary=None, model_continuous=None):
+    def _aipw(self, data, model_binary=None, model_continuous=None, weights=None):
         """
-        Augmented IPW estimator for the counterfactual mean E[Y(t)].
+        Augmented IPW estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         # pedantic checks to make sure the method returns valid estimates
@@ -232,43 +704,46 @@ class CausalEffect:
 
         # extract the outcome and get Markov pillow of the treatment
         Y = data[self.outcome]
-        mp_T = self.graph.markov_pillow([self.treatment], self.p_order)
+        mp_T = self._analyze_graph()["mp"][self.treatment]
 
         if len(mp_T) != 0:
             # fit T | mp(T) and predict treatment probabilities
-            formula_T = self.treatment + " ~ " + '+'.join(mp_T) #+ "+ ones"
-            model = model_binary(data, formula_T)
+            formula_T = self._formula(self.treatment, mp_T) #+ "+ ones"
+            model = model_binary(data, formula_T, weights)
             prob_T = model.predict(data)
-            formula_Y = self.outcome + " ~ " + self.treatment + '+' + '+'.join(mp_T)
+            formula_Y = self._formula(self.outcome, [self.treatment] + list(mp_T))
         else:
-            prob_T = np.ones(len(data)) * np.mean(data[self.treatment])
-            formula_Y = self.outcome + " ~ " + self.treatment
+            prob_T = np.ones(len(data)) * self._statistic(model_binary, "P(" + self.treatment + ")",
+                                                          lambda: np.average(data[self.treatment], weights=weights))
+            formula_Y = self._formula(self.outcome, [self.treatment])
 
         indices_T0 = data.index[data[self.treatment] == 0]
         prob_T[indices_T0] = 1 - prob_T[indices_T0]
-        indices = data[self.treatment] == assignment
 
-        # fit Y | T=t, mp(T) and predict outcomes under assignment T=t
-        data_assign = data.copy()
-        data_assign[self.treatment] = assignment
+        # fit Y | T, mp(T) and predict outcomes under T=1 and T=0
         if self.state_space_map_[self.outcome] == "binary":
-            model = model_binary(data, formula_Y)
+            model = model_binary(data, formula_Y, weights)
         else:
-            model = model_continuous(data, formula_Y)
-        Yhat_vec = model.predict(data_assign)
+            model = model_continuous(data, formula_Y, weights)
+        Yhat = self._predict_assigned(model, data)
 
-        # return AIPW estimate
-        return np.mean((indices / prob_T) * (Y - Yhat_vec) + Yhat_vec)
+        # return per-sample terms of the AIPW estimate for each assignment
+        terms = {}
+        for assignment in [1, 0]:
+            indices = data[self.treatment] == assignment
+            terms[assignment] = (indices / prob_T) * (Y - Yhat[assignment]) + Yhat[assignment]
+        return terms
 
-    def _eff_augmented_ipw(self, data, assignment, model_binary=None, model_continuous=None):
+    def _eff_augmented_ipw(self, data, model_binary=None, model_continuous=None, weights=None):
         """
-        Efficient augmented IPW estimator for the counterfactual mean E[Y(t)].
+        Efficient augmented IPW estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         # pedantic checks to make sure the method returns valid estimates
@@ -279,138 +754,119 @@ class CausalEffect:
 
         # extract the outcome and get Markov pillow of treatment
         Y = data[self.outcome]
-        mp_T = self.graph.markov_pillow([self.treatment], self.p_order)
+        mp_T = self._analyze_graph()["mp"][self.treatment]
 
         # fit T | mp(T) and compute treatment probabilities
         if len(mp_T) != 0:
-            formula = self.treatment + " ~ " + '+'.join(mp_T) #+ "+ ones"
-            model = model_binary(data, formula)
+            formula = self._formula(self.treatment, mp_T) #+ "+ ones"
+            model = model_binary(data, formula, weights)
             prob_T = model.predict(data)
         else:
-            prob_T = np.ones(len(data)) * np.mean(data[self.treatment])
+            prob_T = np.ones(len(data)) * self._statistic(model_binary, "P(" + self.treatment + ")",
+                                                          lambda: np.average(data[self.treatment], weights=weights))
 
         indices_T0 = data.index[data[self.treatment] == 0]
         prob_T[indices_T0] = 1 - prob_T[indices_T0]
-        indices = data[self.treatment] == assignment
-
-        # compute the primal estimates that we use to compute projections
-        primal = (indices / prob_T) * Y
-        data["primal"] = primal
-        eif_vec = 0
 
         # get the variables that are actually involved in the efficient influence function
         # TODO: prune extra variables
         eif_vars = [V for V in self.graph.vertices]
         eif_vars.remove(self.treatment)
 
-        # iterate over variables
-        for V in eif_vars:
-
-            # get the Markov pillow of the variable
-            mpV = self.graph.markov_pillow([V], self.p_order)
+        # compute the primal estimates for both arms that we use to compute projections
+        primal = {}
+        for assignment in [1, 0]:
+            indices = data[self.treatment] == assignment
+            primal["primal_" + str(assignment)] = np.asarray((indices / prob_T) * Y, dtype=float)
 
-            # compute E[primal | mp(V)]
-            formula = "primal ~ " + '+'.join(mpV)
-
-            # special case if mp(V) is empty, then E[primal | mp(V)] = E[primal]
-            if len(mpV) != 0:
-                model_mpV = model_continuous(data, formula)  # primal is a continuous r.v.
-                primal_mpV = model_mpV.predict(data)
-            else:
-                primal_mpV = np.mean(primal)
-
-            # compute E[primal | V, mp(V)]
-            formula = formula + "+" + V
-            model_VmpV = model_continuous(data, formula)
-            primal_VmpV = model_VmpV.predict(data)
+        # the projections E[primal | mp(V)] and E[primal | V, mp(V)] depend on the assignment through the primal,
+        # so they are requested for each arm and computed together
+        requests = [("primal_" + str(assignment), self._analyze_graph()["mp"][V], V)
+                    for assignment in [1, 0] for V in eif_vars]
+        projections = self._projections(data, primal, requests, model_continuous, weights)
 
+        terms = {1: 0, 0: 0}
+        for (name, _, _), (primal_mpV, primal_VmpV) in zip(requests, projections):
             # add contribution of current variable: E[primal | V, mp(V)] - E[primal | mp(V)]
-            eif_vec += primal_VmpV - primal_mpV
+            terms[int(name[-1])] += primal_VmpV - primal_mpV
 
         # re-add the primal so final result is not mean zero
-        eif_vec = eif_vec + np.mean(primal)
+        for assignment in [1, 0]:
+            name = "primal_" + str(assignment)
+            terms[assignment] += self._statistic(model_continuous, "E[" + name + "]",
+                                                 lambda: np.average(primal[name], weights=weights))
 
-        # return efficient AIPW estimate
-        return np.mean(eif_vec)
+        # return per-sample terms of the efficient AIPW estimate
+        return terms
 
-    def _beta_primal(self, data, assignment, model_binary=None, model_continuous=None):
+    def _beta_primal(self, data, model_binary=None, model_continuous=None, weights=None):
         """
         Utility function to compute primal estimates for a dataset.
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: numpy array of floats corresponding to primal estimates for each sample.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment (1 and 0) to a numpy array of primal estimates
+                 for each sample.
         """
 
         # extract the outcome
         Y = data[self.outcome]
 
-        # C := pre-treatment vars and L := post-treatment vars in district of treatment
-        C = self.graph.pre([self.treatment], self.p_order)
-        post = set(self.graph.vertices).difference(C)
-        L = post.intersection(self.graph.district(self.treatment))
-
-        # create copies of the data with treatment assignments T=0 and T=1
-        data_T1 = data.copy()
-        data_T1[self.treatment] = 1
-        data_T0 = data.copy()
-        data_T0[self.treatment] = 0
-
-        indices = data[self.treatment] == assignment
+        # L := post-treatment vars in district of treatment
+        analysis = self._analyze_graph()
+        L = analysis["L"]
 
         # prob: stores \prod_{Li in L} p(Li | mp(Li))
         # prob_T1: stores \prod_{Li in L} p(Li | mp(Li)) at T=1
         # prob_T0: stores \prod_{Li in L} p(Li | mp(Li)) at T=0
 
-        mp_T = self.graph.markov_pillow([self.treatment], self.p_order)
+        mp_T = analysis["mp"][self.treatment]
         indices_T0 = data.index[data[self.treatment] == 0]
 
         if len(mp_T) != 0:
-            formula = self.treatment + " ~ " + '+'.join(mp_T)
-            model = model_binary(data, formula)
+            formula = self._formula(self.treatment, mp_T)
+            model = model_binary(data, formula, weights)
             prob = model.predict(data)
             prob[indices_T0] = 1 - prob[indices_T0]
             prob_T1 = model.predict(data)
             prob_T0 = 1 - prob_T1
         else:
-            prob = np.ones(len(data)) * np.mean(data[self.treatment])
+            prob_T1 = np.ones(len(data)) * self._statistic(model_binary, "P(" + self.treatment + ")",
+                                                           lambda: np.average(data[self.treatment], weights=weights))
+            prob = prob_T1.copy()
             prob[indices_T0] = 1 - prob[indices_T0]
-            prob_T1 = np.ones(len(data)) * np.mean(data[self.treatment])
             prob_T0 = 1 - prob_T1
 
         # iterate over vertices in L (except the outcome)
         for V in L.difference([self.treatment, self.outcome]):
 
             # fit V | mp(V)
-            mp_V = self.graph.markov_pillow([V], self.p_order)
-            formula = V + " ~ " + '+'.join(mp_V)
+            formula = self._formula(V, analysis["mp"][V])
 
             # p(V =v | .), p(V = v | . , T=1), p(V = v | ., T=0)
             if self.state_space_map_[V] == "binary":
-                model = model_binary(data, formula)
-                prob_V = model.predict(data)
-                prob_V_T1 = model.predict(data_T1)
-                prob_V_T0 = model.predict(data_T0)
-
-                indices_V0 = data.index[data[V] == 0]
+                model = model_binary(data, formula, weights)
+                prob_V = np.asarray(model.predict(data))
+                prob_V_assigned = self._predict_assigned(model, data)
 
                 # p(V | .), p(V | ., T=t)
-                prob_V[indices_V0] = 1 - prob_V[indices_V0]
-                prob_V_T1[indices_V0] = 1 - prob_V_T1[indices_V0]
-                prob_V_T0[indices_V0] = 1 - prob_V_T0[indices_V0]
+                indices_V0 = np.asarray(data[V] == 0)
+                prob_V = np.where(indices_V0, 1 - prob_V, prob_V)
+                prob_V_T1 = np.where(indices_V0, 1 - prob_V_assigned[1], prob_V_assigned[1])
+                prob_V_T0 = np.where(indices_V0, 1 - prob_V_assigned[0], prob_V_assigned[0])
 
             else:
-                model = model_continuous(data, formula)
+                model = model_continuous(data, formula, weights)
                 E_V = model.predict(data)
-                E_V_T1 = model.predict(data_T1)
-                E_V_T0 = model.predict(data_T0)
+                E_V_assigned = self._predict_assigned(model, data)
 
-                std = np.std(data[V] - E_V)
+                std = self._statistic(model_continuous, "std(" + V + ")",
+                                      lambda: _weighted_std(data[V] - E_V, weights))
                 prob_V = norm.pdf(data[V], loc=E_V, scale=std)
-                prob_V_T1 = norm.pdf(data[V], loc=E_V_T1, scale=std)
-                prob_V_T0 = norm.pdf(data[V], loc=E_V_T0, scale=std)
+                prob_V_T1 = norm.pdf(data[V], loc=E_V_assigned[1], scale=std)
+                prob_V_T0 = norm.pdf(data[V], loc=E_V_assigned[0], scale=std)
 
             prob *= prob_V
             prob_T1 *= prob_V_T1
@@ -420,203 +876,193 @@ class CausalEffect:
         if self.outcome in L:
 
             # fit a binary/continuous model for Y | mp(Y)
-            mp_Y = self.graph.markov_pillow([self.outcome], self.p_order)
-            formula = self.outcome + " ~ " + '+'.join(mp_Y)
+            formula = self._formula(self.outcome, analysis["mp"][self.outcome])
             if self.state_space_map_[self.outcome] == "binary":
-                model = model_binary(data, formula)
+                model = model_binary(data, formula, weights)
             else:
-                model = model_continuous(data, formula)
+                model = model_continuous(data, formula, weights)
 
             # predict the outcome and adjust numerator of primal accordingly
-            Yhat_T1 = model.predict(data_T1)
-            Yhat_T0 = model.predict(data_T0)
-            prob_sumT = prob_T1*Yhat_T1 + prob_T0*Yhat_T0
-            beta_primal = indices*(prob_sumT/prob)
+            Yhat = self._predict_assigned(model, data)
+            prob_sumT = prob_T1*Yhat[1] + prob_T0*Yhat[0]
+            beta = prob_sumT/prob
         else:
             prob_sumT = prob_T1 + prob_T0
-            beta_primal = indices * (prob_sumT / prob)*Y
+            beta = (prob_sumT / prob)*Y
 
-        return beta_primal
+        # only the indicator of the treatment assignment differs between the arms
+        return {assignment: (data[self.treatment] == assignment) * beta for assignment in [1, 0]}
 
-    def _primal_ipw(self, data, assignment, model_binary=None, model_continuous=None):
+    def _primal_ipw(self, data, model_binary=None, model_continuous=None, weights=None):
         """
-        Primal IPW estimator for the counterfactual mean E[Y(t)].
+        Primal IPW estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         # pedantic checks to make sure the method returns valid estimates
         if self.strategy != "p-fixable" and self.strategy != "a-fixable":
             raise RuntimeError("Primal IPW will not return valid estimates as treatment is not p-fixable")
 
-        # return primal IPW estimate
-        return np.mean(self._beta_primal(data, assignment, model_binary, model_continuous))
+        # return per-sample terms of the primal IPW estimate
+        return self._beta_primal(data, model_binary, model_continuous, weights)
 
-    def _beta_dual(self, data, assignment, model_binary=None, model_continuous=None):
+    def _beta_dual(self, data, model_binary=None, model_continuous=None, weights=None):
         """
         Utility function to compute dual estimates for a dataset.
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: numpy array of floats corresponding to dual estimates for each sample.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment (1 and 0) to a numpy array of dual estimates
+                 for each sample.
         """
 
         # extract the outcome
         Y = data[self.outcome]
 
-        # M := inverse Markov pillow of the treatment
-        M = set([m for m in self.graph.vertices if self.treatment in self.graph.markov_pillow([m], self.p_order)])
-        M = M.difference(self.graph.district(self.treatment))
-
-        # create a dataset where T=t
-        data_assigned = data.copy()
-        data_assigned[self.treatment] = assignment
+        # M := inverse Markov pillow of the treatment (outside its district)
+        analysis = self._analyze_graph()
+        M = analysis["M_dual"]
 
-        prob = 1  # stores \prod_{Mi in M} p(Mi | mp(Mi))|T=t / p(Mi | mp(Mi))
+        # stores \prod_{Mi in M} p(Mi | mp(Mi))|T=t / p(Mi | mp(Mi)) for each assignment t
+        prob = {1: 1, 0: 1}
         for V in M.difference([self.outcome]):
 
             # Fit V | mp(V)
-            mp_V = self.graph.markov_pillow([V], self.p_order)
-            formula = V + " ~ " + '+'.join(mp_V)
+            formula = self._formula(V, analysis["mp"][V])
 
-            # p(V = 1 | .), p(V = 1 | . , T=assigned)
+            # p(V = 1 | .), p(V = 1 | . , T=t)
             if self.state_space_map_[V] == "binary":
-                model = model_binary(data, formula)
-                prob_V = model.predict(data)
-                prob_V_assigned = model.predict(data_assigned)
+                model = model_binary(data, formula, weights)
+                prob_V = np.asarray(model.predict(data))
+                prob_V_assigned = self._predict_assigned(model, data)
 
-                indices_V0 = data.index[data[V] == 0]
-
-                # p(V | .) and p(V | ., T=assignment)
-                prob_V[indices_V0] = 1 - prob_V[indices_V0]
-                prob_V_assigned[indices_V0] = 1 - prob_V_assigned[indices_V0]
+                # p(V | .) and p(V | ., T=t)
+                indices_V0 = np.asarray(data[V] == 0)
+                prob_V = np.where(indices_V0, 1 - prob_V, prob_V)
+                prob_V_assigned = {assignment: np.where(indices_V0, 1 - prob_V_assigned[assignment],
+                                                        prob_V_assigned[assignment]) for assignment in [1, 0]}
 
             else:
-                model = model_continuous(data, formula)
+                model = model_continuous(data, formula, weights)
                 E_V = model.predict(data)
-                E_V_assigned = model.predict(data_assigned)
+                E_V_assigned = self._predict_assigned(model, data)
 
-                std = np.std(data[V] - E_V)
+                std = self._statistic(model_continuous, "std(" + V + ")",
+                                      lambda: _weighted_std(data[V] - E_V, weights))
                 prob_V = norm.pdf(data[V], loc=E_V, scale=std)
-                prob_V_assigned = norm.pdf(data[V], loc=E_V_assigned, scale=std)
+                prob_V_assigned = {assignment: norm.pdf(data[V], loc=E_V_assigned[assignment], scale=std)
+                                   for assignment in [1, 0]}
 
-            prob *= prob_V_assigned/prob_V
+            for assignment in [1, 0]:
+                prob[assignment] = prob[assignment] * prob_V_assigned[assignment] / prob_V
 
         # special case for if the outcome is in M
         if self.outcome in M:
-            mp_Y = self.graph.markov_pillow([self.outcome], self.p_order)
-            formula = self.outcome + " ~ " + '+'.join(mp_Y)
+            formula = self._formula(self.outcome, analysis["mp"][self.outcome])
             if self.state_space_map_[self.outcome] == "binary":
-                model = model_binary(data, formula)
+                model = model_binary(data, formula, weights)
             else:
-                model = model_continuous(data, formula)
-            Yhat_assigned = model.predict(data_assigned)
+                model = model_continuous(data, formula, weights)
+            Yhat_assigned = self._predict_assigned(model, data)
         else:
-            Yhat_assigned = Y
+            Yhat_assigned = {1: Y, 0: Y}
 
-        return prob*Yhat_assigned
+        return {assignment: prob[assignment]*Yhat_assigned[assignment] for assignment in [1, 0]}
 
-    def _dual_ipw(self, data, assignment, model_binary=None, model_continuous=None):
+    def _dual_ipw(self, data, model_binary=None, model_continuous=None, weights=None):
         """
-        Dual IPW estimator for the counterfactual mean E[Y(t)].
+        Dual IPW estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         # pedantic checks to make sure the method returns valid estimates
         if self.strategy != "p-fixable" and self.strategy != "a-fixable":
             raise RuntimeError("Dual IPW will not return valid estimates as treatment is not p-fixable")
 
-        # return primal dual IPW estimate
-        return np.mean(self._beta_dual(data, assignment, model_binary, model_continuous))
+        # return per-sample terms of the primal dual IPW estimate
+        return self._beta_dual(data, model_binary, model_continuous, weights)
 
-    def _augmented_primal_ipw(self, data, assignment, model_binary=None, model_continuous=None):
+    def _augmented_primal_ipw(self, data, model_binary=None, model_continuous=None, weights=None):
         """
-        Augmented primal IPW estimator for the counterfactual mean E[Y(t)].
+        Augmented primal IPW estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         # pedantic checks to make sure the method returns valid estimates
         if self.strategy != "p-fixable" and self.strategy != "a-fixable":
             raise RuntimeError("Augmented primal IPW will not return valid estimates as treatment is not p-fixable")
 
-        # compute the primal and dual estimates and them to the data frame
-        beta_primal = self._beta_primal(data, assignment, model_binary, model_continuous)
-        beta_dual = self._beta_dual(data, assignment, model_binary, model_continuous)
-        data["beta_primal"] = beta_primal
-        data["beta_dual"] = beta_dual
+        # compute the primal and dual estimates for both arms
+        beta_primal = self._beta_primal(data, model_binary, model_continuous, weights)
+        beta_dual = self._beta_dual(data, model_binary, model_continuous, weights)
 
         # C := pre-treatment vars
         # L := post-treatment vars in the district of T
         # M := post treatment vars not in L (a.k.a. the rest)
-        C = self.graph.pre([self.treatment], self.p_order)
-        post = set(self.graph.vertices).difference(C)
-        L = post.intersection(self.graph.district(self.treatment))
-        M = post - L
-
-        IF = 0
-
-        # iterate over all post-treatment variables
-        for V in post:
-
-            # compute all predecessors according to the topological order
-            pre_V = self.graph.pre([V], self.p_order)
-
-            # if the variables is in M, project using the primal otherwise use the dual
-            # to fit E[beta | pre(V)]
-            if V in M:
-                formula = "beta_primal" + " ~ " + '+'.join(pre_V)
-            elif V in L:
-                formula = "beta_dual" + " ~ " + '+'.join(pre_V)
-
-            # special logic for if there are no predecessors for the variable (which could only happen to T)
-            if len(pre_V) != 0:
-                model_preV = model_continuous(data, formula)  # primal/dual is a continuous r.v.
-                pred_preV = model_preV.predict(data)
+        analysis = self._analyze_graph()
+        C, post, M = analysis["C"], analysis["post"], analysis["M"]
+
+        # the projections depend on the assignment through the primal and dual, so they are requested for each arm
+        # and computed together
+        responses, requests = {}, []
+        for assignment in [1, 0]:
+            responses["beta_primal_" + str(assignment)] = np.asarray(beta_primal[assignment], dtype=float)
+            responses["beta_dual_" + str(assignment)] = np.asarray(beta_dual[assignment], dtype=float)
+
+            # for all post-treatment variables, fit E[beta | pre(V)] and E[beta | V, pre(V)],
+            # projecting the primal if the variable is in M and otherwise the dual
+            for V in post:
+                name = ("beta_primal_" if V in M else "beta_dual_") + str(assignment)
+                requests.append((name, analysis["pre"][V], V))
+
+            # final contribution from E[beta | C] (if C is not empty)
+            if len(C) != 0:
+                requests.append(("beta_dual_" + str(assignment), C, None))
+
+        projections = self._projections(data, responses, requests, model_continuous, weights)
+
+        terms = {1: 0, 0: 0}
+        for (name, pre_V, V), (pred_preV, pred_VpreV) in zip(requests, projections):
+            if V is None:
+                terms[int(name[-1])] += pred_preV
             else:
-                pred_preV = 0
-
-            # fit E[beta | V, pre(V)]
-            formula = formula + " + " + V
-            model_VpreV = model_continuous(data, formula)
-            pred_VpreV = model_VpreV.predict(data)
+                # add contribution of current variable as E[beta | V, pre(V)] - E[beta | pre(V)],
+                # where E[beta | pre(V)] is zero if there are no predecessors (which could only happen to T)
+                terms[int(name[-1])] += pred_VpreV - (pred_preV if len(pre_V) != 0 else 0)
 
-            # add contribution of current variable as E[beta | V, pre(V)] - E[beta | pre(V)]
-            IF += pred_VpreV - pred_preV
+        # return per-sample terms of the APIPW estimate
+        return terms
 
-        # final contribution from E[beta | C] (if C is not empty)
-        if len(C) != 0:
-            formula = "beta_dual" + " ~ " + '+'.join(C)
-            model_C = model_continuous(data, formula)  # dual is a continuous r.v.
-            IF += model_C.predict(data)
-
-        # return APIPW estimate
-        return np.mean(IF)
-
-    def _eff_augmented_primal_ipw(self, data, assignment, model_binary=None, model_continuous=None):
+    def _eff_augmented_primal_ipw(self, data, model_binary=None, model_continuous=None, weights=None):
         """
-        Efficient augmented primal IPW estimator for the counterfactual mean E[Y(t)].
+        Efficient augmented primal IPW estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         # pedantic checks to make sure the method returns valid estimates
@@ -625,110 +1071,70 @@ class CausalEffect:
         if not self.is_mb_shielded:
             raise RuntimeError("EIF will not return valid estimates as graph is not mb-shielded")
 
-        # compute primal and dual estimates and add them to the data frame
-        beta_primal = self._beta_primal(data, assignment, model_binary, model_continuous)
-        beta_dual = self._beta_dual(data, assignment, model_binary, model_continuous)
-        data["beta_primal"] = beta_primal
-        data["beta_dual"] = beta_dual
+        # compute primal and dual estimates for both arms
+        beta_primal = self._beta_primal(data, model_binary, model_continuous, weights)
+        beta_dual = self._beta_dual(data, model_binary, model_continuous, weights)
 
         # C := pre-treatment vars
         # L := post-treatment vars in the district of T
         # M := post treatment vars not in L (a.k.a. the rest)
-        C = self.graph.pre([self.treatment], self.p_order)
-        post = set(self.graph.vertices).difference(C)
-        L = post.intersection(self.graph.district(self.treatment))
-        M = post - L
-
-        IF = 0
-
-        # iterate over all variables
-        for V in self.graph.vertices:
-
-            # get the Markov pillow
-            mp_V = self.graph.markov_pillow([V], self.p_order)
-
-            # if the variables is in M, project using the primal otherwise use the dual
-            # to fit E[beta | mp(V)]
-            if V in M:
-                formula = "beta_primal" + " ~ " + '+'.join(mp_V)
-            else:
-                formula = "beta_dual" + " ~ " + '+'.join(mp_V)
-
-            # special logic for if there the Markov pillow is empty
-            if len(mp_V) != 0:
-                model_mpV = model_continuous(data, formula)
-                pred_mpV = model_mpV.predict(data)
-            else:
-                pred_mpV = np.mean(beta_dual)
-
-            # fit E[beta | V, mp(V)]
-            formula = formula + " + " + V
-            model_VmpV = model_continuous(data, formula)
-            pred_VmpV = model_VmpV.predict(data)
+        analysis = self._analyze_graph()
+        C, post, M = analysis["C"], analysis["post"], analysis["M"]
+
+        # the projections depend on the assignment through the primal and dual, so they are requested for each arm
+        # and computed together
+        responses, requests = {}, []
+        for assignment in [1, 0]:
+            responses["beta_primal_" + str(assignment)] = np.asarray(beta_primal[assignment], dtype=float)
+            responses["beta_dual_" + str(assignment)] = np.asarray(beta_dual[assignment], dtype=float)
+
+            # for all variables, fit E[beta | mp(V)] and E[beta | V, mp(V)],
+            # projecting the primal if the variable is in M and otherwise the dual
+            for V in self.graph.vertices:
+                name = ("beta_primal_" if V in M else "beta_dual_") + str(assignment)
+                requests.append((name, analysis["mp"][V], V))
+
+        projections = self._projections(data, responses, requests, model_continuous, weights)
+
+        terms = {1: 0, 0: 0}
+        for (name, mp_V, V), (pred_mpV, pred_VmpV) in zip(requests, projections):
+            # special logic for if the Markov pillow is empty
+            if len(mp_V) == 0:
+                dual = "beta_dual_" + name[-1]
+                pred_mpV = self._statistic(model_continuous, "E[" + dual + "]",
+                                           lambda: np.average(responses[dual], weights=weights))
 
             # add contribution of current variable as E[beta | V, mp(V)] - E[beta | mp(V)]
-            IF += pred_VmpV - pred_mpV
+            terms[int(name[-1])] += pred_VmpV - pred_mpV
 
         # add final contribution so that estimator is not mean-zero
-        IF += np.mean(beta_dual)
+        for assignment in [1, 0]:
+            terms[assignment] += self._statistic(model_continuous, "E[beta_dual_" + str(assignment) + "]",
+                                                 lambda: np.average(beta_dual[assignment], weights=weights))
 
-        # return efficient APIPW estimate
-        return np.mean(IF)
+        # return per-sample terms of the efficient APIPW estimate
+        return terms
 
-    def _fit_intrinsic_kernel(self, data, district, model_binary=None, model_continuous=None):
+    def _fit_intrinsic_kernel(self, data, district, model_binary=None, model_continuous=None, weights=None):
         """
         Get estimates of an intrinsic kernel q_D(D|pa(D)) for each sample.
 
         :param data: pandas data frame containing the data.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
         :return: numpy array of estimated probabilities of the kernel for each sample.
         """
 
+        kernel = self._compile_kernel(district)
         fixing_prob = np.ones(len(data))
 
-        # get parents of the district
-        parents = self.graph.parents(district) - district
-        # initialize with ancestral margin as fixing descendants are just sums
-        G = self.graph.subgraph(self.graph.ancestors(district))
-
-        # we know D is intrinsic because of prior checks
-        remaining_vertices = set(G.vertices) - district - parents  # is subtracting parents here ok? think so..
-
-        while not G.fixable(parents)[0]:
-
-            fixed = False
-
-            # at every step try to simplify as much as possible by fixing
-            # childless vertices as these correspond to just sums
-            # also find a backup fixable vertex in case there are no childless ones
-            iter_gen = iter(remaining_vertices)
-            i = 0
-
-            while not fixed and i < len(remaining_vertices):
-                i += 1
-                V = next(iter_gen)
-                if len(G.children([V])) == 0:
-                    G.fix([V])
-                    fixed = True
-                    remaining_vertices.remove(V)
-                elif G.fixable([V])[0]:
-                    fixable_V = V
-
-            # if we fixed something go back and see if we can fix another childless vertex
-            # or if the requirement that parents are fixable is satisfied
-            if fixed:
-                continue
-
-            # otherwise do a true fix corresponding to reweighting
-            # using the fixable V that we found
-            V = fixable_V
-            mb_V = G.markov_blanket([V])
-            formula = V + " ~ " + '+'.join(mb_V)
+        # reweight by the fixing steps, then by the weights required to fix each parent
+        for V, formula in kernel["fixes"] + kernel["parents"]:
 
             # p(V = 1 | .)
             if self.state_space_map_[V] == "binary":
-                model = model_binary(data, formula, 1/fixing_prob)
+                model = model_binary(data, formula, _combine_weights(weights, 1 / fixing_prob))
                 prob_V = model.predict(data)
                 indices_V0 = data.index[data[V] == 0]
 
@@ -737,41 +1143,10 @@ class CausalEffect:
 
             # handling continuous data
             else:
-                model = model_continuous(data, formula, 1/fixing_prob)
+                model = model_continuous(data, formula, _combine_weights(weights, 1 / fixing_prob))
                 E_V = model.predict(data)
-                std = np.std(data[V] - E_V)
-                prob_V = norm.pdf(data[V], loc=E_V, scale=std)
-
-            fixing_prob *= prob_V
-            G.fix([V])
-            remaining_vertices.remove(V)
-
-        # get the Markov blanket of the parents in this final graph
-        mb_parents = G.markov_blanket(parents)
-
-        # iterate over each parent and get weights required to fix them
-        for V in parents:
-
-            # p(V = 1 | .)
-            mp_V = mb_parents.intersection(self.graph.pre([V], self.n_order))
-            if len(mp_V) != 0:
-                formula = V + " ~ " + '+'.join(mp_V)
-            else:
-                formula = V + " ~ -1 + 1"
-
-            if self.state_space_map_[V] == "binary":
-                model = model_binary(data, formula, 1 / fixing_prob)
-                prob_V = model.predict(data)
-                indices_V0 = data.index[data[V] == 0]
-
-                # p(V | .)
-                prob_V[indices_V0] = 1 - prob_V[indices_V0]
-
-            # handling continuous data
-            else:
-                model = model_continuous(data, formula, 1 / fixing_prob)
-                E_V = model.predict(data)
-                std = np.std(data[V] - E_V)
+                std = self._statistic(model_continuous, "std(" + V + ")",
+                                      lambda: _weighted_std(data[V] - E_V, weights))
                 prob_V = norm.pdf(data[V], loc=E_V, scale=std)
 
             fixing_prob *= prob_V
@@ -779,17 +1154,11 @@ class CausalEffect:
         kernel_prob = np.ones(len(data))
 
         # iterate over member of the intrinsic set and get the final kernel weights
-        for V in district:
+        for V, formula in kernel["district"]:
 
             # p(V = 1 | .)
-            mp_V = parents.union(district.intersection(self.graph.pre(V, self.n_order)))
-            if len(mp_V) != 0:
-                formula = V + " ~ " + '+'.join(mp_V)
-            else:
-                formula = V + " ~ -1 + 1"
-
             if self.state_space_map_[V] == "binary":
-                model = model_binary(data, formula, 1 / fixing_prob)
+                model = model_binary(data, formula, _combine_weights(weights, 1 / fixing_prob))
                 prob_V = model.predict(data)
                 indices_V0 = data.index[data[V] == 0]
 
@@ -798,29 +1167,33 @@ class CausalEffect:
 
             # handling continuous data
             else:
-                model = model_continuous(data, formula, 1 / fixing_prob)
+                model = model_continuous(data, formula, _combine_weights(weights, 1 / fixing_prob))
                 E_V = model.predict(data)
-                std = np.std(data[V] - E_V)
+                std = self._statistic(model_continuous, "std(" + V + ")",
+                                      lambda: _weighted_std(data[V] - E_V, weights))
                 prob_V = norm.pdf(data[V], loc=E_V, scale=std)
 
             kernel_prob *= prob_V
 
         return kernel_prob
 
-    def _get_nested_rebalanced_weights(self, data, model_binary=None, model_continuous=None):
+    def _get_nested_rebalanced_weights(self, data, model_binary=None, model_continuous=None, weights=None,
+                                       kernels=None):
         """
         Get the rebalancing weights required for nested IPW and augmented nested IPW
 
         :param data: pandas data frame containing the data.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :param kernels: optional dictionary mapping districts (as frozensets) to their intrinsic kernels already
+                        fit to the data with the same weights, e.g. by the kernel steps of a plan.
         :return: numpy array corresponding to rebalancing weights.
         """
 
         # first get all districts of GY* that intersect with district of T
-        district_T = self.graph.district(self.treatment)
-        modified_districts = [district for district in self.one_id.Gystar.districts
-                              if len(district.intersection(district_T)) != 0]
+        analysis = self._analyze_graph()
+        modified_districts = analysis["districts"]
 
         # placeholder for the rebalancing probability
         rebalance_prob = np.ones(len(data))
@@ -832,12 +1205,11 @@ class CausalEffect:
             for V in district:
 
                 # Fit V | mp(V)
-                mp_V = self.graph.markov_pillow([V], self.n_order)
-                formula = V + " ~ " + '+'.join(mp_V)
+                formula = self._formula(V, analysis["mp_nested"][V])
 
                 # p(V = 1 | .)
                 if self.state_space_map_[V] == "binary":
-                    model = model_binary(data, formula)
+                    model = model_binary(data, formula, weights)
                     prob_V = model.predict(data)
                     indices_V0 = data.index[data[V] == 0]
 
@@ -846,27 +1218,33 @@ class CausalEffect:
 
                 # handling continuous data
                 else:
-                    model = model_continuous(data, formula)
+                    model = model_continuous(data, formula, weights)
                     E_V = model.predict(data)
-                    std = np.std(data[V] - E_V)
+                    std = self._statistic(model_continuous, "std(" + V + ")",
+                                          lambda: _weighted_std(data[V] - E_V, weights))
                     prob_V = norm.pdf(data[V], loc=E_V, scale=std)
 
                 rebalance_prob *= 1 / prob_V
 
-            # now compute the q_D(D | pa(D))
-            rebalance_prob *= self._fit_intrinsic_kernel(data, district, model_binary, model_continuous)
+            # now compute the q_D(D | pa(D)), unless it was fit already
+            if kernels is not None and frozenset(district) in kernels:
+                rebalance_prob *= kernels[frozenset(district)]
+            else:
+                rebalance_prob *= self._fit_intrinsic_kernel(data, district, model_binary, model_continuous, weights)
 
         return 1/rebalance_prob
 
-    def _nested_ipw(self, data, assignment, model_binary=None, model_continuous=None):
+    def _nested_ipw(self, data, model_binary=None, model_continuous=None, weights=None, kernels=None):
         """
-        Nested IPW estimator for the counterfactual mean E[Y(t)].
+        Nested IPW estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :param kernels: optional dictionary mapping districts to their intrinsic kernels already fit to the data.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         # pedantic checks to make sure the method returns valid estimates
@@ -874,137 +1252,581 @@ class CausalEffect:
             raise RuntimeError("Nested IPW will not return valid estimates as causal effect is not identified")
 
         # fit T | mp(T) with the rebalanced weights and compute the nested IPW
-        rebalance_weights = self._get_nested_rebalanced_weights(data, model_binary, model_continuous)
+        rebalance_weights = self._get_nested_rebalanced_weights(data, model_binary, model_continuous, weights,
+                                                                kernels)
+        rebalance_weights = _combine_weights(weights, rebalance_weights)
         # extract outcome from data frame and compute Markov pillow of treatment
         Y = data[self.outcome]
-        mp_T = self.graph.markov_pillow([self.treatment], self.n_order)
+        mp_T = self._analyze_graph()["mp_nested"][self.treatment]
 
         if len(mp_T) != 0:
             # fit T | mp(T) and compute probability of treatment for each sample
-            formula = self.treatment + " ~ " + '+'.join(mp_T)
+            formula = self._formula(self.treatment, mp_T)
             model = model_binary(data, formula, weights=rebalance_weights)
             prob_T = model.predict(data)
         else:
-            prob_T = np.ones(len(data)) * np.average(data[self.treatment], weights=rebalance_weights)
+            prob_T = np.ones(len(data)) * self._statistic(
+                model_binary, "P(" + self.treatment + ")",
+                lambda: np.average(data[self.treatment], weights=rebalance_weights))
 
         indices_T0 = data.index[data[self.treatment] == 0]
         prob_T[indices_T0] = 1 - prob_T[indices_T0]
 
-        # compute nested IPW estimate
-        indices = data[self.treatment] == assignment
-        return np.mean((indices / prob_T) * Y)
+        # compute nested IPW terms for each assignment from the same rebalanced propensity score
+        return {assignment: ((data[self.treatment] == assignment) / prob_T) * Y for assignment in [1, 0]}
 
-    def _augmented_nested_ipw(self, data, assignment, model_binary=None, model_continuous=None):
+    def _augmented_nested_ipw(self, data, model_binary=None, model_continuous=None, weights=None, kernels=None):
         """
-        Augmented nested IPW estimator for the counterfactual mean E[Y(t)].
+        Augmented nested IPW estimator for the counterfactual means E[Y(1)] and E[Y(0)].
 
         :param data: pandas data frame containing the data.
-        :param assignment: assignment value for treatment.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
-        :return: float corresponding to computed E[Y(t)].
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :param kernels: optional dictionary mapping districts to their intrinsic kernels already fit to the data.
+        :return: dictionary mapping each treatment assignment t (1 and 0) to a numpy array of per-sample terms
+                 whose mean is the estimate of E[Y(t)].
         """
 
         if self.strategy == "Not ID":
             raise RuntimeError("Nested IPW will not return valid estimates as causal effect is not identified")
 
         # get the rebalancing weights
-        rebalance_weights = self._get_nested_rebalanced_weights(data, model_binary, model_continuous)
+        rebalance_weights = self._get_nested_rebalanced_weights(data, model_binary, model_continuous, weights,
+                                                                kernels)
+        rebalance_weights = _combine_weights(weights, rebalance_weights)
 
         # extract the outcome and get Markov pillow of the treatment
         Y = data[self.outcome]
-        mp_T = self.graph.markov_pillow([self.treatment], self.n_order)
+        mp_T = self._analyze_graph()["mp_nested"][self.treatment]
 
         if len(mp_T) != 0:
             # fit T | mp(T) and predict treatment probabilities
-            formula_T = self.treatment + " ~ " + '+'.join(mp_T)  # + "+ ones"
+            formula_T = self._formula(self.treatment, mp_T)  # + "+ ones"
             model = model_binary(data, formula_T, weights=rebalance_weights)
             prob_T = model.predict(data)
-            formula_Y = self.outcome + " ~ " + self.treatment + '+' + '+'.join(mp_T)
+            formula_Y = self._formula(self.outcome, [self.treatment] + list(mp_T))
         else:
-            prob_T = np.ones(len(data)) * np.average(data[self.treatment], weights=rebalance_weights)
-            formula_Y = self.outcome + " ~ " + self.treatment
+            prob_T = np.ones(len(data)) * self._statistic(
+                model_binary, "P(" + self.treatment + ")",
+                lambda: np.average(data[self.treatment], weights=rebalance_weights))
+            formula_Y = self._formula(self.outcome, [self.treatment])
 
         indices_T0 = data.index[data[self.treatment] == 0]
         prob_T[indices_T0] = 1 - prob_T[indices_T0]
-        indices = data[self.treatment] == assignment
 
-        # fit Y | T=t, mp(T) and predict outcomes under assignment T=t
-        data_assign = data.copy()
-        data_assign[self.treatment] = assignment
+        # fit Y | T, mp(T) and predict outcomes under T=1 and T=0
         if self.state_space_map_[self.outcome] == "binary":
             model = model_binary(data, formula_Y, weights=rebalance_weights)
         else:
             model = model_continuous(data, formula_Y, weights=rebalance_weights)
-        Yhat_vec = model.predict(data_assign)
+        Yhat = self._predict_assigned(model, data)
+
+        # return per-sample terms of the ANIPW estimate for each assignment
+        terms = {}
+        for assignment in [1, 0]:
+            indices = data[self.treatment] == assignment
+            terms[assignment] = (indices / prob_T) * (Y - Yhat[assignment]) + Yhat[assignment]
+        return terms
+
+    def _effect(self, estimate_T1, estimate_T0):
+        """
+        Contrast the counterfactual means under T=1 and T=0.
+
+        :param estimate_T1: estimate of E[Y(1)].
+        :param estimate_T0: estimate of E[Y(0)].
+        :return: log of the odds ratio if Y is binary, else the ACE.
+        """
+
+        # if Y is binary report log of odds ration, if Y is continuous report ACE
+        if self.state_space_map_[self.outcome] == "binary":
+            return np.log((estimate_T1/(1-estimate_T1))/(estimate_T0/(1-estimate_T0)))
+        return estimate_T1 - estimate_T0
+
+    def _effect_influence_function(self, terms_T1, terms_T0, estimates=None):
+        """
+        Influence function of the effect, computed from the per-sample terms of each counterfactual mean.
+        For the log of the odds ratio the delta method is applied.
+
+        :param terms_T1: numpy array of per-sample terms of the estimate of E[Y(1)].
+        :param terms_T0: numpy array of per-sample terms of the estimate of E[Y(0)].
+        :param estimates: optional estimates of E[Y(1)] and E[Y(0)] to center the terms at, e.g. from the data
+                          the estimator was fit to. The means of the terms are used if None.
+        :return: numpy array corresponding to the (mean zero) influence function of the ACE/OR for each sample.
+        """
+
+        estimate_T1, estimate_T0 = (np.mean(terms_T1), np.mean(terms_T0)) if estimates is None else estimates
+        if_T1, if_T0 = terms_T1 - estimate_T1, terms_T0 - estimate_T0
+
+        # d/dmu log(mu/(1-mu)) = 1/(mu(1-mu))
+        if self.state_space_map_[self.outcome] == "binary":
+            return if_T1/(estimate_T1*(1-estimate_T1)) - if_T0/(estimate_T0*(1-estimate_T0))
+        return if_T1 - if_T0
+
+    def _counterfactual_terms(self, estimator, model_binary, model_continuous, data, weights=None, kernels=None):
+        """
+        Compute the per-sample terms of an estimator under T=1 and T=0.
+
+        :param estimator: string indicating what estimator to use: e.g. eff-apipw.
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param data: pandas data frame containing the data.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :param kernels: optional dictionary mapping districts to their intrinsic kernels already fit to the data,
+                        used by the nested estimators.
+        :return: two numpy arrays of per-sample terms under T=1 and T=0.
+        """
+
+        # nuisance models are fit once and shared by both arms
+        if kernels is None:
+            terms = self.estimators[estimator](data, model_binary, model_continuous, weights)
+        else:
+            terms = self.estimators[estimator](data, model_binary, model_continuous, weights, kernels)
+        return np.asarray(terms[1], dtype=float), np.asarray(terms[0], dtype=float)
+
+    def _crossfit_terms(self, estimator, model_binary, model_continuous, data, folds, weights=None, n_jobs=1):
+        """
+        Compute the per-sample terms of an estimator under T=1 and T=0 by cross-fitting: the terms of each fold
+        use nuisance models fit on the remaining folds. Samples of the held-out fold are given zero weight in
+        every fit, and the folds are fit concurrently.
+
+        :param estimator: string indicating what estimator to use: e.g. aipw.
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param data: pandas data frame containing the data.
+        :param folds: numpy array with the fold of each sample, e.g. from crossfit_folds.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :param n_jobs: number of threads used to fit the folds.
+        :return: two numpy arrays of out-of-fold terms under T=1 and T=0, a numpy array of the time spent fitting
+                 each fold, and the elapsed time, in seconds.
+        """
+
+        def fit_fold(fold):
+            start = time.perf_counter()
+            held_out = folds == fold
+            terms = self._counterfactual_terms(estimator, model_binary, model_continuous, data,
+                                               _combine_weights(weights, (~held_out).astype(float)))
+            return held_out, terms, time.perf_counter() - start
+
+        start = time.perf_counter()
+        n_folds = int(folds.max()) + 1
+        if n_jobs == 1:
+            results = [fit_fold(fold) for fold in range(n_folds)]
+        else:
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(executor.map(fit_fold, range(n_folds)))
+        elapsed = time.perf_counter() - start
+
+        # assemble the terms of each fold from the models that did not see it
+        terms_T1, terms_T0 = np.empty(len(data)), np.empty(len(data))
+        for held_out, (fold_T1, fold_T0), _ in results:
+            terms_T1[held_out] = fold_T1[held_out]
+            terms_T0[held_out] = fold_T0[held_out]
+        return terms_T1, terms_T0, np.array([seconds for _, _, seconds in results]), elapsed
+
+    def _estimate_crossfit_effect(self, estimator, model_binary, model_continuous, folds, data, weights=None):
+        """
+        Compute the cross-fit effect for a given estimator on a dataset, e.g. a bootstrap resample.
+
+        :param estimator: string indicating what estimator to use: e.g. aipw.
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param folds: numpy array with the fold of each sample.
+        :param data: pandas data frame containing the data.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: float corresponding to the ACE/OR.
+        """
+
+        terms_T1, terms_T0, _, _ = self._crossfit_terms(estimator, model_binary, model_continuous, data, folds,
+                                                        weights)
+        return self._effect(np.average(terms_T1, weights=weights), np.average(terms_T0, weights=weights))
+
+    def _estimate_effect(self, estimator, model_binary, model_continuous, data, weights=None, kernels=None):
+        """
+        Compute the effect for a given estimator on a dataset, e.g. a bootstrap resample.
+
+        :param estimator: string indicating what estimator to use: e.g. eff-apipw.
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param data: pandas data frame containing the data.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :param kernels: optional dictionary mapping districts to their intrinsic kernels already fit to the data.
+        :return: float corresponding to the ACE/OR.
+        """
+
+        terms_T1, terms_T0 = self._counterfactual_terms(estimator, model_binary, model_continuous, data, weights,
+                                                        kernels)
+        return self._effect(np.average(terms_T1, weights=weights), np.average(terms_T0, weights=weights))
+
+    def _workspace(self, data, columns=None):
+        """
+        View the data as a data frame in a workspace with a column of ones. The data itself is not modified.
+
+        :param data: pandas data frame, or data accepted by ananke.utils.as_columnar.
+        :param columns: names of the columns of an array (the vertices of the graph in order if None),
+                        or a dictionary renaming columns of a data frame or Arrow table.
+        :return: the workspace frame holding the data and a column of ones.
+        """
+
+        # view arrays, memory-mapped files, and Arrow tables as data frames without copying them
+        data = as_columnar(data, columns, default_columns=self.graph.vertices)
+
+        # add a column of ones to fit intercept terms to a workspace, rather than the user's data
+        workspace = Workspace(data)
+        workspace.add('ones', np.ones(len(data)))
+        return workspace.frame
+
+    def _prepare(self, data, model_binary=None, model_continuous=None, columns=None):
+        """
+        Prepare the data and modeling strategies for estimation. The data itself is not modified.
+
+        :param data: pandas data frame, or data accepted by ananke.utils.as_columnar.
+        :param model_binary: modeling strategy to use for binary variables, glm-binary if None. Either a function,
+                             the name of a strategy in models or of a registered learner, or a learner object.
+        :param model_continuous: modeling strategy to use for continuous variables, glm-continuous if None.
+        :param columns: names of the columns of an array (the vertices of the graph in order if None),
+                        or a dictionary renaming columns of a data frame or Arrow table.
+        :return: the workspace frame holding the data and a column of ones, and modeling strategies for binary
+                 and continuous variables that fit through the nuisance cache.
+        """
+
+        # instantiate modeling strategy with defaults
+        model_binary = self._modeling_strategy(model_binary, "binary")
+        model_continuous = self._modeling_strategy(model_continuous, "continuous")
+
+        # projections of pseudo-outcomes share a Gram matrix unless a custom continuous strategy is used
+        self._linear_projections = model_continuous == self.models["glm-continuous"]
 
-        # return ANIPW estimate
-        return np.mean((indices / prob_T) * (Y - Yhat_vec) + Yhat_vec)
+        # reuse nuisance models already fit to the same data, e.g. by another estimator
+        model_binary = self.nuisance_cache.wrap(model_binary)
+        model_continuous = self.nuisance_cache.wrap(model_continuous)
 
-    def compute_effect(self, data, estimator, model_binary=None, model_continuous=None, n_bootstraps=0, alpha=0.05):
+        data = self._workspace(data, columns)
+
+        # get state space of all variables in the graph in a single pass over their columns
+        undeclared = [V for V in self.graph.vertices if V in data.columns and V not in self.variable_types]
+        self.state_space_map_ = dict(detect_state_spaces(data, undeclared), **self.variable_types)
+
+        return data, model_binary, model_continuous
+
+    def _is_valid_estimator(self, estimator):
+        """
+        Check whether an estimator returns valid estimates of the effect in this graph, as the estimator checks
+        itself before fitting anything.
+
+        :param estimator: string naming an estimator.
+        :return: boolean indicating whether the estimator is valid.
+        """
+
+        if estimator in ["ipw", "gformula", "aipw", "eff-aipw"]:
+            valid = self.strategy == "a-fixable"
+        elif estimator in ["n-ipw", "anipw"]:
+            valid = self.strategy != "Not ID"
+        else:
+            valid = self.strategy in ["a-fixable", "p-fixable"]
+        return valid and (estimator not in ["eff-aipw", "eff-apipw"] or self.is_mb_shielded)
+
+    def _nuisance_plan(self, estimators):
+        """
+        Collect the regressions of observed variables on each other that a set of estimators needs, without
+        duplicates. Regressions of pseudo-outcomes, and regressions under fixing or rebalancing weights,
+        depend on earlier fits and are left to the estimators.
+
+        :param estimators: list of strings naming estimators.
+        :return: sorted list of tuples (response, formula).
+        """
+
+        plan = set()
+        analysis = self._analyze_graph()
+        mp, mp_T = analysis["mp"], analysis["mp"][self.treatment]
+
+        for estimator in estimators:
+
+            # propensity score T | mp(T)
+            if estimator in ["ipw", "aipw", "eff-aipw", "p-ipw", "apipw", "eff-apipw"] and len(mp_T) != 0:
+                plan.add((self.treatment, self._formula(self.treatment, mp_T)))
+
+            # outcome regression Y | T, mp(T)
+            if estimator in ["gformula", "aipw"]:
+                plan.add((self.outcome, self._formula(self.outcome, [self.treatment] + list(mp_T))))
+
+            # V | mp(V) for the primal (V in L) and the dual (V in M)
+            if estimator in ["p-ipw", "apipw", "eff-apipw"]:
+                for V in analysis["L"].difference([self.treatment]):
+                    plan.add((V, self._formula(V, mp[V])))
+            if estimator in ["d-ipw", "apipw", "eff-apipw"]:
+                for V in analysis["M_dual"]:
+                    plan.add((V, self._formula(V, mp[V])))
+
+            # V | mp(V) in the denominator of the rebalancing weights for nested estimators
+            if estimator in ["n-ipw", "anipw"]:
+                for district in analysis["districts"]:
+                    for V in district:
+                        plan.add((V, self._formula(V, analysis["mp_nested"][V])))
+
+        return sorted(plan)
+
+    def _compile_plan(self, estimators):
+        """
+        Compile the estimation plan for a set of estimators once: the regressions of observed variables come
+        first and are independent of each other, the intrinsic kernels of nested estimators each depend on a
+        sequence of weighted fits but not on each other, and each estimate depends on the steps it uses and
+        is given the kernels it depends on.
+
+        :param estimators: list of strings naming estimators.
+        :return: EstimationPlan with steps of kind fit, kernel, and estimate.
+        """
+
+        key = tuple(estimators)
+        if key in self._plans:
+            return self._plans[key]
+
+        plan = EstimationPlan()
+        for estimator in estimators:
+
+            # an invalid estimator raises its own error when its estimate is run, without fitting anything
+            if not self._is_valid_estimator(estimator):
+                plan.add("estimate: " + estimator, "estimate", (estimator,))
+                continue
+
+            dependencies = [plan.add("fit: " + formula, "fit", (response, formula))
+                            for response, formula in self._nuisance_plan([estimator])]
+            if estimator in ["n-ipw", "anipw"]:
+                dependencies += [plan.add("kernel: " + ','.join(sorted(district)), "kernel", (tuple(sorted(district)),))
+                                 for district in self._analyze_graph()["districts"]]
+            plan.add("estimate: " + estimator, "estimate", (estimator,), dependencies)
+
+        self._plans[key] = plan
+        return plan
+
+    def _run_plan(self, plan, model_binary, model_continuous, data, weights=None, n_jobs=1):
+        """
+        Run a compiled plan on data. The models fit by the fit steps are passed to the estimates that depend
+        on them, and the intrinsic kernels to the rebalancing weights of the nested estimates, so neither is
+        fit again whether or not it is still in the nuisance cache.
+
+        :param plan: EstimationPlan as returned by _compile_plan.
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param data: pandas data frame containing the data.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :param n_jobs: number of threads used to run independent steps.
+        :return: dictionary mapping names of steps to their results.
+        """
+
+        def execute(step, inputs):
+            if step.kind == "fit":
+                response, formula = step.args
+                model = model_binary if self.state_space_map_[response] == "binary" else model_continuous
+                return model(data, formula, weights)
+            if step.kind == "kernel":
+                return self._fit_intrinsic_kernel(data, set(step.args[0]), model_binary, model_continuous, weights)
+
+            # hand the models and kernels fit by earlier steps to the estimate
+            fits = {"binary": {}, "continuous": {}}
+            kernels = {}
+            for name, result in inputs.items():
+                if plan.steps[name].kind == "fit":
+                    response, formula = plan.steps[name].args
+                    fits["binary" if self.state_space_map_[response] == "binary" else "continuous"][formula] = result
+                else:
+                    kernels[frozenset(plan.steps[name].args[0])] = result
+            planned_binary = PlannedStrategy(model_binary, fits["binary"], data, weights)
+            planned_continuous = PlannedStrategy(model_continuous, fits["continuous"], data, weights)
+            return self._estimate_effect(step.args[0], planned_binary, planned_continuous, data, weights,
+                                         kernels or None)
+
+        return plan.run(execute, n_jobs)
+
+    def _estimate_effects(self, estimators, model_binary, model_continuous, data, weights=None, n_jobs=1):
+        """
+        Compute the effect for several estimators on a dataset, e.g. a bootstrap resample, running their
+        compiled plan so that the regressions they share are fit once.
+
+        :param estimators: list of strings naming estimators.
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param data: pandas data frame containing the data.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :param n_jobs: number of threads used to run independent steps of the plan.
+        :return: list of floats corresponding to the ACE/OR for each estimator.
+        """
+
+        results = self._run_plan(self._compile_plan(estimators), model_binary, model_continuous, data, weights,
+                                 n_jobs)
+        return [results["estimate: " + estimator] for estimator in estimators]
+
+    def _estimate_planned_effect(self, estimator, model_binary, model_continuous, data, weights=None):
+        """
+        Compute the effect for a given estimator on a dataset, e.g. a bootstrap resample, by running its
+        compiled plan.
+
+        :param estimator: string indicating what estimator to use: e.g. anipw.
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param data: pandas data frame containing the data.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :return: float corresponding to the ACE/OR.
+        """
+
+        return self._estimate_effects([estimator], model_binary, model_continuous, data, weights)[0]
+
+    def compute_effects(self, data, estimators, model_binary=None, model_continuous=None, n_bootstraps=0,
+                        alpha=0.05, n_jobs=1, backend="process", random_state=None, bootstrap="resample",
+                        batch_size=32, ci=None, columns=None):
+        """
+        Compute the Average Causal Effect (or Causal Odds Ratio if the outcome is binary) with several estimators
+        at once. The regressions, kernels, and estimates are compiled once into a plan whose independent steps
+        run concurrently if n_jobs > 1, and every bootstrap replicate evaluates all estimators with the same plan.
+
+        :param data: pandas data frame containing the data.
+        :param estimators: list of strings indicating what estimators to use: e.g. ["ipw", "aipw", "eff-aipw"].
+        :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
+        :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
+        :param n_bootstraps: number of bootstraps.
+        :param alpha: the significance level with the default value of 0.05.
+        :param n_jobs: number of workers used to run the plan and to run bootstrap replicates in parallel.
+        :param backend: string specifying the type of worker pool for bootstraps: process or thread.
+        :param random_state: integer seed for the bootstrap replicates.
+        :param bootstrap: string specifying how replicates are drawn: resample, multinomial, bayesian, or poisson.
+        :param batch_size: number of bootstrap replicates whose weights are drawn and evaluated together.
+        :param ci: string specifying how to compute intervals: None for bootstrap quantiles (if n_bootstraps > 0)
+                   or "if" for Wald intervals based on the influence function, for the estimators that support it.
+        :param columns: names of the columns if data is an array or .npy file (the vertices of the graph in order
+                        if None), or a dictionary renaming columns of a data frame or Arrow table.
+        :return: pandas data frame indexed by estimator with columns estimate, lower, and upper. The bounds
+                 are missing if no intervals were requested or the estimator does not support them.
+        """
+
+        unknown = [estimator for estimator in estimators if estimator not in self.estimators]
+        if len(unknown) != 0:
+            raise ValueError("Invalid choice of estimators: {}".format(unknown))
+        if ci not in [None, "if"]:
+            raise ValueError("Invalid choice of confidence interval: {}".format(ci))
+
+        data, model_binary, model_continuous = self._prepare(data, model_binary, model_continuous, columns)
+
+        table = pd.DataFrame(np.nan, index=pd.Index(estimators, name="estimator"),
+                             columns=["estimate", "lower", "upper"])
+        table["estimate"] = self._estimate_effects(estimators, model_binary, model_continuous, data, n_jobs=n_jobs)
+
+        if ci == "if":
+
+            # the terms reuse the models fit by the plan
+            for estimator in estimators:
+                if estimator in self.if_estimators:
+                    terms_T1, terms_T0 = self._counterfactual_terms(estimator, model_binary, model_continuous, data)
+                    estimate = self._effect(np.mean(terms_T1), np.mean(terms_T0))
+                    influence_function = self._effect_influence_function(terms_T1, terms_T0)
+                    lower, upper, _ = _wald_interval(estimate, influence_function, alpha)
+                    table.loc[estimator] = [estimate, lower, upper]
+
+        if ci is None and n_bootstraps > 0:
+
+            # every replicate evaluates all estimators, sharing their fits in a cache of its own
+            replicate = IsolatedReplicate(functools.partial(self._estimate_effects, estimators), model_binary,
+                                          model_continuous)
+            ace_vecs = run_bootstrap(replicate, data, n_bootstraps, random_state=random_state, n_jobs=n_jobs,
+                                     backend=backend, scheme=bootstrap, batch_size=batch_size)
+
+            # calculate the quantiles for each estimator
+            quantiles = np.quantile(np.array(ace_vecs), q=[alpha/2, 1 - alpha/2], axis=0)
+            table["lower"] = quantiles[0]
+            table["upper"] = quantiles[1]
+
+        return table
+
+    def compute_effect(self, data, estimator, model_binary=None, model_continuous=None, n_bootstraps=0, alpha=0.05,
+                       n_jobs=1, backend="process", random_state=None, bootstrap="resample", batch_size=32, ci=None,
+                       columns=None, n_folds=1):
         """
         Bootstrap functionality to compute the Average Causal Effect if the outcome is continuous
         or the Causal Odds Ratio if the outcome is binary. Returns the point estimate
         as well as lower and upper quantiles for a user specified confidence level.
 
+        Fitted nuisance models are kept in nuisance_cache, so running several estimators on the same data
+        only fits each distinct regression once. Use nuisance_cache.clear() to release them. The data is never
+        modified, so it can be shared by concurrent estimations, but each call stores its state in the effect
+        (e.g. state_space_map_), so concurrent calls should use separate CausalEffect objects.
+
+        Alternatively, for the augmented IPW estimators (aipw, anipw), ci="if" returns a Wald interval from the
+        estimated influence function in a single pass over the data. The influence function of each sample and
+        the standard error are then stored in influence_function_ and standard_error_. It is not available for
+        the primal estimators (apipw, eff-aipw, eff-apipw), whose terms understate the variance of the estimate.
+
+        With n_folds > 1 the influence function based estimators (aipw, apipw, anipw) are cross-fit: the data is
+        split into folds at random, and the terms of each fold use nuisance models fit on the other folds, so
+        flexible modeling strategies do not overfit the samples they are evaluated on. The folds are fit on
+        n_jobs threads, and the time spent fitting each fold and the elapsed time are stored in fold_times_
+        and crossfit_time_.
+
         :param data: pandas data frame containing the data.
         :param estimator: string indicating what estimator to use: e.g. eff-apipw.
         :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
         :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
         :param n_bootstraps: number of bootstraps.
         :param alpha: the significance level with the default value of 0.05.
+        :param n_jobs: number of workers used to run bootstrap replicates, or to fit the folds, in parallel.
+        :param backend: string specifying the type of worker pool for bootstraps: process or thread.
+        :param random_state: integer seed for the bootstrap resamples and the assignment of folds. Results are
+                             reproducible for a given seed regardless of the number of workers.
+        :param bootstrap: string specifying how replicates are drawn: resample refits every model on a resampled
+                          copy of the data, while multinomial, bayesian, and poisson keep the data as is and pass
+                          replicate weights to every model fit and mean instead.
+        :param batch_size: number of bootstrap replicates whose weights are drawn and evaluated together.
+        :param ci: string specifying how to compute intervals: None for bootstrap quantiles (if n_bootstraps > 0)
+                   or "if" for Wald intervals based on the influence function.
+        :param columns: names of the columns if data is an array or .npy file (the vertices of the graph in order
+                        if None), or a dictionary renaming columns of a data frame or Arrow table.
+        :param n_folds: number of folds for cross-fitting, nuisance models are fit on all the data if 1.
         :return: one float corresponding to ACE/OR if n_bootstraps=0, else three floats corresponding to ACE/OR, lower quantile, upper quantile.
         """
 
-        # instantiate modeling strategy with defaults
-        if not model_binary:
-            model_binary = self._fit_binary_glm
-        if not model_continuous:
-            model_continuous = self._fit_continuous_glm
-
-        # add a column of ones to fit intercept terms
-        data['ones'] = np.ones(len(data))
-
-        # get state space of all variables
-        for colname, colvalues in data.iteritems():
-            if set([0, 1]).issuperset(colvalues.unique()):
-                self.state_space_map_[colname] = "binary"
-            else:
-                self.state_space_map_[colname] = "continuous"
-
-        # instantiate estimator and get point estimate of ACE
-        method = self.estimators[estimator]
-        point_estimate_T1 = method(data, 1, model_binary, model_continuous)
-        point_estimate_T0 = method(data, 0, model_binary, model_continuous)
-
-        # if Y is binary report log of odds ration, if Y is continuous report ACE
-        if self.state_space_map_[self.outcome] == "binary":
-            ace = np.log((point_estimate_T1/(1-point_estimate_T1))/(point_estimate_T0/(1-point_estimate_T0)))
+        if ci not in [None, "if"]:
+            raise ValueError("Invalid choice of confidence interval: {}".format(ci))
+        if ci == "if" and estimator not in self.if_estimators:
+            raise ValueError("Influence function based intervals are not available for {}, "
+                             "use one of {} or bootstrap instead".format(estimator, self.if_estimators))
+
+        if n_folds != 1 and estimator not in self.crossfit_estimators:
+            raise ValueError("Cross-fitting is not available for {}, use one of {}".format(
+                estimator, self.crossfit_estimators))
+
+        data, model_binary, model_continuous = self._prepare(data, model_binary, model_continuous, columns)
+
+        # fit the folds once for the point estimate, keeping their timing
+        if n_folds != 1:
+            folds = crossfit_folds(len(data), n_folds, random_state)
+            terms_T1, terms_T0, self.fold_times_, self.crossfit_time_ = self._crossfit_terms(
+                estimator, model_binary, model_continuous, data, folds, n_jobs=n_jobs)
+
+        # compute the influence function of the effect and report a Wald interval
+        if ci == "if":
+            if n_folds == 1:
+                terms_T1, terms_T0 = self._counterfactual_terms(estimator, model_binary, model_continuous, data)
+            ace = self._effect(np.mean(terms_T1), np.mean(terms_T0))
+            self.influence_function_ = self._effect_influence_function(terms_T1, terms_T0)
+            lower, upper, self.standard_error_ = _wald_interval(ace, self.influence_function_, alpha)
+            return ace, lower, upper
+
+        # instantiate estimator and get point estimate of ACE, replicates fit in caches of their own
+        if n_folds != 1:
+            replicate = IsolatedReplicate(functools.partial(self._estimate_crossfit_effect, estimator), model_binary,
+                                          model_continuous, folds)
+            ace = self._effect(np.mean(terms_T1), np.mean(terms_T0))
         else:
-            ace = point_estimate_T1 - point_estimate_T0
+            replicate = IsolatedReplicate(functools.partial(self._estimate_planned_effect, estimator), model_binary,
+                                          model_continuous)
+            ace = self._estimate_planned_effect(estimator, model_binary, model_continuous, data)
 
         if n_bootstraps > 0:
-            ace_vec = []
 
             Ql = alpha/2
             Qu = 1 - alpha/2
 
-            # iterate over bootstraps
-            for iter in range(n_bootstraps):
-
-                # resample the data with replacement
-                data_sampled = data.sample(len(data), replace=True)
-                data_sampled.reset_index(drop=True, inplace=True)
-
-                # estimate ACE in resampled data
-                estimate_T1 = method(data_sampled, 1, model_binary, model_continuous)
-                estimate_T0 = method(data_sampled, 0, model_binary, model_continuous)
-
-                # if Y is binary report log of odds ration, if Y is continuous report ACE
-                if self.state_space_map_[self.outcome] == "binary":
-                    ace_vec.append(np.log((estimate_T1/(1-estimate_T1))/(estimate_T0/(1-estimate_T0))))
-                else:
-                    ace_vec.append(estimate_T1 - estimate_T0)
+            # estimate ACE in resampled or reweighted data
+            ace_vec = run_bootstrap(replicate, data, n_bootstraps, random_state=random_state, n_jobs=n_jobs,
+                                    backend=backend, scheme=bootstrap, batch_size=batch_size)
 
             # calculate the quantiles
             quantiles = np.quantile(ace_vec, q=[Ql, Qu])
@@ -1013,3 +1835,135 @@ class CausalEffect:
             return ace, q_low, q_up
 
         return ace
+
+    def fit(self, data, estimator, model_binary=None, model_continuous=None, columns=None):
+        """
+        Fit the nuisance models of an estimator and keep them in fitted_, so the fitted estimator can be evaluated
+        on new data with evaluate without refitting. Besides the fitted models and their formulas, fitted_ keeps the
+        statistics of the data that the estimator uses (e.g. residual standard deviations), the state spaces of the
+        variables, and the estimates of E[Y(1)] and E[Y(0)]. Projections of pseudo-outcomes are fit with the
+        continuous modeling strategy, so they can be evaluated on new data as well.
+
+        Fitted effects can be pickled, e.g. to evaluate batches of new data in worker processes.
+
+        :param data: pandas data frame containing the data.
+        :param estimator: string indicating what estimator to use: e.g. aipw.
+        :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
+        :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
+        :param columns: names of the columns if data is an array or .npy file (the vertices of the graph in order
+                        if None), or a dictionary renaming columns of a data frame or Arrow table.
+        :return: self.
+        """
+
+        if estimator not in self.estimators:
+            raise ValueError("Invalid choice of estimator: {}".format(estimator))
+
+        data, model_binary, model_continuous = self._prepare(data, model_binary, model_continuous, columns)
+
+        # run the estimator once, recording its fits in the order it makes them
+        fitted = FittedNuisance(estimator, self.state_space_map_)
+        terms_T1, terms_T0 = self._counterfactual_terms(estimator, *fitted.strategies(model_binary, model_continuous),
+                                                        data)
+        fitted.estimates = np.mean(terms_T1), np.mean(terms_T0)
+        self.fitted_ = fitted
+        return self
+
+    def evaluate(self, data, columns=None):
+        """
+        Evaluate the estimator fit by fit on new data, e.g. a new batch of units or a holdout set, in a single
+        vectorized pass that reuses the fitted nuisance models. The mean of the pseudo-outcomes under T=t over
+        the new data estimates E[Y(t)] with the fitted nuisance, and the influence function is centered at the
+        estimates from the data the estimator was fit to.
+
+        :param data: pandas data frame containing the new data.
+        :param columns: names of the columns if data is an array or .npy file (the vertices of the graph in order
+                        if None), or a dictionary renaming columns of a data frame or Arrow table.
+        :return: pandas data frame with the index of the data and columns pseudo_outcome_1 and pseudo_outcome_0
+                 with the per-sample terms under T=1 and T=0, and influence_function with the influence function
+                 of the ACE/OR for each sample.
+        """
+
+        if self.fitted_ is None:
+            raise RuntimeError("The effect must be fit before it is evaluated, see fit")
+
+        # the estimators mix numpy arrays and pandas series, so samples are indexed by position, e.g. for a
+        # holdout set sliced from a larger data frame
+        data = self._workspace(data, columns)
+        index = data.index
+        data.index = pd.RangeIndex(len(data))
+        self.state_space_map_ = dict(self.fitted_.state_space_map)
+
+        model_binary, model_continuous = self.fitted_.strategies(replay=True)
+        terms_T1, terms_T0 = self._counterfactual_terms(self.fitted_.estimator, model_binary, model_continuous, data)
+        influence_function = self._effect_influence_function(terms_T1, terms_T0, self.fitted_.estimates)
+        return pd.DataFrame({"pseudo_outcome_1": terms_T1, "pseudo_outcome_0": terms_T0,
+                             "influence_function": influence_function}, index=index)
+
+    def compute_effect_streaming(self, source, estimator, chunksize=100000, max_iter=100, tol=1e-10):
+        """
+        Compute the Average Causal Effect (or Causal Odds Ratio if the outcome is binary) for datasets that
+        do not fit in memory. The data is read in chunks: the propensity score and outcome regression are fit
+        from sufficient statistics accumulated over the chunks (one pass for a continuous outcome, one pass per
+        IRLS iteration for binary variables), and the counterfactual means are accumulated in a final pass.
+        Memory use is bounded by the chunk size. Only the IPW, outcome regression, and AIPW estimators with
+        the default GLMs are supported.
+
+        :param source: path to a CSV or Parquet file, a pandas data frame, a list of pandas data frames,
+                       or a function that returns a new iterator of pandas data frames each time it is called.
+        :param estimator: string indicating what estimator to use: ipw, gformula, or aipw.
+        :param chunksize: number of rows per chunk when reading files or slicing a data frame.
+        :param max_iter: maximum number of passes used to fit each logistic regression.
+        :param tol: tolerance on the relative change in deviance of the logistic regressions.
+        :return: float corresponding to the ACE/OR.
+        """
+
+        if estimator not in ["ipw", "gformula", "aipw"]:
+            raise ValueError("Streaming estimation is only available for ipw, gformula, and aipw, "
+                             "not {}".format(estimator))
+        if self.strategy != "a-fixable":
+            raise RuntimeError("Streaming estimation will not return valid estimates as treatment is not a-fixable")
+
+        mp_T = sorted(self._analyze_graph()["mp"][self.treatment])
+        columns = sorted(set(mp_T).union([self.treatment, self.outcome]))
+        reader = chunk_reader(source, columns, chunksize)
+
+        # get state space of the variables that are used, in an extra pass if they are not given
+        undetected = [V for V in columns if V not in self.variable_types]
+        detected = stream_state_spaces(reader, undetected) if len(undetected) != 0 else {}
+        self.state_space_map_ = dict(detected, **{V: self.variable_types[V] for V in columns
+                                                  if V in self.variable_types})
+
+        # fit T | mp(T) and Y | T, mp(T) together, reading the data once per pass
+        models = {}
+        if estimator in ["ipw", "aipw"]:
+            models["propensity"] = StreamingGLM(self.treatment, mp_T, "binomial", max_iter, tol)
+        if estimator in ["gformula", "aipw"]:
+            family = "binomial" if self.state_space_map_[self.outcome] == "binary" else "gaussian"
+            models["outcome"] = StreamingGLM(self.outcome, [self.treatment] + mp_T, family, max_iter, tol)
+        models = dict(zip(models, fit_streaming(reader, list(models.values()))))
+
+        # accumulate the per-sample terms of each counterfactual mean in a final pass
+        sums = {1: 0.0, 0: 0.0}
+        n = 0
+        for chunk in reader():
+            T = chunk[self.treatment].to_numpy(dtype=float)
+            Y = chunk[self.outcome].to_numpy(dtype=float)
+            n += len(chunk)
+
+            if "propensity" in models:
+                prob_T = np.asarray(models["propensity"].predict(chunk))
+                prob_T = np.where(T == 0, 1 - prob_T, prob_T)
+            if "outcome" in models:
+                Yhat = models["outcome"].predict_assigned(chunk, self.treatment, [1, 0])
+
+            for assignment in [1, 0]:
+                indices = T == assignment
+                if estimator == "ipw":
+                    terms = (indices / prob_T) * Y
+                elif estimator == "gformula":
+                    terms = Yhat[assignment]
+                else:
+                    terms = (indices / prob_T) * (Y - Yhat[assignment]) + Yhat[assignment]
+                sums[assignment] += np.sum(terms)
+
+        return self._effect(sums[1] / n, sums[0] / n)
@@ -0,0 +1,138 @@
+"""
+Class for keeping the nuisance models that an estimator fits, so that a fitted estimator can be evaluated on new
+data without refitting them.
+"""
+
+
+class FittedNuisance:
+    """
+    Nuisance models and statistics of the data (e.g. marginal probabilities and residual standard deviations)
+    fit by an estimator, keyed by their formula (with its terms sorted) or name. Recording strategies add the
+    fits to the record, and replaying strategies return them instead of fitting, so the estimator evaluates new
+    data with the nuisance of the data it was fit to. A formula fit more than once (e.g. under different weights)
+    is replayed in the order it was fit, while the order of different formulas and of their terms does not
+    matter, as it may depend on the iteration order of sets. The record can be pickled, e.g. to send it to
+    worker processes, as long as the fitted models can.
+    """
+
+    def __init__(self, estimator, state_space_map):
+        """
+        Constructor.
+
+        :param estimator: string indicating the estimator that was fit: e.g. aipw.
+        :param state_space_map: dictionary mapping names of vertices to their state space in the data it was fit to.
+        """
+
+        self.estimator = estimator
+        self.state_space_map = dict(state_space_map)
+        self.models = {}  # maps formulas to the list of models fit with them
+        self.statistics = {}  # maps names of statistics to the list of their values
+        self.estimates = None  # estimates of E[Y(1)] and E[Y(0)] on the data it was fit to
+
+    @property
+    def formulas(self):
+        """
+        Formulas of the fitted nuisance models.
+        """
+
+        return list(self.models)
+
+    def strategies(self, model_binary=None, model_continuous=None, replay=False):
+        """
+        Get modeling strategies that record their fits, or replay the recorded fits.
+
+        :param model_binary: modeling strategy to use for binary variables, ignored when replaying.
+        :param model_continuous: modeling strategy to use for continuous variables, ignored when replaying.
+        :param replay: whether to return the recorded fits rather than fit and record them.
+        :return: recorded modeling strategies for binary and continuous variables, which share the count of
+                 requests for each entry of the record.
+        """
+
+        cursor = _Cursor(self, replay)
+        return RecordedStrategy(cursor, model_binary), RecordedStrategy(cursor, model_continuous)
+
+
+def _canonical(formula):
+    """
+    Spell a formula with its terms sorted, so that regressions on the same covariates share a key.
+
+    :param formula: string encoding an R-style formula e.g: Y ~ X2 + X1.
+    :return: string encoding the formula e.g: Y ~ X1+X2.
+    """
+
+    response, _, terms = formula.partition("~")
+    return response.strip() + " ~ " + '+'.join(sorted(term.strip() for term in terms.split("+")))
+
+
+class _Cursor:
+    """
+    Number of times each entry of a record was requested in one run of an estimator, shared by its strategies.
+    """
+
+    def __init__(self, record, replay):
+        self.record = record
+        self.replay = replay
+        self.occurrences = {}
+
+    def next(self, kind, name, compute):
+        """
+        Compute and record the next model or statistic, or return it from the record when replaying.
+
+        :param kind: string specifying the type of entry: models or statistics.
+        :param name: formula of a model or name of a statistic.
+        :param compute: function of no arguments that computes the entry.
+        :return: the fitted model or the value of the statistic.
+        """
+
+        entries = getattr(self.record, kind)
+        occurrence = self.occurrences.get((kind, name), 0)
+        self.occurrences[kind, name] = occurrence + 1
+        if not self.replay:
+            value = compute()
+            entries.setdefault(name, []).append(value)
+            return value
+
+        if occurrence >= len(entries.get(name, [])):
+            raise RuntimeError("{} was not fit when the {} estimator was fit".format(name, self.record.estimator))
+        return entries[name][occurrence]
+
+
+class RecordedStrategy:
+    """
+    Modeling strategy that records its fits in a FittedNuisance, or replays them.
+    """
+
+    def __init__(self, cursor, model):
+        """
+        Constructor.
+
+        :param cursor: count of requests for each entry of the record, shared with the other strategy of the run.
+        :param model: function that fits a model given data, a formula, and weights, None when replaying.
+        """
+
+        self.cursor = cursor
+        self.model = model
+
+    def __call__(self, data, formula, weights=None):
+        """
+        Fit and record a model given a formula, or return the recorded model.
+
+        :param data: pandas data frame containing the data.
+        :param formula: string encoding an R-style formula e.g: Y ~ X1 + X2.
+        :param weights: optional numpy array of frequency weights.
+        :return: the fitted model.
+        """
+
+        return self.cursor.next("models", _canonical(formula), lambda: self.model(data, formula, weights))
+
+    def statistic(self, name, compute):
+        """
+        Compute and record a statistic of the data that the estimator uses besides its models,
+        or return the recorded statistic.
+
+        :param name: name of the statistic.
+        :param compute: function of no arguments that computes the statistic.
+        :return: value of the statistic.
+        """
+
+        return self.cursor.next("statistics", name, compute)
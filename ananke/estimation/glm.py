@@ -0,0 +1,353 @@
+"""
+Fast fitting of the binary (logistic) and continuous (Gaussian) GLMs used as nuisance models, working
+directly on NumPy design matrices instead of parsing formulas into new data frames for every fit.
+Models whose covariates are all discrete are fit on the unique covariate patterns and their sufficient
+statistics, so the cost of a fit grows with the number of patterns rather than the number of rows.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from scipy.special import expit
+
+# a term of an additive formula that refers to a column of the data
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+
+def parse_formula(formula):
+    """
+    Parse an additive formula of the form Y ~ X1 + X2, optionally removing or adding the intercept with -1 or 1.
+
+    :param formula: string encoding an R-style formula.
+    :return: tuple of (response, list of covariates, boolean for intercept), or None if the formula uses any
+             other terms, e.g. interactions or transformations.
+    """
+
+    response, _, rhs = formula.partition("~")
+    response = response.strip()
+    if not _NAME.match(response):
+        return None
+
+    covariates, intercept = [], True
+    if rhs.strip() == "":
+        return response, covariates, intercept
+    for term in rhs.split("+"):
+        term = term.strip()
+        if term == "1":
+            intercept = True
+        elif term in ["-1", "0"]:
+            intercept = False
+        elif _NAME.match(term):
+            if term not in covariates:
+                covariates.append(term)
+        else:
+            return None
+    return response, covariates, intercept
+
+
+def _unique_rows(X):
+    """
+    Find the unique rows of a matrix by encoding each row as an integer, which is much faster than
+    comparing rows directly.
+
+    :param X: numpy array.
+    :return: tuple of numpy arrays of the unique rows and of the index of the unique row for each row.
+    """
+
+    codes = np.zeros(len(X), dtype=np.int64)
+    for column in X.T:
+        values, inverse = np.unique(column, return_inverse=True)
+        # re-number the patterns seen so far if the combined code could overflow
+        if codes.max(initial=0) >= np.iinfo(np.int64).max // len(values):
+            codes = np.unique(codes, return_inverse=True)[1].astype(np.int64)
+        codes = codes * len(values) + inverse
+    _, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    return X[first], inverse
+
+
+class DesignCache:
+    """
+    Per-thread cache of the columns and design matrices of the data frames currently being estimated on.
+    Only the most recently used data frames are kept (e.g. the data and a copy used for prediction), so
+    memory stays bounded. Covariate columns must not be modified in place while a data frame is being fit.
+    """
+
+    def __init__(self, maxsize=2):
+        """
+        Constructor.
+
+        :param maxsize: maximum number of data frames whose columns are held per thread.
+        """
+
+        self.maxsize = maxsize
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {"maxsize": self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state["maxsize"])
+
+    def _state(self, data):
+        entries = getattr(self._local, "entries", None)
+        if entries is None:
+            entries = self._local.entries = OrderedDict()
+
+        # entries hold a reference to their data frame, so ids cannot be reused while they are cached
+        entry = entries.get(id(data))
+        if entry is None or entry["data"] is not data:
+            entry = entries[id(data)] = {"data": data, "columns": {}, "designs": {}, "patterns": {}}
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+        entries.move_to_end(id(data))
+        return entry
+
+    def column(self, data, name):
+        """
+        Get a column of the data as a float NumPy array.
+
+        :param data: pandas data frame containing the data.
+        :param name: name of the column.
+        :return: numpy array of the column.
+        """
+
+        state = self._state(data)
+        if name not in state["columns"]:
+            state["columns"][name] = np.asarray(data[name], dtype=float)
+        return state["columns"][name]
+
+    def design(self, data, covariates, intercept=True):
+        """
+        Get the design matrix for a set of covariates.
+
+        :param data: pandas data frame containing the data.
+        :param covariates: list of names of covariates.
+        :param intercept: boolean indicating whether the first column is an intercept.
+        :return: numpy array of shape (number of rows, number of covariates + intercept).
+        """
+
+        state = self._state(data)
+        key = (tuple(covariates), intercept)
+        if key not in state["designs"]:
+            columns = [self.column(data, c) for c in covariates]
+            if intercept:
+                columns.insert(0, np.ones(len(data)))
+            state["designs"][key] = np.column_stack(columns) if columns else np.empty((len(data), 0))
+        return state["designs"][key]
+
+    def patterns(self, data, covariates, intercept=True, compute=True):
+        """
+        Get the unique rows of the design matrix for a set of covariates, and the pattern of each row.
+
+        :param data: pandas data frame containing the data.
+        :param covariates: list of names of covariates.
+        :param intercept: boolean indicating whether the first column is an intercept.
+        :param compute: boolean indicating whether to compute the patterns if they are not cached.
+        :return: tuple of numpy arrays of the unique rows and of the index of the unique row for each row,
+                 or None if the patterns are not cached and compute is False.
+        """
+
+        state = self._state(data)
+        key = (tuple(covariates), intercept)
+        if key not in state["patterns"]:
+            if not compute:
+                return None
+            X = self.design(data, covariates, intercept)
+            state["patterns"][key] = _unique_rows(X)
+        return state["patterns"][key]
+
+
+class GLMFit:
+    """
+    Fitted binary or continuous GLM that predicts from data frames like a fitted statsmodels model.
+    """
+
+    def __init__(self, family, covariates, intercept, params, designs=None):
+        """
+        Constructor.
+
+        :param family: string specifying the family: binomial or gaussian.
+        :param covariates: list of names of covariates.
+        :param intercept: boolean indicating whether the model has an intercept.
+        :param params: numpy array of coefficients, starting with the intercept if there is one.
+        :param designs: optional DesignCache used to build design matrices for prediction.
+        """
+
+        self.family = family
+        self.covariates = covariates
+        self.intercept = intercept
+        self.params = pd.Series(params, index=(["Intercept"] if intercept else []) + list(covariates))
+        self._designs = designs if designs is not None else DesignCache()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_designs"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._designs = DesignCache()
+
+    def _linear_predictor(self, data):
+        # evaluate the model once per covariate pattern if the data was collapsed when fitting
+        patterns = self._designs.patterns(data, self.covariates, self.intercept, compute=False)
+        if patterns is not None:
+            return (patterns[0] @ self.params.values)[patterns[1]]
+        return self._designs.design(data, self.covariates, self.intercept) @ self.params.values
+
+    def _mean(self, eta):
+        return expit(eta) if self.family == "binomial" else eta
+
+    def predict(self, data):
+        """
+        Predict the mean of the response.
+
+        :param data: pandas data frame containing the covariates.
+        :return: pandas series of predicted means with the index of the data.
+        """
+
+        return pd.Series(self._mean(self._linear_predictor(data)), index=data.index)
+
+    def predict_assigned(self, data, column, values):
+        """
+        Predict the mean of the response with one covariate set to each of several values, e.g. the treatment
+        set to 1 and 0. The linear predictor is shifted by the coefficient of the covariate instead of
+        predicting from modified copies of the data, so each prediction only allocates O(n) memory.
+
+        :param data: pandas data frame containing the covariates.
+        :param column: name of the covariate to set.
+        :param values: list of values of the covariate.
+        :return: dictionary mapping each value to a numpy array of predicted means.
+        """
+
+        eta = self._linear_predictor(data)
+        if column not in self.covariates:
+            # every value gets its own array, so updating the predictions of one leaves the others intact
+            mean = self._mean(eta)
+            return {value: mean.copy() for value in values}
+
+        observed = self._designs.column(data, column)
+        coefficient = self.params[column]
+        return {value: self._mean(eta + coefficient * (value - observed)) for value in values}
+
+
+def _lstsq(X, y, weights):
+    root = np.sqrt(weights)
+    return np.linalg.lstsq(X * root[:, None], y * root, rcond=None)[0]
+
+
+def fit_gaussian(X, y, weights=None):
+    """
+    Weighted least squares fit of a Gaussian GLM.
+
+    :param X: numpy array design matrix.
+    :param y: numpy array response.
+    :param weights: optional numpy array of frequency weights.
+    :return: numpy array of coefficients.
+    """
+
+    if weights is None:
+        return np.linalg.lstsq(X, y, rcond=None)[0]
+    return _lstsq(X, y, weights)
+
+
+def fit_logistic(X, y, weights=None, max_iter=100, tol=1e-10):
+    """
+    Iteratively reweighted least squares fit of a logistic regression (binomial GLM with the logit link),
+    started from the same initial means as statsmodels.
+
+    :param X: numpy array design matrix.
+    :param y: numpy array of binary responses.
+    :param weights: optional numpy array of frequency weights.
+    :param max_iter: maximum number of iterations.
+    :param tol: tolerance on the relative change in deviance.
+    :return: numpy array of coefficients.
+    """
+
+    weights = np.ones(len(y)) if weights is None else np.asarray(weights, dtype=float)
+    mu = (y + 0.5) / 2
+    eta = np.log(mu / (1 - mu))
+    deviance = np.inf
+    params = np.zeros(X.shape[1])
+
+    for _ in range(max_iter):
+        variance = np.clip(mu * (1 - mu), 1e-12, None)
+        z = eta + (y - mu) / variance
+        params = _lstsq(X, z, weights * variance)
+        eta = X @ params
+        mu = np.clip(expit(eta), 1e-15, 1 - 1e-15)
+        new_deviance = -2 * np.sum(weights * (y * np.log(mu) + (1 - y) * np.log(1 - mu)))
+        if abs(new_deviance - deviance) <= tol * (abs(new_deviance) + tol):
+            break
+        deviance = new_deviance
+
+    return params
+
+
+def collapse_patterns(X, y, weights, patterns):
+    """
+    Collapse a regression onto unique covariate patterns. The weighted mean response and total weight of each
+    pattern are sufficient statistics for Gaussian and binomial GLMs, so fits on the collapsed rows with the
+    totals as frequency weights give the same coefficients as fits on all rows.
+
+    :param X: numpy array design matrix.
+    :param y: numpy array response.
+    :param weights: optional numpy array of frequency weights.
+    :param patterns: tuple of numpy arrays of the unique rows of X and the index of the unique row for each row.
+    :return: tuple of the collapsed design matrix, response and frequency weights.
+    """
+
+    unique, inverse = patterns
+    weights = np.ones(len(y)) if weights is None else weights
+    totals = np.bincount(inverse, weights=weights, minlength=len(unique))
+    sums = np.bincount(inverse, weights=weights * y, minlength=len(unique))
+    means = np.divide(sums, totals, out=np.zeros(len(unique)), where=totals > 0)
+    return unique, means, totals
+
+
+def fit_glm(data, formula, family, weights=None, designs=None, discrete=()):
+    """
+    Fit a binary or continuous GLM given a formula. Additive formulas are fit directly on cached design
+    matrices, anything else falls back to statsmodels. If all covariates are discrete, the fit is run on the
+    unique covariate patterns.
+
+    :param data: pandas data frame containing the data.
+    :param formula: string encoding an R-style formula e.g: Y ~ X1 + X2.
+    :param family: string specifying the family: binomial or gaussian.
+    :param weights: optional numpy array of frequency weights.
+    :param designs: optional DesignCache shared across fits on the same data.
+    :param discrete: collection of names of columns known to take few distinct values, e.g. binary columns.
+    :return: the fitted model.
+    """
+
+    parsed = parse_formula(formula)
+    if parsed is None or not all(pd.api.types.is_numeric_dtype(data[c]) for c in [parsed[0]] + parsed[1]):
+        family = sm.families.Binomial() if family == "binomial" else sm.families.Gaussian()
+        return sm.GLM.from_formula(formula, data=data, family=family, freq_weights=weights).fit()
+
+    response, covariates, intercept = parsed
+    designs = designs if designs is not None else DesignCache()
+    X = designs.design(data, covariates, intercept)
+    y = np.asarray(data[response], dtype=float)
+    weights = None if weights is None else np.asarray(weights, dtype=float)
+
+    # fit on the unique covariate patterns if there are fewer of them than rows
+    if len(covariates) != 0 and all(c in discrete for c in covariates):
+        patterns = designs.patterns(data, covariates, intercept)
+        if len(patterns[0]) < len(y):
+            X, y, weights = collapse_patterns(X, y, weights, patterns)
+
+    # rows without weight, e.g. the held-out fold when cross-fitting, do not contribute to the fit
+    if weights is not None and not weights.all():
+        keep = weights != 0
+        X, y, weights = X[keep], y[keep], weights[keep]
+
+    if family == "binomial":
+        params = fit_logistic(X, y, weights)
+    else:
+        params = fit_gaussian(X, y, weights)
+    return GLMFit(family, covariates, intercept, params, designs)
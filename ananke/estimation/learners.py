@@ -0,0 +1,375 @@
+"""
+Pluggable learners for nuisance models. A learner is any object with fit(X, y, sample_weight) and predict(X)
+methods over NumPy design matrices (without a column for the intercept), where binary learners predict the
+probability that the response is 1. Learners are registered by name, and CausalEffect accepts the names of
+registered learners (or learner objects) in place of modeling strategies.
+"""
+
+import copy
+import functools
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from .glm import DesignCache, fit_logistic, parse_formula
+
+# registered learners: maps names to a dictionary of factories for binary and continuous variables
+LEARNERS = {}
+
+
+def register_learner(name, binary=None, continuous=None):
+    """
+    Register a learner so it can be used by name as a modeling strategy.
+
+    :param name: name of the learner, e.g. ridge.
+    :param binary: function returning a new learner for binary variables, or None if not supported.
+    :param continuous: function returning a new learner for continuous variables, or None if not supported.
+    :return: None.
+    """
+
+    if binary is None and continuous is None:
+        raise ValueError("A learner must support binary or continuous variables")
+    LEARNERS[name] = {"binary": binary, "continuous": continuous}
+
+
+def make_learner(name, state_space):
+    """
+    Create a new instance of a registered learner.
+
+    :param name: name of the learner.
+    :param state_space: string specifying the type of response: binary or continuous.
+    :return: learner with fit and predict methods.
+    """
+
+    if name not in LEARNERS:
+        raise ValueError("Invalid choice of learner: {}, use one of {}".format(name, sorted(LEARNERS)))
+    factory = LEARNERS[name][state_space]
+    if factory is None:
+        raise ValueError("Learner {} does not support {} variables".format(name, state_space))
+    return factory()
+
+
+def predict_batch(learner, designs):
+    """
+    Predict from several design matrices in one call, e.g. the designs with the treatment set to 1 and to 0.
+    Learners may implement predict_batch themselves, otherwise the designs are stacked and predicted together.
+
+    :param learner: fitted learner.
+    :param designs: list of numpy arrays with the same columns.
+    :return: list of numpy arrays of predictions, one for each design.
+    """
+
+    if hasattr(learner, "predict_batch"):
+        return learner.predict_batch(designs)
+    predictions = np.asarray(learner.predict(np.vstack(designs)), dtype=float)
+    return np.split(predictions, np.cumsum([len(X) for X in designs])[:-1])
+
+
+def _with_intercept(X):
+    return np.column_stack([np.ones(len(X)), X])
+
+
+class LogisticLearner:
+    """
+    Logistic regression fit by iteratively reweighted least squares.
+    """
+
+    def fit(self, X, y, sample_weight=None):
+        """
+        Fit the model.
+
+        :param X: numpy array design matrix.
+        :param y: numpy array of binary responses.
+        :param sample_weight: optional numpy array of frequency weights.
+        :return: self.
+        """
+
+        self.coef_ = fit_logistic(_with_intercept(X), y, sample_weight)
+        return self
+
+    def predict(self, X):
+        """
+        Predict the probability that the response is 1.
+
+        :param X: numpy array design matrix.
+        :return: numpy array of probabilities.
+        """
+
+        return expit(_with_intercept(X) @ self.coef_)
+
+
+class SparseLogisticLearner(LogisticLearner):
+    """
+    L1-penalized logistic regression fit by accelerated proximal gradient descent. The intercept is not
+    penalized, and the penalty applies to the weighted mean of the log-likelihood.
+    """
+
+    def __init__(self, alpha=0.01, max_iter=1000, tol=1e-6):
+        """
+        Constructor.
+
+        :param alpha: strength of the L1 penalty.
+        :param max_iter: maximum number of iterations.
+        :param tol: tolerance on the largest change in a coefficient.
+        """
+
+        self.alpha = alpha
+        self.max_iter = max_iter
+        self.tol = tol
+
+    def fit(self, X, y, sample_weight=None):
+        """
+        Fit the model.
+
+        :param X: numpy array design matrix.
+        :param y: numpy array of binary responses.
+        :param sample_weight: optional numpy array of frequency weights.
+        :return: self.
+        """
+
+        Z = _with_intercept(X)
+        weights = np.ones(len(y)) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+        weights = weights / np.sum(weights)
+
+        # the gradient of the mean log-likelihood is Lipschitz with constant at most a quarter of the largest
+        # eigenvalue of the weighted Gram matrix
+        step = 4 / max(np.linalg.eigvalsh((Z * weights[:, None]).T @ Z)[-1], 1e-12)
+        threshold = np.full(Z.shape[1], step * self.alpha)
+        threshold[0] = 0
+
+        coef = momentum = np.zeros(Z.shape[1])
+        t = 1
+        for _ in range(self.max_iter):
+            gradient = Z.T @ (weights * (expit(Z @ momentum) - y))
+            update = momentum - step * gradient
+            update = np.sign(update) * np.maximum(np.abs(update) - threshold, 0)
+            t_next = (1 + np.sqrt(1 + 4 * t ** 2)) / 2
+            momentum = update + ((t - 1) / t_next) * (update - coef)
+            converged = np.max(np.abs(update - coef)) <= self.tol
+            coef, t = update, t_next
+            if converged:
+                break
+
+        self.coef_ = coef
+        return self
+
+
+class RidgeLearner:
+    """
+    Ridge regression fit in closed form from the weighted Gram matrix. The intercept is not penalized.
+    """
+
+    def __init__(self, alpha=1.0):
+        """
+        Constructor.
+
+        :param alpha: strength of the L2 penalty.
+        """
+
+        self.alpha = alpha
+
+    def fit(self, X, y, sample_weight=None):
+        """
+        Fit the model.
+
+        :param X: numpy array design matrix.
+        :param y: numpy array of responses.
+        :param sample_weight: optional numpy array of frequency weights.
+        :return: self.
+        """
+
+        weights = np.ones(len(y)) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+        x_mean = np.average(X, axis=0, weights=weights) if X.shape[1] != 0 else np.zeros(0)
+        y_mean = np.average(y, weights=weights)
+        centered = X - x_mean
+        gram = (centered * weights[:, None]).T @ centered + self.alpha * np.eye(X.shape[1])
+        self.coef_ = np.linalg.solve(gram, centered.T @ (weights * (y - y_mean)))
+        self.intercept_ = y_mean - x_mean @ self.coef_
+        return self
+
+    def predict(self, X):
+        """
+        Predict the mean of the response.
+
+        :param X: numpy array design matrix.
+        :return: numpy array of predicted means.
+        """
+
+        return self.intercept_ + X @ self.coef_
+
+
+class HistGradientBoostingLearner:
+    """
+    Histogram gradient boosted trees from scikit-learn, which must be installed to use this learner.
+    """
+
+    def __init__(self, state_space, **kwargs):
+        """
+        Constructor.
+
+        :param state_space: string specifying the type of response: binary or continuous.
+        :param kwargs: arguments passed to the scikit-learn estimator.
+        """
+
+        try:
+            from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+        except ImportError:
+            raise ImportError("The hist-gradient-boosting learner requires scikit-learn to be installed")
+        self.state_space = state_space
+        if state_space == "binary":
+            self.model = HistGradientBoostingClassifier(**kwargs)
+        else:
+            self.model = HistGradientBoostingRegressor(**kwargs)
+
+    def fit(self, X, y, sample_weight=None):
+        """
+        Fit the model.
+
+        :param X: numpy array design matrix.
+        :param y: numpy array of responses.
+        :param sample_weight: optional numpy array of frequency weights.
+        :return: self.
+        """
+
+        self.model.fit(X, y, sample_weight=sample_weight)
+        return self
+
+    def predict(self, X):
+        """
+        Predict the probability that the response is 1 for binary responses, else the mean of the response.
+
+        :param X: numpy array design matrix.
+        :return: numpy array of predictions.
+        """
+
+        if self.state_space == "binary":
+            return self.model.predict_proba(X)[:, 1]
+        return self.model.predict(X)
+
+
+register_learner("logistic", binary=LogisticLearner)
+register_learner("sparse-logistic", binary=SparseLogisticLearner)
+register_learner("ridge", continuous=RidgeLearner)
+register_learner("hist-gradient-boosting", binary=functools.partial(HistGradientBoostingLearner, "binary"),
+                 continuous=functools.partial(HistGradientBoostingLearner, "continuous"))
+
+
+class LearnerFit:
+    """
+    Fitted learner that predicts from data frames like a fitted statsmodels model.
+    """
+
+    def __init__(self, learner, covariates, designs=None):
+        """
+        Constructor.
+
+        :param learner: fitted learner.
+        :param covariates: list of names of covariates, in the order of the columns of the design.
+        :param designs: optional DesignCache used to build design matrices for prediction.
+        """
+
+        self.learner = learner
+        self.covariates = covariates
+        self._designs = designs if designs is not None else DesignCache()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_designs"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._designs = DesignCache()
+
+    def predict(self, data):
+        """
+        Predict the mean of the response.
+
+        :param data: pandas data frame containing the covariates.
+        :return: pandas series of predicted means with the index of the data.
+        """
+
+        X = self._designs.design(data, self.covariates, False)
+        return pd.Series(np.asarray(self.learner.predict(X), dtype=float), index=data.index)
+
+    def predict_assigned(self, data, column, values):
+        """
+        Predict the mean of the response with one covariate set to each of several values, e.g. the treatment
+        set to 1 and 0. The designs for all values are predicted in a single call to the learner.
+
+        :param data: pandas data frame containing the covariates.
+        :param column: name of the covariate to set.
+        :param values: list of values of the covariate.
+        :return: dictionary mapping each value to a numpy array of predicted means.
+        """
+
+        X = self._designs.design(data, self.covariates, False)
+        if column not in self.covariates:
+            # every value gets its own array, so updating the predictions of one leaves the others intact
+            predictions = np.asarray(self.learner.predict(X), dtype=float)
+            return {value: predictions.copy() for value in values}
+
+        index = self.covariates.index(column)
+        designs = []
+        for value in values:
+            design = X.copy()
+            design[:, index] = value
+            designs.append(design)
+        return dict(zip(values, predict_batch(self.learner, designs)))
+
+
+class LearnerStrategy:
+    """
+    Modeling strategy that fits a learner to the design matrix of an additive formula. Strategies compare
+    equal if they use the same learner, so fits through the nuisance cache are shared.
+    """
+
+    def __init__(self, learner, state_space, designs=None):
+        """
+        Constructor.
+
+        :param learner: name of a registered learner, or a learner object that is copied for every fit.
+        :param state_space: string specifying the type of response: binary or continuous.
+        :param designs: optional DesignCache shared across fits on the same data.
+        """
+
+        if isinstance(learner, str):
+            make_learner(learner, state_space)
+        self.learner = learner
+        self.state_space = state_space
+        self._designs = designs if designs is not None else DesignCache()
+
+    def __eq__(self, other):
+        return isinstance(other, LearnerStrategy) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def _key(self):
+        learner = self.learner if isinstance(self.learner, str) else id(self.learner)
+        return learner, self.state_space
+
+    def __call__(self, data, formula, weights=None):
+        """
+        Fit the learner given a formula.
+
+        :param data: pandas data frame containing the data.
+        :param formula: string encoding an additive R-style formula e.g: Y ~ X1 + X2.
+        :param weights: optional numpy array of frequency weights.
+        :return: the fitted model as a LearnerFit.
+        """
+
+        parsed = parse_formula(formula)
+        if parsed is None:
+            raise ValueError("Learners require additive formulas, got {}".format(formula))
+        response, covariates, _ = parsed
+
+        if isinstance(self.learner, str):
+            learner = make_learner(self.learner, self.state_space)
+        else:
+            learner = copy.deepcopy(self.learner)
+        X = self._designs.design(data, covariates, False)
+        y = np.asarray(data[response], dtype=float)
+        learner.fit(X, y, sample_weight=None if weights is None else np.asarray(weights, dtype=float))
+        return LearnerFit(learner, covariates, self._designs)
@@ -0,0 +1,161 @@
+"""
+Class for estimating the effect of one treatment on several outcomes of the same graph and data, sharing the
+graph analysis and the treatment-side nuisance models (e.g. the propensity score and intrinsic kernels) across
+outcomes so that only the outcome-specific regressions are fit once per outcome.
+"""
+
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .bootstrap import run_bootstrap
+from .counterfactual_mean import CausalEffect, _wald_interval
+from .nuisance import IsolatedReplicate
+
+
+class MultiOutcomeEffect:
+    """
+    Estimates the Average Causal Effect (or Causal Odds Ratio for binary outcomes) of a treatment on each
+    of several outcomes. There is one CausalEffect per outcome in effects, and all of them share the graph
+    analysis, modeling strategies, and nuisance cache of the effect on the first outcome.
+    """
+
+    def __init__(self, graph, treatment, outcomes, variable_types=None):
+        """
+        Constructor.
+
+        :param graph: ADMG corresponding to substantive knowledge/model.
+        :param treatment: name of vertex corresponding to the treatment.
+        :param outcomes: list of names of vertices corresponding to the outcomes.
+        :param variable_types: optional dictionary mapping names of vertices to their state space: binary,
+                               categorical, or continuous. The state space of other vertices is detected from the data.
+        """
+
+        if len(outcomes) == 0 or len(set(outcomes)) != len(outcomes):
+            raise ValueError("Outcomes must be a non-empty list of distinct vertices")
+
+        self.treatment = treatment
+        self.outcomes = list(outcomes)
+        first = CausalEffect(graph, treatment, self.outcomes[0], variable_types)
+        self.effects = {self.outcomes[0]: first}
+        for outcome in self.outcomes[1:]:
+            self.effects[outcome] = CausalEffect(graph, treatment, outcome, variable_types, shared=first)
+
+        # fitted nuisance models shared by all outcomes
+        self.nuisance_cache = first.nuisance_cache
+
+    def _prepare(self, data, model_binary=None, model_continuous=None, columns=None):
+        """
+        Prepare the data and modeling strategies for estimation of every outcome.
+
+        :param data: pandas data frame, or data accepted by ananke.utils.as_columnar.
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param columns: names of the columns of an array, or a dictionary renaming columns.
+        :return: the workspace frame holding the data and a column of ones, and the shared modeling strategies.
+        """
+
+        first = self.effects[self.outcomes[0]]
+        prepared = first._prepare(data, model_binary, model_continuous, columns)
+
+        # the effects share the graph, variable types, and strategies, so the state spaces detected for the
+        # first outcome hold for every outcome
+        for outcome in self.outcomes[1:]:
+            self.effects[outcome].state_space_map_ = first.state_space_map_
+            self.effects[outcome]._linear_projections = first._linear_projections
+        return prepared
+
+    def _estimate_outcomes(self, estimator, model_binary, model_continuous, data, weights=None, n_jobs=1):
+        """
+        Compute the effect on every outcome for a given estimator on a dataset, e.g. a bootstrap resample.
+        The first outcome is estimated before the others, so the treatment-side models it fits are in the
+        nuisance cache when the remaining outcomes are estimated.
+
+        :param estimator: string indicating what estimator to use: e.g. aipw.
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param data: pandas data frame containing the data.
+        :param weights: optional numpy array of frequency weights for each sample, e.g. bootstrap weights.
+        :param n_jobs: number of threads used to estimate the remaining outcomes.
+        :return: list of floats corresponding to the ACE/OR for each outcome.
+        """
+
+        def estimate(outcome):
+            return self.effects[outcome]._estimate_effect(estimator, model_binary, model_continuous, data, weights)
+
+        estimates = [estimate(self.outcomes[0])]
+        if n_jobs == 1:
+            estimates += [estimate(outcome) for outcome in self.outcomes[1:]]
+        else:
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                estimates += list(executor.map(estimate, self.outcomes[1:]))
+        return estimates
+
+    def compute_effects(self, data, estimator, model_binary=None, model_continuous=None, n_bootstraps=0,
+                        alpha=0.05, n_jobs=1, backend="process", random_state=None, bootstrap="resample",
+                        batch_size=32, ci=None, columns=None):
+        """
+        Compute the Average Causal Effect (or Causal Odds Ratio if the outcome is binary) on every outcome.
+        Every bootstrap replicate evaluates all outcomes, so they also share the treatment-side fits of the replicate.
+
+        :param data: pandas data frame containing the data.
+        :param estimator: string indicating what estimator to use: e.g. aipw.
+        :param model_binary: string specifying modeling strategy to use for binary variables: e.g. glm-binary.
+        :param model_continuous: string specifying modeling strategy to use for continuous variables: e.g. glm-continuous.
+        :param n_bootstraps: number of bootstraps.
+        :param alpha: the significance level with the default value of 0.05.
+        :param n_jobs: number of workers used to estimate outcomes, or to run bootstrap replicates, in parallel.
+        :param backend: string specifying the type of worker pool for bootstraps: process or thread.
+        :param random_state: integer seed for the bootstrap replicates.
+        :param bootstrap: string specifying how replicates are drawn: resample, multinomial, bayesian, or poisson.
+        :param batch_size: number of bootstrap replicates whose weights are drawn and evaluated together.
+        :param ci: string specifying how to compute intervals: None for bootstrap quantiles (if n_bootstraps > 0)
+                   or "if" for Wald intervals based on the influence function.
+        :param columns: names of the columns if data is an array or .npy file (the vertices of the graph in order
+                        if None), or a dictionary renaming columns of a data frame or Arrow table.
+        :return: pandas data frame indexed by outcome with columns estimate, lower, and upper. The bounds
+                 are missing if no intervals were requested.
+        """
+
+        first = self.effects[self.outcomes[0]]
+        if estimator not in first.estimators:
+            raise ValueError("Invalid choice of estimator: {}".format(estimator))
+        if ci not in [None, "if"]:
+            raise ValueError("Invalid choice of confidence interval: {}".format(ci))
+        if ci == "if" and estimator not in first.if_estimators:
+            raise ValueError("Influence function based intervals are not available for {}, "
+                             "use one of {} or bootstrap instead".format(estimator, first.if_estimators))
+
+        data, model_binary, model_continuous = self._prepare(data, model_binary, model_continuous, columns)
+
+        table = pd.DataFrame(np.nan, index=pd.Index(self.outcomes, name="outcome"),
+                             columns=["estimate", "lower", "upper"])
+
+        if ci == "if":
+            for outcome in self.outcomes:
+                effect = self.effects[outcome]
+                terms_T1, terms_T0 = effect._counterfactual_terms(estimator, model_binary, model_continuous, data)
+                estimate = effect._effect(np.mean(terms_T1), np.mean(terms_T0))
+                influence_function = effect._effect_influence_function(terms_T1, terms_T0)
+                lower, upper, _ = _wald_interval(estimate, influence_function, alpha)
+                table.loc[outcome] = [estimate, lower, upper]
+            return table
+
+        table["estimate"] = self._estimate_outcomes(estimator, model_binary, model_continuous, data, n_jobs=n_jobs)
+
+        if n_bootstraps > 0:
+
+            # every replicate evaluates all outcomes, sharing the treatment-side fits in a cache of its own
+            replicate = IsolatedReplicate(functools.partial(self._estimate_outcomes, estimator), model_binary,
+                                          model_continuous)
+            ace_vecs = run_bootstrap(replicate, data, n_bootstraps, random_state=random_state, n_jobs=n_jobs,
+                                     backend=backend, scheme=bootstrap, batch_size=batch_size)
+
+            # calculate the quantiles for each outcome
+            quantiles = np.quantile(np.array(ace_vecs), q=[alpha/2, 1 - alpha/2], axis=0)
+            table["lower"] = quantiles[0]
+            table["upper"] = quantiles[1]
+
+        return table
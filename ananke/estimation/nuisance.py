@@ -0,0 +1,249 @@
+"""
+Class for caching fitted nuisance models so that they are shared across estimators.
+"""
+
+import hashlib
+import re
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def column_token(data, column):
+    """
+    Compute a fast content hash of a column of a data frame.
+
+    :param data: pandas data frame containing the data.
+    :param column: name of the column to hash.
+    :return: string digest that changes whenever the values of the column change.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(len(data)).encode())
+    digest.update(column.encode())
+    digest.update(pd.util.hash_pandas_object(data[column], index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def weights_token(weights):
+    """
+    Compute a fast content hash of a weight vector.
+
+    :param weights: numpy array of weights or None.
+    :return: string digest of the weights, None if there are no weights.
+    """
+
+    if weights is None:
+        return None
+    return hashlib.blake2b(np.ascontiguousarray(weights, dtype=float).tobytes(), digest_size=16).hexdigest()
+
+
+class NuisanceCache:
+    """
+    Bounded cache of fitted nuisance models.
+
+    Fits are keyed by the modeling strategy (which determines the family), the formula, a hash of the
+    contents of the columns the formula uses, and a hash of the weights. Different estimators that need
+    the same regression on the same data therefore share a single fit.
+
+    The hashes are computed once per data frame and weight vector, and kept as long as the object is alive,
+    so lookups do not pass over the data again. Replacing a column of a frame is detected, but frames and
+    weights are assumed not to be written to in place while they are alive, as holds for the workspace
+    frame and the weights of an estimation.
+    """
+
+    def __init__(self, maxsize=64):
+        """
+        Constructor.
+
+        :param maxsize: maximum number of fitted models held, least recently used models are evicted first.
+                        A maxsize of 0 disables caching.
+        """
+
+        self.maxsize = maxsize
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._tokens = {}  # maps ids of data frames and weight vectors to a weak reference and their hashes
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __getstate__(self):
+        # fitted models are not sent to worker processes, each worker starts with an empty cache
+        return {"maxsize": self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state["maxsize"])
+
+    def __len__(self):
+        return len(self._models)
+
+    def clear(self):
+        """
+        Remove all fitted models from the cache and reset statistics.
+
+        :return: None.
+        """
+
+        with self._lock:
+            self._models.clear()
+            for k in self.stats:
+                self.stats[k] = 0
+
+    def fit(self, model, data, formula, weights=None):
+        """
+        Fit a model, or return the previously fitted model for the same inputs.
+
+        :param model: function that fits a model given data, a formula, and weights e.g. CausalEffect._fit_binary_glm.
+        :param data: pandas data frame containing the data.
+        :param formula: string encoding an R-style formula e.g: Y ~ X1 + X2.
+        :param weights: optional numpy array of weights for each sample.
+        :return: the fitted model.
+        """
+
+        if self.maxsize == 0:
+            return model(data, formula, weights)
+
+        columns = set(re.findall(r"[A-Za-z_][A-Za-z0-9_.]*", formula)).intersection(data.columns)
+        key = (model, formula, self._data_token(data, columns), self._weights_token(weights))
+
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._models[key]
+            self.stats["misses"] += 1
+
+        fitted = model(data, formula, weights)
+
+        with self._lock:
+            self._models[key] = fitted
+            while len(self._models) > self.maxsize:
+                self._models.popitem(last=False)
+                self.stats["evictions"] += 1
+        return fitted
+
+    def _memo(self, obj):
+        """
+        Get the hashes kept for a data frame or weight vector, which are dropped once the object is collected.
+
+        :param obj: data frame or weight vector.
+        :return: dictionary of hashes of the object, None if the object cannot be weakly referenced.
+        """
+
+        key = id(obj)
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is not None and entry[0]() is obj:
+                return entry[1]
+            try:
+                ref = weakref.ref(obj, lambda ref: self._forget(key, ref))
+            except TypeError:
+                return None
+            self._tokens[key] = (ref, {})
+            return self._tokens[key][1]
+
+    def _forget(self, key, ref):
+        # called when an object is collected, which may happen while the lock is held, so it is not taken
+        entry = self._tokens.get(key)
+        if entry is not None and entry[0] is ref:
+            self._tokens.pop(key, None)
+
+    def _data_token(self, data, columns):
+        """
+        Hash the contents of columns of a data frame, hashing each column once per frame.
+
+        :param data: pandas data frame containing the data.
+        :param columns: iterable of names of columns to hash.
+        :return: tuple of the hashes of the columns in sorted order.
+        """
+
+        memo = self._memo(data)
+        tokens = []
+        for column in sorted(columns):
+            # a replaced column has new memory, so its hash is recomputed
+            key = (column, np.asarray(data[column]).__array_interface__["data"][0])
+            if memo is None:
+                tokens.append(column_token(data, column))
+                continue
+            if key not in memo:
+                memo[key] = column_token(data, column)
+            tokens.append(memo[key])
+        return tuple(tokens)
+
+    def _weights_token(self, weights):
+        """
+        Hash a weight vector once.
+
+        :param weights: numpy array of weights or None.
+        :return: string digest of the weights, None if there are no weights.
+        """
+
+        memo = self._memo(weights) if weights is not None else None
+        if memo is None:
+            return weights_token(weights)
+        if "weights" not in memo:
+            memo["weights"] = weights_token(weights)
+        return memo["weights"]
+
+    def wrap(self, model):
+        """
+        Wrap a modeling strategy so that its fits go through the cache. A strategy wrapped by another cache is
+        moved to this one.
+
+        :param model: function that fits a model given data, a formula, and weights.
+        :return: function with the same signature as model.
+        """
+
+        if isinstance(model, CachedStrategy):
+            model = model.model
+        return CachedStrategy(self, model)
+
+
+class CachedStrategy:
+    """
+    Modeling strategy whose fits go through a NuisanceCache.
+    """
+
+    def __init__(self, cache, model):
+        """
+        Constructor.
+
+        :param cache: NuisanceCache holding the fits.
+        :param model: function that fits a model given data, a formula, and weights.
+        """
+
+        self.cache = cache
+        self.model = model
+
+    def __call__(self, data, formula, weights=None):
+        return self.cache.fit(self.model, data, formula, weights)
+
+
+class IsolatedReplicate:
+    """
+    Function evaluating bootstrap replicates, each with a cache of its own that is dropped after the replicate.
+    The fits to a replicate are not reused by other replicates, so they are kept out of the cache of the data,
+    where they would evict its fits.
+    """
+
+    def __init__(self, function, model_binary, model_continuous, *args):
+        """
+        Constructor.
+
+        :param function: function called as function(model_binary, model_continuous, *args, data, weights).
+        :param model_binary: modeling strategy to use for binary variables.
+        :param model_continuous: modeling strategy to use for continuous variables.
+        :param args: additional arguments passed to the function before the data.
+        """
+
+        self.function = function
+        self.model_binary = model_binary
+        self.model_continuous = model_continuous
+        self.args = args
+
+    def __call__(self, data, weights=None):
+        cache = NuisanceCache()
+        return self.function(cache.wrap(self.model_binary), cache.wrap(self.model_continuous), *self.args, data,
+                             weights)
@@ -0,0 +1,138 @@
+"""
+Classes for compiled estimation plans: a small DAG of numeric steps (nuisance regressions, kernels, and
+estimates) that is built once from the graph and run on data by an executor, running independent steps
+concurrently.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Step:
+    """
+    A numeric step of an estimation plan. Steps only hold static descriptions (strings and tuples),
+    so plans are cheap to pickle and can be reused across datasets and bootstrap replicates.
+    """
+
+    def __init__(self, name, kind, args=(), dependencies=()):
+        """
+        Constructor.
+
+        :param name: unique name of the step.
+        :param kind: string specifying the type of step, e.g. fit, kernel, or estimate.
+        :param args: tuple of arguments describing the step, e.g. the response and formula of a regression.
+        :param dependencies: iterable of names of steps that must be run before this step.
+        """
+
+        self.name = name
+        self.kind = kind
+        self.args = tuple(args)
+        self.dependencies = tuple(dependencies)
+
+    def __repr__(self):
+        return "Step({!r}, {!r}, {!r})".format(self.name, self.kind, self.args)
+
+
+class PlannedStrategy:
+    """
+    Modeling strategy that returns the models fit by the steps of a plan, and fits any other model with the
+    strategy it wraps, so a step uses the fits of its dependencies whether or not they are still cached.
+    """
+
+    def __init__(self, model, fits, data, weights=None):
+        """
+        Constructor.
+
+        :param model: function that fits a model given data, a formula, and weights.
+        :param fits: dictionary mapping formulas to the models fit by the steps of the plan.
+        :param data: pandas data frame the plan was run on.
+        :param weights: numpy array of frequency weights the plan was run with, or None.
+        """
+
+        self.model = model
+        self.fits = fits
+        self.data = data
+        self.weights = weights
+
+    def __call__(self, data, formula, weights=None):
+        if data is self.data and weights is self.weights and formula in self.fits:
+            return self.fits[formula]
+        return self.model(data, formula, weights)
+
+
+class EstimationPlan:
+    """
+    A DAG of steps run by an executor function that binds them to data.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        self.steps = {}
+
+    def __len__(self):
+        return len(self.steps)
+
+    def add(self, name, kind, args=(), dependencies=()):
+        """
+        Add a step to the plan, unless a step with the same name exists.
+
+        :param name: unique name of the step.
+        :param kind: string specifying the type of step.
+        :param args: tuple of arguments describing the step.
+        :param dependencies: iterable of names of steps that must be run before this step.
+        :return: name of the step.
+        """
+
+        if name not in self.steps:
+            missing = [d for d in dependencies if d not in self.steps]
+            if len(missing) != 0:
+                raise ValueError("Step {} depends on unknown steps {}".format(name, missing))
+            self.steps[name] = Step(name, kind, args, dependencies)
+        return name
+
+    def of_kind(self, kind):
+        """
+        Get the steps of a given kind in the order they were added.
+
+        :param kind: string specifying the type of step.
+        :return: list of steps.
+        """
+
+        return [step for step in self.steps.values() if step.kind == kind]
+
+    def run(self, execute, n_jobs=1):
+        """
+        Run every step of the plan once all of its dependencies have been run, passing it their results.
+
+        :param execute: function called with each step and a dictionary mapping the names of its dependencies
+                        to their results, returning the result of the step.
+        :param n_jobs: number of threads used to run independent steps concurrently.
+        :return: dictionary mapping names of steps to their results.
+        """
+
+        results = {}
+
+        # steps are added after their dependencies, so the insertion order is a valid order
+        if n_jobs == 1:
+            for name, step in self.steps.items():
+                results[name] = execute(step, {d: results[d] for d in step.dependencies})
+            return results
+
+        pending = dict(self.steps)
+        running = {}
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            while pending or running:
+
+                # submit every step whose dependencies are done
+                for name, step in list(pending.items()):
+                    if all(d in results for d in step.dependencies):
+                        running[executor.submit(execute, step, {d: results[d] for d in step.dependencies})] = name
+                        del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+        return results
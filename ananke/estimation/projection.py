@@ -0,0 +1,83 @@
+"""
+Class for computing many linear projections of pseudo-outcomes from one shared Gram matrix, as required
+by the efficient and augmented primal estimators.
+"""
+
+import numpy as np
+import scipy.linalg
+
+
+class ProjectionEngine:
+    """
+    Computes least squares projections E[beta | S] and E[beta | S, V] of a set of responses onto
+    an intercept and subsets of the columns of the data.
+
+    The weighted Gram matrix of all columns and their cross products with every response are computed once.
+    Each projection then only solves a small system in the selected columns, and adding a single column V
+    to a set S is a bordered (rank-one) update of the solution for S rather than a new fit.
+    """
+
+    def __init__(self, data, columns, responses, weights=None):
+        """
+        Constructor.
+
+        :param data: pandas data frame containing the data.
+        :param columns: list of names of columns that may appear in a projection.
+        :param responses: dictionary mapping names of responses to numpy arrays.
+        :param weights: optional numpy array of frequency weights for each sample.
+        """
+
+        self._index = {c: i + 1 for i, c in enumerate(columns)}
+        self._responses = {name: j for j, name in enumerate(responses)}
+
+        self.X = np.column_stack([np.ones(len(data))] + [np.asarray(data[c], dtype=float) for c in columns])
+        R = np.column_stack([np.asarray(r, dtype=float) for r in responses.values()])
+        WX = self.X if weights is None else self.X * np.asarray(weights, dtype=float)[:, None]
+        self.gram = WX.T @ self.X
+        self.cross = WX.T @ R
+
+    def _solve(self, S, rhs):
+        """
+        Solve the normal equations restricted to the columns in S, using the minimum norm
+        solution if the columns are collinear.
+        """
+
+        G = self.gram[np.ix_(S, S)]
+        try:
+            return scipy.linalg.solve(G, rhs, assume_a="pos")
+        except (np.linalg.LinAlgError, scipy.linalg.LinAlgError):
+            return np.linalg.lstsq(G, rhs, rcond=None)[0]
+
+    def project(self, response, covariates, extra=None):
+        """
+        Project a response onto an intercept and a set of covariates, and optionally onto the same set
+        with one more covariate.
+
+        :param response: name of the response.
+        :param covariates: iterable of names of covariates S.
+        :param extra: optional name of an additional covariate V.
+        :return: numpy array of fitted values of E[response | S], and if extra is given, a tuple of
+                 the fitted values of E[response | S] and E[response | S, V].
+        """
+
+        j = self._responses[response]
+        S = [0] + [self._index[c] for c in covariates]
+
+        if extra is None:
+            beta = self._solve(S, self.cross[S, j])
+            return self.X[:, S] @ beta
+
+        # solve for the coefficients of S and the regression of V on S with a single factorization
+        v = self._index[extra]
+        solution = self._solve(S, np.column_stack([self.cross[S, j], self.gram[S, v]]))
+        beta, u = solution[:, 0], solution[:, 1]
+        fitted = self.X[:, S] @ beta
+        if v in S:
+            return fitted, fitted
+
+        # the part of V not explained by S, and its coefficient in the extended regression
+        schur = self.gram[v, v] - self.gram[S, v] @ u
+        if schur <= 1e-12 * max(self.gram[v, v], 1e-300):
+            return fitted, fitted
+        coef = (self.cross[v, j] - self.gram[S, v] @ beta) / schur
+        return fitted, fitted + coef * (self.X[:, v] - self.X[:, S] @ u)
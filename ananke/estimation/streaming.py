@@ -0,0 +1,201 @@
+"""
+Out-of-core estimation: reading datasets in chunks and fitting the continuous (Gaussian) and binary (logistic)
+nuisance models from sufficient statistics accumulated over the chunks, so memory is bounded by the chunk size.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from .glm import DesignCache, GLMFit
+
+
+def chunk_reader(source, columns=None, chunksize=100000):
+    """
+    Get a function that iterates over a dataset in chunks. Estimation reads the dataset several times,
+    so the source must be readable more than once.
+
+    :param source: path to a CSV or Parquet file, a pandas data frame, a list of pandas data frames,
+                   or a function that returns a new iterator of pandas data frames each time it is called.
+    :param columns: optional list of names of columns to read.
+    :param chunksize: number of rows per chunk when reading files or slicing a data frame.
+    :return: function that returns an iterator of pandas data frames.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        path = str(source)
+        if path.endswith(".parquet") or path.endswith(".pq"):
+            def read():
+                try:
+                    import pyarrow.parquet as pq
+                except ImportError:
+                    raise ImportError("Reading Parquet files requires pyarrow to be installed")
+                for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+                    yield batch.to_pandas()
+            return read
+        return lambda: iter(pd.read_csv(path, usecols=columns, chunksize=chunksize))
+
+    if isinstance(source, pd.DataFrame):
+        return lambda: (source.iloc[start:start + chunksize] for start in range(0, len(source), chunksize))
+
+    if isinstance(source, (list, tuple)):
+        return lambda: iter(source)
+
+    if callable(source):
+        return source
+
+    raise ValueError("Streaming requires a path, a data frame, a list of data frames, or a function returning "
+                     "an iterator of data frames, as the data is read more than once")
+
+
+def stream_state_spaces(reader, columns, max_categories=10):
+    """
+    Detect the state space of columns in a single pass over the chunks: binary if every value is 0 or 1,
+    categorical if the column takes at most max_categories distinct values, else continuous.
+
+    :param reader: function that returns an iterator of pandas data frames.
+    :param columns: list of names of columns.
+    :param max_categories: maximum number of distinct values of a categorical variable.
+    :return: dictionary mapping the names of columns to their state space.
+    """
+
+    binary = {c: True for c in columns}
+    distinct = {c: set() for c in columns}
+    for chunk in reader():
+        for c in columns:
+            values = chunk[c].to_numpy()
+            if binary[c]:
+                binary[c] = bool(np.isin(values, [0, 1]).all())
+            if len(distinct[c]) <= max_categories:
+                distinct[c].update(np.unique(values)[:max_categories + 1].tolist())
+
+    return {c: "binary" if binary[c] else "categorical" if len(distinct[c]) <= max_categories else "continuous"
+            for c in columns}
+
+
+class StreamingGLM:
+    """
+    Binary or continuous GLM with an intercept, fit from sufficient statistics accumulated over chunks of data.
+    A Gaussian GLM is fit from the Gram matrix X'X and X'y in a single pass, while a logistic regression runs one
+    iteration of iteratively reweighted least squares per pass, started from the same means as statsmodels.
+    """
+
+    def __init__(self, response, covariates, family, max_iter=100, tol=1e-10):
+        """
+        Constructor.
+
+        :param response: name of the response.
+        :param covariates: list of names of covariates.
+        :param family: string specifying the family: binomial or gaussian.
+        :param max_iter: maximum number of passes for the logistic regression.
+        :param tol: tolerance on the relative change in deviance.
+        """
+
+        self.response = response
+        self.covariates = list(covariates)
+        self.family = family
+        self.max_iter = max_iter
+        self.tol = tol
+        self.params = None
+        self.converged = False
+        self.n_passes = 0
+        self._deviance = np.inf
+
+    def start_pass(self):
+        """
+        Reset the statistics accumulated in a pass.
+
+        :return: None.
+        """
+
+        dimension = len(self.covariates) + 1
+        self._gram = np.zeros((dimension, dimension))
+        self._cross = np.zeros(dimension)
+        self._pass_deviance = 0.0
+
+    def accumulate(self, chunk):
+        """
+        Add the statistics of a chunk of data to the current pass.
+
+        :param chunk: pandas data frame containing the response and covariates.
+        :return: None.
+        """
+
+        X = np.column_stack([np.ones(len(chunk))] + [chunk[c].to_numpy(dtype=float) for c in self.covariates])
+        y = chunk[self.response].to_numpy(dtype=float)
+
+        if self.family != "binomial":
+            self._gram += X.T @ X
+            self._cross += X.T @ y
+            return
+
+        # working response and weights of IRLS at the current parameters
+        if self.params is None:
+            mu = (y + 0.5) / 2
+            eta = np.log(mu / (1 - mu))
+        else:
+            eta = X @ self.params
+            mu = np.clip(expit(eta), 1e-15, 1 - 1e-15)
+            self._pass_deviance += -2 * np.sum(y * np.log(mu) + (1 - y) * np.log(1 - mu))
+        variance = np.clip(mu * (1 - mu), 1e-12, None)
+        z = eta + (y - mu) / variance
+        self._gram += (X * variance[:, None]).T @ X
+        self._cross += (X * variance[:, None]).T @ z
+
+    def end_pass(self):
+        """
+        Update the parameters from the statistics of the current pass.
+
+        :return: None.
+        """
+
+        params = np.linalg.lstsq(self._gram, self._cross, rcond=None)[0]
+        self.n_passes += 1
+
+        if self.family != "binomial":
+            self.params = params
+            self.converged = True
+            return
+
+        # the deviance of the current parameters was accumulated in this pass, so keep them if it has converged
+        if self.params is not None:
+            deviance = self._pass_deviance
+            if abs(deviance - self._deviance) <= self.tol * (abs(deviance) + self.tol):
+                self.converged = True
+                return
+            self._deviance = deviance
+        self.params = params
+        self.converged = self.n_passes >= self.max_iter
+
+    def model(self):
+        """
+        Get the fitted model.
+
+        :return: GLMFit predicting from pandas data frames.
+        """
+
+        return GLMFit(self.family, self.covariates, True, self.params, DesignCache(maxsize=1))
+
+
+def fit_streaming(reader, models):
+    """
+    Fit several streaming GLMs together, reading the data once per pass until all of them have converged.
+
+    :param reader: function that returns an iterator of pandas data frames.
+    :param models: list of StreamingGLM.
+    :return: list of fitted models as GLMFit.
+    """
+
+    while not all(model.converged for model in models):
+        active = [model for model in models if not model.converged]
+        for model in active:
+            model.start_pass()
+        for chunk in reader():
+            for model in active:
+                model.accumulate(chunk)
+        for model in active:
+            model.end_pass()
+
+    return [model.model() for model in models]
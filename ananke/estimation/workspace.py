@@ -0,0 +1,41 @@
+"""
+Class for a columnar workspace that holds the data used during estimation without modifying the user's data.
+"""
+
+
+class Workspace:
+    """
+    Columnar workspace over a pandas data frame. The workspace frame is a shallow copy of the data, so it shares
+    the memory of every column with the user's data frame, while scratch columns (e.g. the column of ones or
+    pseudo-outcomes) are only added to the workspace. The user's data frame is never modified, so it does not
+    need to be copied before estimation and can be shared by concurrent estimations with separate effects.
+    """
+
+    def __init__(self, data):
+        """
+        Constructor.
+
+        :param data: pandas data frame containing the data.
+        """
+
+        self.frame = data.copy(deep=False)
+        self.scratch = []
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __contains__(self, name):
+        return name in self.frame.columns
+
+    def add(self, name, values):
+        """
+        Add or replace a scratch column of the workspace.
+
+        :param name: name of the column.
+        :param values: numpy array or scalar of values.
+        :return: None.
+        """
+
+        self.frame[name] = values
+        if name not in self.scratch:
+            self.scratch.append(name)
@@ -2,8 +2,16 @@
 Class for missing data acyclic directed mixed graphs
 """
 
+from collections import namedtuple
+
 from .admg import ADMG
 
+# the vertices associated with a single variable in a missing data graph, None if a vertex is absent
+MissingVariable = namedtuple("MissingVariable", ["counterfactual", "indicator", "proxy"])
+
+# vertex name prefixes and the field of MissingVariable they correspond to
+_ROLES = {"X": "counterfactual", "R": "indicator", "Xp": "proxy"}
+
 
 class MissingADMG(ADMG):
 
@@ -20,20 +28,72 @@ class MissingADMG(ADMG):
         :param kwargs:
         """
 
+        # missing data specific stuff: parse every vertex name once into a registry of variables
+        vertices = list(vertices)
+        self.counterfactuals, self.indicators, self.proxies = [], [], []
+        members = {"counterfactual": self.counterfactuals, "indicator": self.indicators, "proxy": self.proxies}
+        self._base_names = {}
+        roles = {}
+        for v in vertices:
+            prefix, _, name = v.partition('_')
+            if prefix in _ROLES and name:
+                self._base_names[v] = name
+                roles.setdefault(name, {})[_ROLES[prefix]] = v
+                members[_ROLES[prefix]].append(v)
+
+        self.missing_variables = {name: MissingVariable(r.get("counterfactual"), r.get("indicator"), r.get("proxy"))
+                                  for name, r in roles.items()}
+        self._proxy_set = set(self.proxies)
+
+        # insert the edges X_name -> Xp_name <- R_name for every counterfactual in one batch with the
+        # other edges, so the graph is built and checked once
+        proxy_edges = []
+        for v in self.counterfactuals:
+            var_name = self._base_names[v]
+            proxy_edges += [(v, 'Xp_' + var_name), ('R_' + var_name, 'Xp_' + var_name)]
+
         # initialize vertices in ADMG
-        super().__init__(vertices=vertices, di_edges=di_edges, bi_edges=bi_edges, **kwargs)
+        super().__init__(vertices=vertices, di_edges=list(di_edges) + proxy_edges, bi_edges=bi_edges, **kwargs)
+
+    def variable_of(self, vertex):
+        """
+        Get the registry entry for the variable a vertex belongs to.
 
-        # missing data specific stuff
-        self.counterfactuals = [v for v in self.vertices if v.startswith('X_')]
-        self.indicators = [v for v in self.vertices if v.startswith('R_')]
-        self.proxies = [v for v in self.vertices if v.startswith('Xp_')]
+        :param vertex: name of a counterfactual, indicator, or proxy vertex.
+        :return: MissingVariable tuple of (counterfactual, indicator, proxy) vertex names.
+        """
 
-        for v in self.counterfactuals:
-            if v.startswith('X_'):
-                var_name = v.split('_')[1]
-                self.add_diedge(v, 'Xp_' + var_name)
-                self.add_diedge('R_' + var_name, 'Xp_' + var_name)
+        return self.missing_variables[self._base_names[vertex]]
+
+    def indicator_of(self, vertex):
+        """
+        Get the missingness indicator R_name corresponding to a vertex.
+
+        :param vertex: name of a counterfactual or proxy vertex.
+        :return: name of the indicator, None if the graph has no such vertex.
+        """
+
+        return self.variable_of(vertex).indicator
+
+    def proxy_of(self, vertex):
+        """
+        Get the proxy Xp_name corresponding to a vertex.
+
+        :param vertex: name of a counterfactual or indicator vertex.
+        :return: name of the proxy, None if the graph has no such vertex.
+        """
+
+        return self.variable_of(vertex).proxy
+
+    def counterfactual_of(self, vertex):
+        """
+        Get the counterfactual X_name corresponding to a vertex.
+
+        :param vertex: name of an indicator or proxy vertex.
+        :return: name of the counterfactual, None if the graph has no such vertex.
+        """
 
+        return self.variable_of(vertex).counterfactual
 
     def draw(self, direction=None):
         """
@@ -54,11 +114,11 @@ class MissingADMG(ADMG):
 
         for parent, child in self.di_edges:
             # special clause for SWIGs
-            if child.startswith('Xp_'):
+            if child in self._proxy_set:
                 dot.edge(parent, child, color='grey')
             else:
                 dot.edge(parent, child, color='blue')
         for sib1, sib2 in self.bi_edges:
             dot.edge(sib1, sib2, dir='both', color='red')
 
-        return dot
\ No newline at end of file
+        return dot
@@ -1,2 +1,4 @@
 from .one_line import *
-from .missing_id import *
\ No newline at end of file
+from .missing_id import *
+from .functional import *
+from .cache import *
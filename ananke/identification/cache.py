@@ -0,0 +1,292 @@
+"""
+Class for caching identification results across relabelings of the same causal model.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict, namedtuple
+
+from .one_line import OneLineID, OneLineGID, OnelineAID
+
+# result of an identification query
+# identified: boolean indicating whether the query is identified
+# fixing_orders: dictionary mapping each kernel's set of vertices (frozenset) to a tuple giving a valid fixing order
+# sources: dictionary mapping each kernel's set of vertices to the index of the experiment it is identified from,
+#          None for queries on the observed distribution
+IdentificationResult = namedtuple("IdentificationResult", ["identified", "fixing_orders", "sources"])
+
+
+def _refine(vertices, colors, adjacency):
+    """
+    Refine a vertex coloring until vertices of the same color have the same number of
+    parents, children, and siblings of every color.
+
+    :param vertices: list of vertex names.
+    :param colors: dictionary mapping vertices to integer colors.
+    :param adjacency: dictionary mapping vertices to tuples of (parents, children, siblings).
+    :return: dictionary mapping vertices to refined integer colors.
+    """
+
+    n_colors = len(set(colors.values()))
+    while True:
+        signatures = {v: (colors[v],) + tuple(tuple(sorted(colors[u] for u in group)) for group in adjacency[v])
+                      for v in vertices}
+        relabel = {s: i for i, s in enumerate(sorted(set(signatures.values())))}
+        colors = {v: relabel[signatures[v]] for v in vertices}
+        if len(relabel) == n_colors:
+            return colors
+        n_colors = len(relabel)
+
+
+def canonical_labeling(graph, colors=None):
+    """
+    Compute a canonical ordering of the vertices of a graph by color refinement and individualization.
+    Isomorphic graphs (respecting the initial colors) receive identical encodings.
+
+    The search is exponential in the worst case (highly symmetric graphs) but is fast
+    for the sparse, asymmetric graphs that arise as causal models.
+
+    :param graph: Graph with directed and bidirected edges.
+    :param colors: optional dictionary mapping vertices to comparable initial colors, e.g. their role in a query.
+    :return: list of vertices in canonical order and a hashable encoding of the graph in that order.
+    """
+
+    vertices = list(graph.vertices)
+    adjacency = {v: ([p.name for p in graph.vertices[v].parents],
+                     [c.name for c in graph.vertices[v].children],
+                     [s.name for s in graph.vertices[v].siblings]) for v in vertices}
+    initial = {v: (colors[v] if colors else 0, graph.vertices[v].fixed) for v in vertices}
+    relabel = {c: i for i, c in enumerate(sorted(set(initial.values())))}
+    initial = {v: relabel[initial[v]] for v in vertices}
+
+    def encode(order):
+        index = {v: i for i, v in enumerate(order)}
+        di_edges = tuple(sorted((index[u], index[v]) for u, v in graph.di_edges))
+        bi_edges = tuple(sorted(tuple(sorted((index[u], index[v]))) for u, v in graph.bi_edges))
+        return tuple(initial[v] for v in order), di_edges, bi_edges
+
+    def search(colors):
+        colors = _refine(vertices, colors, adjacency)
+        cells = {}
+        for v in vertices:
+            cells.setdefault(colors[v], []).append(v)
+
+        # a discrete coloring gives a complete ordering of the vertices
+        target = min((c for c in cells if len(cells[c]) > 1), default=None)
+        if target is None:
+            order = sorted(vertices, key=colors.get)
+            return encode(order), order
+
+        # otherwise individualize each vertex of the first non-trivial cell and keep the smallest encoding
+        best = None
+        for v in cells[target]:
+            individualized = {u: 2 * c + (1 if c == target and u != v else 0) for u, c in colors.items()}
+            candidate = search(individualized)
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+        return best
+
+    encoding, order = search(initial)
+    return order, encoding
+
+
+class IdentificationCache:
+    """
+    Caching front end for one-line ID, GID, and AID queries.
+
+    Results are keyed by a canonical form of the graph and the query that is invariant to relabeling
+    the vertices, and are translated back to the vertex names of each caller. Queries on graphs with
+    nontrivial automorphisms may occasionally miss the cache but never return a wrong result.
+    """
+
+    def __init__(self, maxsize=128, path=None):
+        """
+        Constructor.
+
+        :param maxsize: maximum number of results held in memory, least recently used results are evicted first.
+        :param path: optional path to a folder used as a persistent tier that can be shared by worker processes.
+        """
+
+        self.maxsize = maxsize
+        self.path = path
+        self._memory = OrderedDict()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if path is not None and not os.path.exists(path):
+            os.makedirs(path, exist_ok=True)
+
+    def clear(self):
+        """
+        Clear the memory tier of the cache and reset statistics. Files in the persistent tier are kept.
+
+        :return: None.
+        """
+
+        self._memory.clear()
+        for k in self.stats:
+            self.stats[k] = 0
+
+    def _get(self, key):
+        """
+        Look up a key in the memory tier and then the persistent tier.
+        """
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.stats["hits"] += 1
+            return self._memory[key]
+
+        if self.path is not None:
+            try:
+                with open(self._file(key), "rb") as f:
+                    stored_key, result = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                stored_key = None
+            if stored_key == key:
+                self.stats["disk_hits"] += 1
+                self._put_memory(key, result)
+                return result
+
+        self.stats["misses"] += 1
+        return None
+
+    def _put_memory(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _put(self, key, result):
+        """
+        Store a result in both tiers. Files are written atomically so concurrent workers never read partial results.
+        """
+
+        self._put_memory(key, result)
+        if self.path is not None:
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((key, result), f)
+            os.replace(tmp_path, self._file(key))
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha256(repr(key).encode()).hexdigest() + ".pkl")
+
+    def _lookup(self, kind, graph, treatments, outcomes, experiments, run):
+        """
+        Shared logic for all query types: canonicalize, look up, and translate the result.
+
+        :param kind: string naming the type of query.
+        :param graph: ADMG the query is posed on.
+        :param treatments: iterable of treatment vertices.
+        :param outcomes: iterable of outcome vertices.
+        :param experiments: list of (random vertices, fixed vertices, di edges, bi edges) tuples describing
+                            the experiments available to the query.
+        :param run: function that runs the identification algorithm and returns an IdentificationResult.
+        :return: IdentificationResult using the caller's vertex names.
+        """
+
+        treatments, outcomes = set(treatments), set(outcomes)
+        colors = {v: (v in treatments, v in outcomes, sum(v in e[1] for e in experiments)) for v in graph.vertices}
+        order, encoding = canonical_labeling(graph, colors)
+        index = {v: i for i, v in enumerate(order)}
+
+        def encode_experiment(experiment):
+            random, fixed, di_edges, bi_edges = experiment
+            return (tuple(sorted(index[v] for v in random)), tuple(sorted(index[v] for v in fixed)),
+                    tuple(sorted((index[u], index[v]) for u, v in di_edges)),
+                    tuple(sorted(tuple(sorted((index[u], index[v]))) for u, v in bi_edges)))
+
+        encoded = [encode_experiment(e) for e in experiments]
+        permutation = sorted(range(len(encoded)), key=encoded.__getitem__)
+        key = (kind, encoding, tuple(sorted(index[v] for v in treatments)),
+               tuple(sorted(index[v] for v in outcomes)), tuple(encoded[i] for i in permutation))
+
+        canonical = self._get(key)
+        if canonical is None:
+            result = run()
+
+            # translate to canonical labels, and experiment indices to positions in the sorted list
+            position = {i: p for p, i in enumerate(permutation)}
+            canonical = IdentificationResult(
+                result.identified,
+                {frozenset(index[v] for v in s): tuple(index[v] for v in o) for s, o in result.fixing_orders.items()},
+                None if result.sources is None else
+                {frozenset(index[v] for v in s): position[i] for s, i in result.sources.items()})
+            self._put(key, canonical)
+
+        return IdentificationResult(
+            canonical.identified,
+            {frozenset(order[i] for i in s): tuple(order[i] for i in o) for s, o in canonical.fixing_orders.items()},
+            None if canonical.sources is None else
+            {frozenset(order[i] for i in s): permutation[p] for s, p in canonical.sources.items()})
+
+    def one_line_id(self, graph, treatments, outcomes):
+        """
+        Cached version of the one-line ID algorithm (OneLineID).
+
+        :param graph: ADMG on which the query will run.
+        :param treatments: iterable of names of variables being intervened on.
+        :param outcomes: iterable of names of variables whose outcomes we are interested in.
+        :return: IdentificationResult with a fixing order for each district of G_{Y*}.
+        """
+
+        def run():
+            one_id = OneLineID(graph, treatments, outcomes)
+            identified = one_id.id()
+            return IdentificationResult(identified, {frozenset(d): tuple(o) for d, o in one_id.fixing_orders.items()},
+                                        None)
+
+        return self._lookup("one-line", graph, treatments, outcomes, [], run)
+
+    def one_line_gid(self, graph, interventions, outcomes, experiments=[set()]):
+        """
+        Cached version of the one-line GID algorithm (OneLineGID).
+
+        :param graph: ADMG on which the query will run.
+        :param interventions: iterable of treatment variables.
+        :param outcomes: iterable of outcome variables.
+        :param experiments: list of sets denoting the interventions of the available experimental distributions.
+        :return: IdentificationResult with the experiment and fixing order used for each required intrinsic set.
+        """
+
+        def run():
+            gid = OneLineGID(graph, interventions, outcomes)
+            identified = gid.id(experiments=experiments)
+            fixing_orders, sources = {}, {}
+            for iset in gid.required_intrinsic_sets:
+                if iset in gid.allowed_intrinsic_dict:
+                    fixed = gid.allowed_intrinsic_dict[iset]
+                    fixing_orders[iset] = tuple(gid.fixing_orders[frozenset(fixed)][iset])
+                    sources[iset] = [set(e) for e in experiments].index(set(fixed))
+            return IdentificationResult(identified, fixing_orders, sources)
+
+        described = [(set(graph.vertices) - set(e), set(e), [], []) for e in experiments]
+        return self._lookup("gid", graph, interventions, outcomes, described, run)
+
+    def one_line_aid(self, graph, treatments, outcomes, experiments):
+        """
+        Cached version of the one-line AID algorithm (OnelineAID).
+
+        :param graph: ADMG on which the query will run.
+        :param treatments: iterable of treatment variables.
+        :param outcomes: iterable of outcome variables.
+        :param experiments: list of ADMGs representing the available experimental distributions.
+        :return: IdentificationResult with the experiment and fixing order used for each required intrinsic set.
+        """
+
+        def run():
+            aid = OnelineAID(graph, treatments, outcomes)
+            identified = aid.id(experiments=experiments)
+            fixing_orders, sources = {}, {}
+            for iset in aid.required_intrinsic_sets:
+                if iset in aid.allowed_intrinsic_dict:
+                    index = aid.allowed_intrinsic_dict[iset]
+                    fixing_orders[iset] = tuple(aid.fixing_orders[index][iset])
+                    sources[iset] = index
+            return IdentificationResult(identified, fixing_orders, sources)
+
+        described = [(set(e.vertices) - set(e.fixed), set(e.fixed), e.di_edges, e.bi_edges) for e in experiments]
+        return self._lookup("aid", graph, treatments, outcomes, described, run)
@@ -0,0 +1,320 @@
+"""
+Structured representations of identifying functionals and a compiled evaluator for discrete data.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class Distribution:
+    """
+    Leaf of an identifying functional: an observed (or experimental) distribution p(V \\ S | do(S)).
+    """
+
+    def __init__(self, vertices, fixed=()):
+        """
+        Constructor.
+
+        :param vertices: iterable of names of vertices the distribution is defined over.
+        :param fixed: iterable of names of vertices that were intervened on, empty for the observed law.
+        """
+
+        self.vertices = frozenset(vertices)
+        self.fixed = frozenset(fixed)
+        self.random = self.vertices - self.fixed
+        self.key = ("p", self.vertices, self.fixed)
+
+    def __str__(self):
+        if not self.fixed:
+            return "p(V)"
+        return "p({0} | do({1}))".format(",".join(sorted(self.random)), ",".join(sorted(self.fixed)))
+
+
+class Fix:
+    """
+    The fixing operator Φ_V applied to a kernel: q / q(V | mb(V)).
+    """
+
+    def __init__(self, vertex, blanket, operand):
+        """
+        Constructor.
+
+        :param vertex: name of the vertex being fixed.
+        :param blanket: Markov blanket of the vertex in the CADMG the operand kernel is associated with.
+        :param operand: Distribution or Fix node the operator is applied to.
+        """
+
+        self.vertex = vertex
+        self.blanket = frozenset(blanket)
+        self.operand = operand
+        self.random = operand.random - {vertex}
+        self.key = ("fix", vertex, operand.key)
+
+    @property
+    def leaf(self):
+        """
+        The distribution at the bottom of the chain of fixing operations.
+
+        :return: Distribution object.
+        """
+
+        node = self.operand
+        while isinstance(node, Fix):
+            node = node.operand
+        return node
+
+    @property
+    def order(self):
+        """
+        The sequence of vertices fixed to arrive at this kernel, in the order they were fixed.
+
+        :return: list of vertex names.
+        """
+
+        node, order = self, []
+        while isinstance(node, Fix):
+            order.append(node.vertex)
+            node = node.operand
+        return list(reversed(order))
+
+    def __str__(self):
+        return "Φ" + ",".join(reversed(self.order)) + " " + str(self.leaf)
+
+
+class Kernel:
+    """
+    A kernel q_D(D | pa(D)) obtained by a sequence of fixing operations.
+    """
+
+    def __init__(self, district, parents, operand):
+        """
+        Constructor.
+
+        :param district: names of vertices in the (intrinsic) set D.
+        :param parents: names of the parents of D outside of D.
+        :param operand: Distribution or Fix node whose result is the kernel.
+        """
+
+        self.district = frozenset(district)
+        self.parents = frozenset(parents)
+        self.operand = operand
+        self.key = ("kernel", self.district, operand.key)
+
+    def __str__(self):
+        return "q({0} | {1}) = {2}".format(",".join(sorted(self.district)), ",".join(sorted(self.parents)),
+                                           self.operand)
+
+
+class Functional:
+    """
+    An identifying functional for p(Y(a)) of the form Σ_{Y* \\ Y} ∏_D q_D(D | pa(D)) |_{A=a}.
+    """
+
+    def __init__(self, treatments, outcomes, summed, kernels):
+        """
+        Constructor.
+
+        :param treatments: names of vertices being intervened on.
+        :param outcomes: names of vertices whose counterfactual distribution is identified.
+        :param summed: names of vertices that are summed out.
+        :param kernels: list of Kernel objects whose product is summed.
+        """
+
+        self.treatments = list(treatments)
+        self.outcomes = list(outcomes)
+        self.summed = sorted(summed)
+        self.kernels = list(kernels)
+
+    def __str__(self):
+        functional = "Σ" + ",".join(self.summed) + " " if self.summed else ""
+        return functional + " ".join("[" + str(kernel) + "]" for kernel in self.kernels)
+
+    def compile(self):
+        """
+        Compile the functional into an evaluator for discrete data.
+
+        :return: FunctionalEvaluator object.
+        """
+
+        return FunctionalEvaluator(self)
+
+
+def fixing_chain(graph, order, leaf):
+    """
+    Build the chain of fixing operators corresponding to a valid fixing order.
+
+    :param graph: CADMG that the leaf distribution is Markov with respect to. It is modified in place.
+    :param order: list of vertices to be fixed, in order.
+    :param leaf: Distribution object the chain starts from.
+    :return: the final node in the chain and the CADMG obtained after fixing.
+    """
+
+    node = leaf
+    for v in order:
+        node = Fix(v, graph.markov_blanket([v]), node)
+        graph.fix([v])
+    return node, graph
+
+
+class FunctionalEvaluator:
+    """
+    Vectorized plug-in evaluation of an identifying functional on discrete data.
+
+    Every distribution, kernel, and intermediate fixing result is held as a dense NumPy tensor
+    with one axis per variable (absent variables have axes of length one), so memory grows with the
+    product of the state space sizes of the variables involved.
+    """
+
+    def __init__(self, functional):
+        """
+        Constructor. Orders the distinct nodes of the expression so that each one is computed once.
+
+        :param functional: Functional object to be evaluated.
+        """
+
+        self.functional = functional
+        self.steps = []
+        seen = set()
+
+        def visit(node):
+            if node.key in seen:
+                return
+            if not isinstance(node, Distribution):
+                visit(node.operand)
+            seen.add(node.key)
+            self.steps.append(node)
+
+        for kernel in functional.kernels:
+            visit(kernel)
+
+        variables = set(functional.treatments) | set(functional.outcomes) | set(functional.summed)
+        for node in self.steps:
+            if isinstance(node, Distribution):
+                variables |= node.vertices
+        self.variables = sorted(variables)
+        self._axis = {v: i for i, v in enumerate(self.variables)}
+
+    def _datasets(self, data):
+        """
+        Map each leaf distribution to the data frame it is estimated from.
+        """
+
+        if isinstance(data, pd.DataFrame):
+            data = {frozenset(): data}
+        datasets = {}
+        for node in self.steps:
+            if isinstance(node, Distribution):
+                key = frozenset(node.fixed)
+                if key not in data:
+                    raise KeyError("No data supplied for p(V | do({}))".format(",".join(sorted(key))))
+                datasets[node.key] = data[key]
+        return datasets
+
+    def _joint(self, data, vertices, categories):
+        """
+        Count table over the given vertices as a tensor aligned with the global variable order.
+        """
+
+        shape = [len(categories[v]) if v in vertices else 1 for v in self.variables]
+        codes = [np.searchsorted(categories[v], data[v].values) if v in vertices else np.zeros(len(data), int)
+                 for v in self.variables]
+        counts = np.bincount(np.ravel_multi_index(codes, shape), minlength=int(np.prod(shape)))
+        return counts.reshape(shape).astype(float)
+
+    def _sum(self, tensor, vertices):
+        axes = tuple(self._axis[v] for v in vertices)
+        return tensor.sum(axis=axes, keepdims=True) if axes else tensor
+
+    def _fix(self, q, node):
+        """
+        Apply Φ_V to the kernel q by dividing through by q(V | mb(V)).
+        """
+
+        marginal = self._sum(q, node.operand.random - node.blanket - {node.vertex})
+        conditional = _divide(marginal, self._sum(marginal, [node.vertex]))
+        return _divide(q, conditional)
+
+    def _kernel(self, q, node, joint):
+        """
+        Reduce a fixing result to a function of D and pa(D) only.
+
+        In the population the kernel does not depend on the remaining arguments. With empirical inputs
+        it can, so they are averaged out with respect to their observed distribution given pa(D).
+        """
+
+        extras = set(self.variables) - node.district - node.parents
+        if not extras:
+            return q
+        weights = self._sum(joint, set(self.variables) - extras - node.parents)
+        weights = _divide(weights, self._sum(weights, extras))
+        return self._sum(q * weights, extras)
+
+    def evaluate(self, data, assignment):
+        """
+        Evaluate p(Y(a)) on discrete data.
+
+        :param data: pandas data frame with the observed data, or a dictionary mapping frozensets of intervened
+                     vertices to data frames sampled from the corresponding experimental distributions.
+        :param assignment: dictionary mapping each treatment to the value it is set to.
+        :return: pandas series indexed by values of the outcomes holding the estimated p(Y(a)).
+        """
+
+        datasets = self._datasets(data)
+        frames = list({id(frame): frame for frame in datasets.values()}.values())
+        categories = {}
+        for v in self.variables:
+            values = [frame[v].values for frame in frames if v in frame.columns]
+            categories[v] = np.unique(np.concatenate(values)) if values else np.array([assignment.get(v)])
+
+        results = {}
+        joints = {}
+        for node in self.steps:
+            if isinstance(node, Distribution):
+                joint = self._joint(datasets[node.key], node.vertices, categories)
+                q = joint / joint.sum()
+                if node.fixed:
+                    q = _divide(q, self._sum(q, node.random))
+                joints[node.key] = joint
+                results[node.key] = q
+            elif isinstance(node, Fix):
+                results[node.key] = self._fix(results[node.operand.key], node)
+            else:
+                leaf = node.operand.leaf if isinstance(node.operand, Fix) else node.operand
+                results[node.key] = self._kernel(results[node.operand.key], node, joints[leaf.key])
+
+        product = np.ones([1] * len(self.variables))
+        for kernel in self.functional.kernels:
+            product = product * results[kernel.key]
+
+        # set treatments to their assigned values and sum out everything but the outcomes
+        index = [slice(None)] * len(self.variables)
+        for A in self.functional.treatments:
+            i = 0
+            if product.shape[self._axis[A]] > 1:
+                i = np.searchsorted(categories[A], assignment[A])
+                if i == len(categories[A]) or categories[A][i] != assignment[A]:
+                    raise ValueError("{} = {} is not observed in the data".format(A, assignment[A]))
+            index[self._axis[A]] = slice(i, i + 1)
+        product = self._sum(product[tuple(index)], self.functional.summed)
+
+        outcomes = self.functional.outcomes
+        axes = [self._axis[Y] for Y in outcomes]
+        others = tuple(i for i in range(len(self.variables)) if i not in axes)
+        table = np.squeeze(product, axis=others).transpose(np.argsort(np.argsort(axes)))
+        shape = [len(categories[Y]) for Y in outcomes]
+        table = np.broadcast_to(table, shape)
+
+        if len(outcomes) == 1:
+            idx = pd.Index(categories[outcomes[0]], name=outcomes[0])
+        else:
+            idx = pd.MultiIndex.from_product([categories[Y] for Y in outcomes], names=outcomes)
+        return pd.Series(table.ravel(), index=idx)
+
+
+def _divide(numerator, denominator):
+    """
+    Elementwise division that treats 0/0 as 0, as happens for cells with no support.
+    """
+
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape),
+                     where=denominator != 0)
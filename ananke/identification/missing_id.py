@@ -2,6 +2,68 @@
 Class for missing ID
 """
 
+from ananke.graphs import MissingADMG
+
+
+class _DistrictIndex:
+    """
+    Union-find structure over bidirected edges that keeps districts up to date as edges are added.
+    """
+
+    def __init__(self, vertices):
+        """
+        Constructor.
+
+        :param vertices: iterable of vertex names, each starting in its own district.
+        """
+
+        self._root = {v: v for v in vertices}
+        self._members = {v: {v} for v in vertices}
+
+    def find(self, v):
+        """
+        Get the representative of the district containing v.
+
+        :param v: name of vertex.
+        :return: name of the representative vertex.
+        """
+
+        root = v
+        while self._root[root] != root:
+            root = self._root[root]
+
+        # compress the path so later lookups are constant time
+        while self._root[v] != root:
+            self._root[v], v = root, self._root[v]
+        return root
+
+    def add_biedge(self, sib1, sib2):
+        """
+        Merge the districts joined by a bidirected edge.
+
+        :param sib1: endpoint 1 of edge.
+        :param sib2: endpoint 2 of edge.
+        :return: None.
+        """
+
+        root1, root2 = self.find(sib1), self.find(sib2)
+        if root1 == root2:
+            return
+        if len(self._members[root1]) < len(self._members[root2]):
+            root1, root2 = root2, root1
+        self._root[root2] = root1
+        self._members[root1] |= self._members.pop(root2)
+
+    def district(self, v):
+        """
+        Get the district of a vertex.
+
+        :param v: name of vertex.
+        :return: set of vertices in the district.
+        """
+
+        return self._members[self.find(v)]
+
 
 class MissingFullID:
 
@@ -14,31 +76,73 @@ class MissingFullID:
 
         self.graph = graph
 
-    def id(self):
+    def _build_index(self):
         """
-        Function to ID the full law
+        Index the graph once so that each Markov blanket query only touches the vertices involved.
 
-        :return: boolean is ID or not
+        :return: None.
+        """
+
+        # pair every missingness indicator R_i with its counterfactual X_i, using the
+        # variable registry of missing data graphs instead of parsing names where possible
+        if isinstance(self.graph, MissingADMG):
+            self._indicators = set(self.graph.indicators)
+            pairs = ((R, self.graph.counterfactual_of(R)) for R in self.graph.indicators)
+            self._counterfactual_of = {R: X for R, X in pairs if X}
+        else:
+            self._indicators = {v for v in self.graph.vertices if v.startswith('R_')}
+            self._counterfactual_of = {R: 'X_' + R[len('R_'):] for R in self._indicators}
+
+        self._parents = {v: {p.name for p in self.graph.vertices[v].parents} for v in self.graph.vertices}
+        self._districts = _DistrictIndex(self.graph.vertices)
+        for sib1, sib2 in self.graph.bi_edges:
+            self._districts.add_biedge(sib1, sib2)
+
+    def _markov_blanket(self, vertices):
+        """
+        Get the Markov blanket of a set of vertices using the district index.
+
+        :param vertices: set of vertex names.
+        :return: set corresponding to Markov blanket.
         """
 
-        for Ri in self.graph.vertices:
+        blanket = set()
+        for root in {self._districts.find(v) for v in vertices}:
+            blanket |= self._districts.district(root)
+        for v in list(blanket):
+            blanket |= self._parents[v]
+        return blanket - vertices
 
-            # Only look at the missingness indicators in the list of vertices
-            if not Ri.startswith('R_'):
-                continue
+    def colluding_paths(self):
+        """
+        Find every pair (R_i, X_i) connected by a colluding path.
+
+        :return: sorted list of tuples (R_i, X_i), empty if the full law is ID.
+        """
+
+        self._build_index()
+        violations = []
+
+        for Ri, Xi in self._counterfactual_of.items():
 
             # Find children of Ri that are not in proxy set Xp
-            child_Ri = set([ v for v in self.graph.children([Ri]) if v.startswith('R_') ])
+            child_Ri = {v.name for v in self.graph.vertices[Ri].children if v.name in self._indicators}
 
             # Find Markov blanket of the set {Ri, child_Ri} and add back child_Ri to the set
-            colluding_path_Ri = self.graph.markov_blanket(set.union({Ri}, child_Ri)).union(child_Ri)
-
-            # Find Xi (the counterfactual X with the corresponding missingness indicator Ri)
-            Xi = 'X_' + Ri.split('_')[1]
+            colluding_path_Ri = self._markov_blanket({Ri} | child_Ri) | child_Ri
 
             # If Xi is in colluding_path_Ri, then there is a colluding path between Ri and Xi.
-            # Therefore, full law is not ID.
             if Xi in colluding_path_Ri:
-                return False
+                violations.append((Ri, Xi))
+
+        return sorted(violations)
+
+    def id(self):
+        """
+        Function to ID the full law
+
+        :return: boolean is ID or not
+        """
 
-        return True
+        # the full law is ID if and only if there are no colluding paths
+        return len(self.colluding_paths()) == 0
@@ -4,6 +4,9 @@ Class for one line ID algorithms.
 
 import copy
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .functional import Distribution, Functional, Kernel, fixing_chain
 
 
 class NotIdentifiedError(Exception):
@@ -105,20 +108,80 @@ class OneLineID:
                 functional += y
         if len(self.ystar) > 1: functional += ' '
 
-        print(self.fixing_orders)
         for district in sorted(list(self.fixing_orders)):
             functional += '\u03A6' + ''.join(reversed(self.fixing_orders[district])) + '(p(V);G) '
         return functional
 
-    # TODO export intermediate CADMGs for visualization
-    def export_intermediates(self, folder="intermediates"):
+    def functional_expression(self):
+        """
+        Creates and returns a structured representation of the identifying functional.
+
+        :return: Functional object that can be compiled into an evaluator for discrete data.
+        """
+
+        if not self.id():
+            raise NotIdentifiedError
+
+        # fixing vertices that are not ancestors of Y* is just a sum, so the kernels are obtained from the
+        # ancestral margin, and the evaluator only builds tables over the variables the query involves
+        ancestral = self.graph.ancestors(self.ystar)
+        kernels = []
+        for district in sorted(self.fixing_orders):
+            order = [v for v in self.fixing_orders[district] if v in ancestral]
+            node, G = fixing_chain(self.graph.subgraph(ancestral), order, Distribution(ancestral))
+            kernels.append(Kernel(district, G.parents(district) - set(district), node))
+
+        return Functional(self.treatments, self.outcomes, self.ystar - set(self.outcomes), kernels)
+
+    def iter_intermediates(self):
+        """
+        Lazily generate the intermediate CADMGs obtained during fixing.
+
+        The CADMGs are computed incrementally from a single trace through the fixing orders: districts whose
+        orders share a prefix share the corresponding fixings, and the graph is only copied where orders diverge.
+        A yielded CADMG is modified once the generator is advanced, so copy it if it needs to be kept.
+
+        :return: generator of tuples (district, list of vertices fixed so far, CADMG).
+        """
+
+        if not self.fixing_orders:
+            self.id()
+
+        # each entry holds a CADMG, the number of vertices fixed in it, and the districts whose orders lead through it
+        stack = [(copy.deepcopy(self.graph), 0, sorted(self.fixing_orders))]
+        while stack:
+
+            G, depth, districts = stack.pop()
+
+            # group the districts by the next vertex in their fixing order
+            branches = {}
+            for district in districts:
+                order = self.fixing_orders[district]
+                if len(order) > depth:
+                    branches.setdefault(order[depth], []).append(district)
+
+            for i, (v, branch) in enumerate(sorted(branches.items())):
+
+                # the last branch can take over the current graph, the others need their own copy
+                G_branch = G if i == len(branches) - 1 else copy.deepcopy(G)
+                G_branch.fix([v])
+                for district in branch:
+                    yield district, self.fixing_orders[district][:depth + 1], G_branch
+                stack.append((G_branch, depth + 1, branch))
+
+    def export_intermediates(self, folder="intermediates", render=True, n_jobs=1):
         """
         Export intermediate CADMGs obtained during fixing.
 
         :param folder: string specifying path to folder where the files will be written.
-        :return: None.
+        :param render: boolean indicating whether to render the graphs with the graphviz binary,
+                       if False only the DOT source is written.
+        :param n_jobs: number of threads used to render the graphs.
+        :return: list of paths to the DOT files that were written.
         """
 
+        from graphviz import Source
+
         # make the folder if it doesn't exist
         if not os.path.exists(folder):
             os.mkdir(folder)
@@ -132,19 +195,24 @@ class OneLineID:
             except Exception as e:
                 print(e)
 
-        # do the fixings and render intermediate CADMGs
-        for district in self.fixing_orders:
+        # do the fixings and collect the DOT source of the intermediate CADMGs
+        sources = {}
+        for district, fixed, G in self.iter_intermediates():
+            file_path = os.path.join(folder, "phi" + "".join(fixed) + "_dis" + "".join(district) + ".gv")
+            sources[file_path] = G.draw().source
 
-            G = copy.deepcopy(self.graph)
+        if not render:
+            for file_path, source in sources.items():
+                Source(source).save(file_path)
+            return list(sources)
 
-            fixed_vars = ""
-            dis_name = "".join(district)
+        # rendering is bound by the graphviz subprocesses, so threads are enough to run them concurrently
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            renders = [executor.submit(Source(source).render, file_path) for file_path, source in sources.items()]
+            for future in renders:
+                future.result()
 
-            for v in self.fixing_orders[district]:
-                fixed_vars += v
-                G.fix(v)
-                G.draw().render(os.path.join(folder,
-                                             "phi" + fixed_vars + "_dis" + dis_name + ".gv"))
+        return list(sources)
 
 
 def get_required_intrinsic_sets(admg):
@@ -236,6 +304,33 @@ class OneLineGID:
 
         return functional
 
+    def functional_expression(self, experiments=[set()]):
+        """
+        Creates and returns a structured representation of the identifying functional.
+
+        :param experiments: A list of sets denoting the interventions of the available experimental distributions.
+        :return: Functional object that can be compiled into an evaluator for discrete data.
+        """
+
+        if not self.id(experiments=experiments):
+            raise NotIdentifiedError
+
+        kernels = []
+        for district in self.Gystar.districts:
+            fixed = self.allowed_intrinsic_dict[frozenset(district)]
+            order = self.fixing_orders[frozenset(fixed)][frozenset(district)]
+            swig = copy.deepcopy(self.graph)
+            swig.fix(fixed)
+
+            # kernels are obtained from the margin of the experiment over the ancestors of Y*, as fixing the
+            # other vertices is just a sum
+            ancestral = swig.ancestors(self.ystar)
+            order = [v for v in order if v in ancestral]
+            node, G = fixing_chain(swig.subgraph(ancestral), order, Distribution(ancestral, fixed))
+            kernels.append(Kernel(district, G.parents(district) - district, node))
+
+        return Functional(self.interventions, self.outcomes, self.ystar - set(self.outcomes), kernels)
+
     def id(self, experiments=[set()]):
         """
         Checks if identification query is identified given the set of experimental distributions/
@@ -312,6 +407,28 @@ class OnelineAID:
 
         return is_id
 
+    def functional_expression(self, experiments):
+        """
+        Creates and returns a structured representation of the identifying functional.
+
+        :param experiments: A list of ADMGs representing the available experimental distributions.
+        :return: Functional object that can be compiled into an evaluator for discrete data.
+        """
+
+        if not self.id(experiments=experiments):
+            raise NotIdentifiedError
+
+        kernels = []
+        for district in self.Gystar.districts:
+            index = self.allowed_intrinsic_dict[frozenset(district)]
+            experiment = experiments[index]
+            order = self.fixing_orders[index][frozenset(district)]
+            leaf = Distribution(experiment.vertices, experiment.fixed)
+            node, G = fixing_chain(copy.deepcopy(experiment), order, leaf)
+            kernels.append(Kernel(district, G.parents(district) - district, node))
+
+        return Functional(self.interventions, self.outcomes, self.ystar - set(self.outcomes), kernels)
+
     def functional(self, experiments):
         """
         Creates a string representing the identifying functional
@@ -9,6 +9,7 @@ import autograd.numpy as anp
 from autograd import grad, hessian
 from scipy.optimize import minimize
 import numpy as np
+from ananke.utils import as_columnar
 
 
 class LinearGaussianSEM:
@@ -31,7 +32,8 @@ class LinearGaussianSEM:
         self._vertex_index_map = {v: i for i, v in enumerate(self.graph.vertices)}
         self.B_adj, self.omega_adj = self._construct_adjacency_matrices()
 
-        self.X_ = None  # data matrix
+        self._data = None  # data frame viewing the data
+        self._weights = None  # weights for each data point
         self.S_ = None  # sample covariance matrix
         self.B_ = None  # direct edge coefficients
         self.omega_ = None  # correlation of errors
@@ -75,7 +77,7 @@ class LinearGaussianSEM:
         :return: two D x D matrices B and Omega.
         """
 
-        d = self.X_.shape[1]
+        d = len(self.graph.vertices)
         L_list, B_list = [],  []
         omega_counter = 0
         b_counter = len(self.graph.vertices) + len(self.graph.bi_edges)
@@ -114,6 +116,23 @@ class LinearGaussianSEM:
 
         return B, omega
 
+    @property
+    def X_(self):
+        """
+        Data matrix the model was fit to, centred with the weights and with the columns ordered by vertex.
+        It is built from the data when accessed, since fitting only needs the sample covariance.
+
+        :return: N x D numpy array, or None if the model has not been fit.
+        """
+
+        if self._data is None:
+            return None
+
+        X = np.zeros((len(self._data), len(self._vertex_index_map)))
+        for v in self._vertex_index_map:
+            X[:, self._vertex_index_map[v]] = self._data[v]
+        return X - np.average(X, axis=0, weights=self._weights)  # centre the data
+
     def _neg_loglikelihood(self, params):
         """
         Internal likelihood function used to fit parameters.
@@ -122,20 +141,46 @@ class LinearGaussianSEM:
         :return: a float corresponding to the negative log likelihood.
         """
 
-        n, d = self.X_.shape
+        n, d = len(self._data), len(self.graph.vertices)
         B, omega = self._construct_b_omega(params)
         eye_inv_beta = anp.linalg.inv(anp.eye(d) - B)
         sigma = anp.dot(eye_inv_beta, anp.dot(omega, eye_inv_beta.T))
         likelihood = -(n/2) * (anp.log(anp.linalg.det(sigma)) + anp.trace(anp.dot(anp.linalg.inv(sigma), self.S_)))
         return -likelihood
 
-    def neg_loglikelihood(self, X, weights=None):
+    def _covariance(self, X, weights, chunksize=100000):
+        """
+        Weighted sample covariance of the vertices of the graph, in the order of _vertex_index_map.
+        The columns are read in chunks of rows, so the data is never copied into a full N x D matrix.
+
+        :param X: pandas data frame containing a column for each vertex.
+        :param weights: 1d numpy array with weights for each data point.
+        :param chunksize: number of rows read at a time.
+        :return: D x D numpy array equal to np.cov(X.T, aweights=weights) with the columns ordered by vertex.
+        """
+
+        columns = [X[v].to_numpy() for v in self._vertex_index_map]
+        weights = np.asarray(weights, dtype=float)
+        total = np.sum(weights)
+        means = np.array([np.dot(weights, column) for column in columns]) / total
+
+        S = np.zeros((len(columns), len(columns)))
+        for start in range(0, len(weights), chunksize):
+            block = np.column_stack([column[start:start + chunksize] for column in columns]) - means
+            S += (block * weights[start:start + chunksize, None]).T @ block
+
+        return S / (total - np.sum(weights ** 2) / total)
+
+    def neg_loglikelihood(self, X, weights=None, columns=None):
         """
         Calculate log-likelihood of the data given the model.
 
-        :param X: a N x M dimensional data matrix.
+        :param X: a N x M dimensional data matrix -- a pandas data frame, or data accepted by
+                  ananke.utils.as_columnar such as a memory-mapped array, .npy file, or Arrow table.
         :param weights: optional 1d numpy array with weights for each data point
                         (rows with higher weights are given greater importance).
+        :param columns: names of the columns if X is an array (the vertices of the graph in order if None),
+                        or a dictionary renaming columns of a data frame or Arrow table.
         :return: a float corresponding to the log-likelihood.
         """
 
@@ -143,48 +188,44 @@ class LinearGaussianSEM:
         if self.B_ is None:
             raise AssertionError("Model must be fit before likelihood can be calculated.")
 
-        # convert the data frame to a raw numpy array
-        n, d = X.shape
+        X = as_columnar(X, columns, default_columns=list(self._vertex_index_map))
+        n, d = len(X), len(self._vertex_index_map)
 
         # if no weights were given use artificial equal weights
         if weights is None:
             weights = np.ones((n,))
 
-        X_ = np.zeros((n, d))
-        for v in self._vertex_index_map:
-            X_[:, self._vertex_index_map[v]] = X[v]
-
-        X_ = X_ - np.average(X_, axis=0, weights=weights)  # centre the data
-        S_ = np.cov(X_.T, aweights=weights)
+        S_ = self._covariance(X, weights)
 
         # calculate the likelihood
         eye_inv_beta = np.linalg.inv(np.eye(d) - self.B_)
         sigma = np.dot(eye_inv_beta, np.dot(self.omega_, eye_inv_beta.T))
         return (n/2) * (np.log(np.linalg.det(sigma)) + np.trace(np.dot(np.linalg.inv(sigma), S_)))
 
-    def fit(self, X, weights=None, tol=1e-6, disp=None):
+    def fit(self, X, weights=None, tol=1e-6, disp=None, columns=None):
         """
         Fit the model to data via (weighted) maximum likelihood estimation
 
-        :param X: data -- a N x M dimensional pandas data frame.
+        :param X: data -- a N x M dimensional pandas data frame, or data accepted by ananke.utils.as_columnar
+                  such as a memory-mapped array, .npy file, or Arrow table, which is viewed without copying it.
         :param weights: optional 1d numpy array with weights for each data point
                         (rows with higher weights are given greater importance).
+        :param columns: names of the columns if X is an array (the vertices of the graph in order if None),
+                        or a dictionary renaming columns of a data frame or Arrow table.
         :return: self.
         """
 
-        # convert the data frame to a raw numpy array
-        n, d = X.shape
+        # view the data as columns without copying it
+        self._data = as_columnar(X, columns, default_columns=list(self._vertex_index_map))
+        n = len(self._data)
 
         # if no weights were given use artificial equal weights
         if weights is None:
             weights = np.ones((n,))
+        self._weights = weights
 
-        self.X_ = np.zeros((n, d))
-        for v in self._vertex_index_map:
-            self.X_[:, self._vertex_index_map[v]] = X[v]
-        # self.X_ = self.X_ - np.mean(self.X_, axis=0)  # centre the data
-        self.X_ = self.X_ - np.average(self.X_, axis=0, weights=weights)  # centre the data
-        self.S_ = np.cov(X.T, aweights=weights)
+        # the likelihood only depends on the data through the sample covariance
+        self.S_ = self._covariance(self._data, weights)
 
         likelihood = functools.partial(self._neg_loglikelihood)
         grad_likelihood = grad(likelihood)
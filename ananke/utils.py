@@ -1,7 +1,97 @@
+import mmap
+import os
 from itertools import chain, combinations
 
+import numpy as np
+import pandas as pd
+
 
 def powerset(iterable, min_size=0):
     "powerset([1,2,3], 0) --> () (1,) (2,) (3,) (1,2) (1,3) (2,3) (1,2,3)"
     s = list(iterable)
-    return chain.from_iterable((combinations(s, r)) for r in range(min_size, len(s) + 1))
\ No newline at end of file
+    return chain.from_iterable((combinations(s, r)) for r in range(min_size, len(s) + 1))
+
+
+def as_columnar(source, columns=None, default_columns=None):
+    """
+    Get a pandas data frame of named columns that views the memory of the source rather than copying it.
+    Data frames over a memory-mapped file record the file in attrs["memmap"], so other processes can map
+    the same file instead of receiving a copy of the data.
+
+    :param source: pandas data frame, 2D NumPy array (including memory-mapped arrays), path to a .npy file
+                   (which is memory-mapped read-only), or an Arrow table.
+    :param columns: list of names of the columns of an array in order, or a dictionary renaming the columns
+                    of a data frame or Arrow table.
+    :param default_columns: list of names of the columns of an array used if columns is None.
+    :return: pandas data frame.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        source = np.load(str(source), mmap_mode="r")
+
+    if isinstance(source, np.ndarray):
+        names = columns if columns is not None else default_columns
+        if source.ndim != 2 or names is None or len(names) != source.shape[1]:
+            raise ValueError("Arrays must be two dimensional with one name for each column")
+        frame = pd.DataFrame(source, columns=list(names), copy=False)
+
+        # only arrays that map a whole file (rather than a slice of one) can be mapped again from the file
+        if isinstance(source, np.memmap) and isinstance(source.base, mmap.mmap):
+            frame.attrs["memmap"] = {"filename": source.filename, "offset": source.offset, "shape": source.shape,
+                                     "dtype": source.dtype.str,
+                                     "order": "F" if source.flags.f_contiguous and not source.flags.c_contiguous
+                                     else "C",
+                                     "columns": list(names)}
+        return frame
+
+    # Arrow tables are converted with one block per column, which is zero-copy for numeric columns without nulls
+    if not isinstance(source, pd.DataFrame) and hasattr(source, "to_pandas") and hasattr(source, "column_names"):
+        source = source.to_pandas(split_blocks=True)
+
+    if not isinstance(source, pd.DataFrame):
+        raise ValueError("Invalid data of type {}".format(type(source).__name__))
+    if isinstance(columns, dict):
+        source = source.rename(columns=columns, copy=False)
+    return source
+
+
+def map_columnar(memmap):
+    """
+    Map a file recorded by as_columnar as a data frame.
+
+    :param memmap: dictionary recorded in attrs["memmap"] of a data frame returned by as_columnar.
+    :return: pandas data frame over the memory-mapped file.
+    """
+
+    values = np.memmap(memmap["filename"], dtype=np.dtype(memmap["dtype"]), mode="r", offset=memmap["offset"],
+                       shape=tuple(memmap["shape"]), order=memmap["order"])
+    return as_columnar(values, memmap["columns"])
+
+
+def mapped_file(data):
+    """
+    Get the memory-mapped file that a data frame returned by as_columnar views, if its columns still view it.
+    Data frame attributes are kept by operations that copy or slice the data, so each column is checked to be
+    the whole of its column of the file.
+
+    :param data: pandas data frame.
+    :return: dictionary recorded in attrs["memmap"], or None if the columns do not view the file.
+    """
+
+    memmap = data.attrs.get("memmap")
+    if memmap is None:
+        return None
+
+    for j, name in enumerate(memmap["columns"]):
+        if name not in data.columns:
+            return None
+        values = np.asarray(data[name])
+        root = values.base
+        while root is not None and not isinstance(root, np.memmap):
+            root = root.base
+        if root is None or root.filename != memmap["filename"] or root.shape != tuple(memmap["shape"]):
+            return None
+        if values.shape != root.shape[:1] or values.strides != root.strides[:1] or \
+                values.ctypes.data != root.ctypes.data + j * root.strides[1]:
+            return None
+    return memmap
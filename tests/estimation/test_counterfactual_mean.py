@@ -1,4 +1,12 @@
 
+import contextlib
+import io
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
 import unittest
 import numpy as np
 from scipy.special import expit
@@ -8,6 +16,7 @@ from scipy import stats
 
 from ananke.graphs import ADMG
 from ananke.estimation import CausalEffect
+from ananke.estimation.counterfactual_mean import detect_state_spaces
 
 TOL = 0.1
 
@@ -548,6 +557,354 @@ class TestCounterfactualMean(unittest.TestCase):
         self.assertTrue(abs(ace_nipw - ace_truth) < TOL)
         self.assertTrue(abs(ace_anipw - ace_truth) < TOL)
 
+    def test_parallel_bootstrap(self):
+        np.random.seed(0)
+        vertices = ['C', 'T', 'Y']
+        di_edges = [('C', 'T'), ('C', 'Y'), ('T', 'Y')]
+        G = ADMG(vertices, di_edges)
+
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        Y = 1 + T + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'Y': Y})
+
+        ace = CausalEffect(G, 'T', 'Y')
+        serial = ace.compute_effect(data, "aipw", n_bootstraps=8, random_state=1)
+        threads = ace.compute_effect(data, "aipw", n_bootstraps=8, random_state=1, n_jobs=2, backend="thread")
+        processes = ace.compute_effect(data, "aipw", n_bootstraps=8, random_state=1, n_jobs=2)
+
+        # replicates do not depend on the number or type of workers
+        self.assertTrue(np.allclose(serial, threads))
+        self.assertTrue(np.allclose(serial, processes))
+        self.assertTrue(serial[1] < serial[0] < serial[2])
+        with self.assertRaises(ValueError):
+            ace.compute_effect(data, "aipw", n_bootstraps=2, n_jobs=2, backend="cluster")
+
+    def test_weighted_bootstrap(self):
+        np.random.seed(0)
+        vertices = ['C', 'T', 'M', 'Y']
+        di_edges = [('C', 'T'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')]
+        bi_edges = [('T', 'Y')]
+        G = ADMG(vertices, di_edges, bi_edges)
+
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        M = 1 + T + np.random.normal(0, 1, size)
+        Y = 1 + M + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'Y': Y})
+
+        # multinomial weights drawn from the same seeds reproduce the resampling bootstrap
+        ace = CausalEffect(G, 'T', 'Y')
+        for estimator in ["p-ipw", "apipw"]:
+            resampled = ace.compute_effect(data, estimator, n_bootstraps=6, random_state=1)
+            weighted = ace.compute_effect(data, estimator, n_bootstraps=6, random_state=1, bootstrap="multinomial",
+                                          batch_size=4)
+            self.assertTrue(np.allclose(resampled, weighted))
+
+        # other weighting schemes give valid intervals
+        threads = ace.compute_effect(data, "apipw", n_bootstraps=6, random_state=1, bootstrap="bayesian",
+                                     n_jobs=2, backend="thread")
+        serial = ace.compute_effect(data, "apipw", n_bootstraps=6, random_state=1, bootstrap="bayesian")
+        self.assertTrue(np.allclose(serial, threads))
+        self.assertTrue(serial[1] < serial[0] < serial[2])
+        with self.assertRaises(ValueError):
+            ace.compute_effect(data, "apipw", n_bootstraps=2, bootstrap="jackknife")
+
+    def test_influence_function_ci(self):
+        np.random.seed(0)
+        vertices = ['T', 'Y']
+        di_edges = [('T', 'Y')]
+        G = ADMG(vertices, di_edges)
+
+        # with a binary outcome and no covariates the delta method gives Woolf's standard error of the log OR
+        size = 2000
+        T = np.random.binomial(1, 0.4, size)
+        Y = np.random.binomial(1, expit(0.2 + 0.5*T), size)
+        data = pd.DataFrame({'T': T, 'Y': Y})
+        ace = CausalEffect(G, 'T', 'Y')
+        log_or, low, up = ace.compute_effect(data, "aipw", ci="if")
+        counts = pd.crosstab(data['T'], data['Y']).values
+        woolf = np.sqrt(np.sum(1 / counts))
+        self.assertAlmostEqual(woolf, ace.standard_error_)
+        self.assertAlmostEqual(log_or, np.log(counts[1, 1]*counts[0, 0] / (counts[1, 0]*counts[0, 1])))
+        self.assertAlmostEqual(up - low, 2 * stats.norm.ppf(0.975) * woolf)
+        self.assertEqual(len(data), len(ace.influence_function_))
+        self.assertAlmostEqual(0, np.mean(ace.influence_function_))
+
+        # augmented IPW with covariates, close to the bootstrap standard error
+        vertices = ['C', 'T', 'Y']
+        di_edges = [('C', 'T'), ('C', 'Y'), ('T', 'Y')]
+        G = ADMG(vertices, di_edges)
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        Y = 1 + T + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'Y': Y})
+        ace = CausalEffect(G, 'T', 'Y')
+        estimate, low, up = ace.compute_effect(data, "aipw", ci="if")
+        self.assertTrue(low < 1 < up)
+        replicates = [ace.compute_effect(data.sample(size, replace=True).reset_index(drop=True), "aipw")
+                      for _ in range(30)]
+        self.assertTrue(abs(np.std(replicates) / ace.standard_error_ - 1) < 0.3)
+
+        with self.assertRaises(ValueError):
+            ace.compute_effect(data, "aipw", ci="wald")
+
+        # augmented nested IPW, close to the bootstrap standard error
+        G = ADMG(['C', 'T', 'Y'], [('C', 'Y'), ('T', 'Y')], [('C', 'T')])
+        ace = CausalEffect(G, 'T', 'Y')
+        estimate, low, up = ace.compute_effect(data, "anipw", ci="if")
+        self.assertTrue(low < estimate < up)
+        replicates = [ace.compute_effect(data.sample(size, replace=True).reset_index(drop=True), "anipw")
+                      for _ in range(30)]
+        self.assertTrue(abs(np.std(replicates) / ace.standard_error_ - 1) < 0.3)
+
+        # the terms of the primal estimators are not influence functions, so they only have bootstrap intervals
+        M = np.random.binomial(1, expit(T - C), size)
+        data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'Y': Y + M})
+        G = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')], [('T', 'Y')])
+        ace = CausalEffect(G, 'T', 'Y')
+        for estimator in ["apipw", "eff-aipw", "eff-apipw"]:
+            with self.assertRaises(ValueError):
+                ace.compute_effect(data, estimator, ci="if")
+
+    def test_compute_effects(self):
+        np.random.seed(0)
+        vertices = ['C', 'T', 'M', 'Y']
+        di_edges = [('C', 'T'), ('C', 'M'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')]
+        G = ADMG(vertices, di_edges)
+
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        M = np.random.binomial(1, expit(T - C), size)
+        Y = 1 + M + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'Y': Y})
+
+        estimators = ["ipw", "gformula", "aipw", "p-ipw", "d-ipw"]
+        ace = CausalEffect(G, 'T', 'Y')
+        individual = [ace.compute_effect(data, estimator) for estimator in estimators]
+
+        # the shared regressions T ~ C, Y ~ T+C and M ~ T+C are fit once for all estimators
+        ace.nuisance_cache.clear()
+        table = ace.compute_effects(data, estimators, n_jobs=2)
+        self.assertEqual(estimators, list(table.index))
+        self.assertTrue(np.allclose(individual, table["estimate"]))
+        self.assertTrue(table["lower"].isnull().all())
+        self.assertEqual(3, ace.nuisance_cache.stats["misses"])
+
+        table = ace.compute_effects(data, estimators, n_bootstraps=5, random_state=0)
+        self.assertTrue(((table["lower"] < table["estimate"]) & (table["estimate"] < table["upper"])).all())
+        _, low, up = ace.compute_effect(data, "d-ipw", n_bootstraps=5, random_state=0)
+        self.assertAlmostEqual(low, table.loc["d-ipw", "lower"])
+        self.assertAlmostEqual(up, table.loc["d-ipw", "upper"])
+
+        table = ace.compute_effects(data, ["ipw", "aipw"], ci="if")
+        self.assertTrue(np.isnan(table.loc["ipw", "lower"]))
+        self.assertTrue(table.loc["aipw", "lower"] < table.loc["aipw", "estimate"] < table.loc["aipw", "upper"])
+        with self.assertRaises(ValueError):
+            ace.compute_effects(data, ["ipw", "tmle"])
+
+    def test_custom_model_predictions(self):
+        np.random.seed(0)
+        G = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')])
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        M = np.random.binomial(1, expit(T - C), size)
+        Y = 1 + M + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'Y': Y})
+
+        def model_binary(data, formula, weights=None):
+            return sm.GLM.from_formula(formula, data=data, family=sm.families.Binomial(), freq_weights=weights).fit()
+
+        def model_continuous(data, formula, weights=None):
+            return sm.GLM.from_formula(formula, data=data, family=sm.families.Gaussian(), freq_weights=weights).fit()
+
+        # predictions under each assignment agree between the default GLMs and other models,
+        # and neither modifies the treatment column of the data
+        ace = CausalEffect(G, 'T', 'Y')
+        for estimator in ["gformula", "aipw", "p-ipw", "d-ipw"]:
+            expected = ace.compute_effect(data, estimator)
+            self.assertAlmostEqual(expected, ace.compute_effect(data, estimator, model_binary, model_continuous))
+        self.assertTrue((data['T'] == T).all())
+
+    def test_state_spaces(self):
+        np.random.seed(0)
+        size = 200
+        data = pd.DataFrame({'C': np.random.normal(0, 1, size),
+                             'T': np.random.binomial(1, 0.5, size),
+                             'M': np.random.binomial(2, 0.5, size),
+                             'S': np.random.choice(['a', 'b'], size),
+                             'Y': np.random.normal(0, 1, size)})
+        self.assertEqual({'C': 'continuous', 'T': 'binary', 'M': 'categorical', 'S': 'categorical'},
+                         detect_state_spaces(data, ['C', 'T', 'M', 'S']))
+        self.assertEqual({'M': 'continuous'}, detect_state_spaces(data, ['M'], max_categories=2))
+
+        # only the columns of the graph are detected, and explicit types take precedence
+        G = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')])
+        ace = CausalEffect(G, 'T', 'Y', variable_types={'M': 'continuous'})
+        ace.compute_effect(data, "gformula")
+        self.assertEqual({'C': 'continuous', 'T': 'binary', 'M': 'continuous', 'Y': 'continuous'},
+                         ace.state_space_map_)
+
+        with self.assertRaises(ValueError):
+            CausalEffect(G, 'T', 'Y', variable_types={'M': 'ordinal'})
+
+    def test_lazy_construction(self):
+        G = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')], [('T', 'Y')])
+
+        # nothing is printed, and the analyses are only run when they are used
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            ace = CausalEffect(G, 'T', 'Y')
+        self.assertEqual("", stdout.getvalue())
+        self.assertIsNone(ace._is_mb_shielded)
+        self.assertIsNone(ace._p_order)
+
+        # the fixability of the treatment does not need the ID algorithm or the mb-shielded check, and the
+        # identification strategy is only logged at the debug level, so nothing is emitted at the default level
+        with self.assertLogs("ananke.estimation.counterfactual_mean", level="DEBUG") as logs:
+            self.assertEqual("p-fixable", ace.strategy)
+        self.assertEqual([logging.DEBUG], [record.levelno for record in logs.records])
+        self.assertIsNone(ace._one_id)
+        self.assertIsNone(ace._is_mb_shielded)
+        self.assertEqual(["p-ipw", "d-ipw", "apipw", "eff-apipw"], ace.available_estimators)
+        self.assertEqual("eff-apipw", ace.suggested_estimator)
+        self.assertTrue(ace.is_mb_shielded)
+
+        # the results of the analyses can still be assigned
+        ace.is_mb_shielded = False
+        self.assertEqual(["p-ipw", "d-ipw", "apipw"], ace.available_estimators)
+        ace.strategy = "nested-fixable"
+        self.assertEqual(["n-ipw", "anipw"], ace.available_estimators)
+        ace.one_id = None
+        self.assertTrue(ace.one_id.id())
+
+        ace = CausalEffect(ADMG(['T', 'Y'], [('T', 'Y')], [('T', 'Y')]), 'T', 'Y')
+        with self.assertLogs("ananke.estimation.counterfactual_mean", level="WARNING"):
+            self.assertEqual("Not ID", ace.strategy)
+        self.assertEqual([], ace.available_estimators)
+        self.assertIsNone(ace.suggested_estimator)
+
+    def test_memory_mapped_input(self):
+        np.random.seed(0)
+        G = ADMG(['C', 'T', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'Y')])
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        Y = 1 + T + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'Y': Y})
+
+        ace = CausalEffect(G, 'T', 'Y')
+        expected = ace.compute_effect(data, "aipw", n_bootstraps=8, random_state=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.npy")
+            np.save(path, np.column_stack([Y, C, T]))
+
+            # columns of arrays are named by the mapping, or by the vertices of the graph in order
+            self.assertTrue(np.allclose(expected, ace.compute_effect(path, "aipw", n_bootstraps=8, random_state=1,
+                                                                     n_jobs=2, columns=['Y', 'C', 'T'])))
+            mapped = np.load(path, mmap_mode="r")
+            self.assertAlmostEqual(expected[0], ace.compute_effect(mapped[:, [1, 2, 0]], "aipw"))
+            table = ace.compute_effects(mapped, ["ipw", "aipw"], columns=['Y', 'C', 'T'])
+            self.assertAlmostEqual(expected[0], table.loc["aipw", "estimate"])
+            del mapped
+
+    def test_cross_fitting(self):
+        np.random.seed(0)
+        size = 2000
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        M = np.random.binomial(1, expit(T - C), size)
+        Y = 1 + M + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'Y': Y})
+
+        G_a = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'M'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')])
+        G_p = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')], [('T', 'Y')])
+        G_n = ADMG(['C', 'T', 'Y'], [('C', 'Y'), ('T', 'Y')], [('C', 'T')])
+        for G, estimator in [(G_a, "aipw"), (G_p, "apipw"), (G_n, "anipw")]:
+            ace = CausalEffect(G, 'T', 'Y')
+            expected = ace.compute_effect(data, estimator)
+            serial = ace.compute_effect(data, estimator, n_folds=5, random_state=0)
+            self.assertEqual(5, len(ace.fold_times_))
+            self.assertTrue(ace.crossfit_time_ > 0)
+
+            # the estimate does not depend on the number of workers, and is close to the estimate without folds
+            self.assertAlmostEqual(serial, ace.compute_effect(data, estimator, n_folds=5, random_state=0, n_jobs=3))
+            self.assertTrue(abs(expected - serial) < TOL)
+
+        # out-of-fold terms give intervals from the influence function and the bootstrap
+        estimate, lower, upper = ace.compute_effect(data, "anipw", n_folds=3, ci="if", random_state=0)
+        self.assertAlmostEqual(estimate, ace.compute_effect(data, "anipw", n_folds=3, random_state=0))
+        self.assertTrue(lower < estimate < upper)
+        estimate, lower, upper = ace.compute_effect(data, "anipw", n_folds=3, n_bootstraps=4, random_state=0,
+                                                    bootstrap="multinomial")
+        self.assertTrue(lower < upper)
+
+        with self.assertRaises(ValueError):
+            ace.compute_effect(data, "n-ipw", n_folds=3)
+        with self.assertRaises(ValueError):
+            ace.compute_effect(data, "anipw", n_folds=size + 1)
+
+    def test_fit_evaluate(self):
+        np.random.seed(0)
+        size = 2000
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        M = np.random.binomial(1, expit(T - C), size)
+        Y = 1 + M + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'Y': Y})
+        train, test = data.iloc[:1200], data.iloc[1200:]
+
+        # evaluating on new data gives the terms of the estimator on both datasets with the new data given zero weight
+        both = pd.concat([train, test])
+        weights = np.concatenate([np.ones(len(train)), np.zeros(len(test))])
+
+        G_a = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'M'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')])
+        G_p = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')], [('T', 'Y')])
+        G_n = ADMG(['C', 'T', 'Y'], [('C', 'Y'), ('T', 'Y')], [('C', 'T')])
+        for G, estimators in [(G_a, ["ipw", "gformula", "aipw", "eff-aipw"]),
+                              (G_p, ["p-ipw", "d-ipw", "apipw", "eff-apipw"]), (G_n, ["n-ipw", "anipw"])]:
+            for estimator in estimators:
+                ace = CausalEffect(G, 'T', 'Y')
+                with self.assertRaises(RuntimeError):
+                    ace.evaluate(test)
+                evaluated = ace.fit(train, estimator).evaluate(test)
+                self.assertTrue((evaluated.index == test.index).all())
+
+                prepared, model_binary, model_continuous = ace._prepare(both)
+                terms_T1, terms_T0 = ace._counterfactual_terms(estimator, model_binary, model_continuous, prepared,
+                                                               weights)
+                self.assertTrue(np.allclose(terms_T1[len(train):], evaluated["pseudo_outcome_1"]))
+                self.assertTrue(np.allclose(terms_T0[len(train):], evaluated["pseudo_outcome_0"]))
+
+                # on the data it was fit to, the fitted estimator gives the estimate of compute_effect
+                evaluated = ace.evaluate(train)
+                self.assertAlmostEqual(ace.compute_effect(train, estimator),
+                                       ace._effect(evaluated["pseudo_outcome_1"].mean(),
+                                                   evaluated["pseudo_outcome_0"].mean()))
+
+        # the influence function on the data it was fit to is the one of compute_effect
+        ace = CausalEffect(G_n, 'T', 'Y').fit(train, "anipw")
+        ace.compute_effect(train, "anipw", ci="if")
+        self.assertTrue(np.allclose(ace.influence_function_, ace.evaluate(train)["influence_function"]))
+        self.assertEqual(['C ~ -1+1', 'C ~ T', 'Y ~ T'], sorted(ace.fitted_.formulas))
+
+        # fitted effects are evaluated in other processes, where sets iterate in a different order
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "fitted.pkl")
+            ace = CausalEffect(G_p, 'T', 'Y').fit(train, "eff-apipw")
+            with open(path, "wb") as f:
+                pickle.dump((ace, test), f)
+            script = ("import pickle, sys; ace, test = pickle.load(open(sys.argv[1], 'rb')); "
+                      "print(ace.evaluate(test).to_json())")
+            result = subprocess.run([sys.executable, "-c", script, path], capture_output=True, text=True,
+                                    env=dict(os.environ, PYTHONHASHSEED="1"), check=True)
+        evaluated = pd.read_json(io.StringIO(result.stdout))
+        self.assertTrue(np.allclose(ace.evaluate(test).values, evaluated.values))
+
     # not ID
     def test_bow_arc(self):
         vertices = ['C', 'T', 'Y']
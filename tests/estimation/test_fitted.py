@@ -0,0 +1,37 @@
+import pickle
+import unittest
+
+from ananke.estimation.fitted import FittedNuisance
+
+
+class TestFitted(unittest.TestCase):
+
+    def test_record_replay(self):
+        fits = []
+
+        def model(data, formula, weights=None):
+            fits.append((formula, weights))
+            return len(fits)
+
+        record = FittedNuisance("aipw", {'T': 'binary'})
+        model_binary, model_continuous = record.strategies(model, model)
+        self.assertEqual(1, model_binary(None, "T ~ A+B"))
+        self.assertEqual(2, model_continuous(None, "Y ~ T+A", weights=[1, 2]))
+        self.assertEqual(3, model_binary(None, "T ~ B + A", weights=[2, 1]))
+        self.assertEqual(0.5, model_binary.statistic("P(T)", lambda: 0.5))
+        self.assertEqual(['T ~ A+B', 'Y ~ A+T'], record.formulas)
+
+        # replaying returns the fits without fitting, in the order each formula was fit
+        record = pickle.loads(pickle.dumps(record))
+        model_binary, model_continuous = record.strategies(replay=True)
+        self.assertEqual(0.5, model_continuous.statistic("P(T)", lambda: 0.0))
+        self.assertEqual(2, model_continuous(None, "Y ~ A+T"))
+        self.assertEqual(1, model_binary(None, "T ~ B+A"))
+        self.assertEqual(3, model_binary(None, "T ~ A+B"))
+        self.assertEqual(3, len(fits))
+        with self.assertRaises(RuntimeError):
+            model_binary(None, "T ~ A+B")
+
+
+if __name__ == '__main__':
+    unittest.main()
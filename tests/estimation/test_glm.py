@@ -0,0 +1,90 @@
+import unittest
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from scipy.special import expit
+
+from ananke.estimation.glm import DesignCache, GLMFit, fit_glm, parse_formula
+
+
+class TestGLM(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        size = 1000
+        A = np.random.normal(0, 1, size)
+        B = np.random.binomial(1, 0.4, size)
+        T = np.random.binomial(1, expit(0.3 + A - B), size)
+        Y = 1 + 2 * A - B + np.random.normal(0, 1, size)
+        self.data = pd.DataFrame({'A': A, 'B': B, 'T': T, 'Y': Y})
+        self.weights = np.random.poisson(1, size).astype(float)
+
+    def test_parse_formula(self):
+        self.assertEqual(("Y", ["A", "B"], True), parse_formula("Y ~ A+B"))
+        self.assertEqual(("Y", [], True), parse_formula("Y ~ -1 + 1"))
+        self.assertEqual(("Y", ["A"], False), parse_formula("Y ~ -1 + A"))
+        self.assertEqual(("Y", [], True), parse_formula("Y ~ "))
+        self.assertIsNone(parse_formula("Y ~ A:B"))
+        self.assertIsNone(parse_formula("Y ~ np.log(A)"))
+
+    def test_matches_statsmodels(self):
+        cases = [("T ~ A+B", "binomial", sm.families.Binomial()),
+                 ("T ~ -1 + 1", "binomial", sm.families.Binomial()),
+                 ("Y ~ A+B+T", "gaussian", sm.families.Gaussian())]
+        for formula, family, sm_family in cases:
+            for weights in [None, self.weights]:
+                expected = sm.GLM.from_formula(formula, data=self.data, family=sm_family,
+                                               freq_weights=weights).fit()
+                fitted = fit_glm(self.data, formula, family, weights)
+                self.assertIsInstance(fitted, GLMFit)
+                self.assertTrue(np.allclose(expected.params.values, fitted.params.values, atol=1e-8))
+                self.assertTrue(np.allclose(expected.predict(self.data), fitted.predict(self.data), atol=1e-8))
+
+        # formulas with other terms fall back to statsmodels
+        fitted = fit_glm(self.data, "Y ~ A:B", "gaussian")
+        self.assertNotIsInstance(fitted, GLMFit)
+
+    def test_discrete_patterns(self):
+        data = self.data.assign(C=np.random.binomial(1, 0.5, len(self.data)))
+        for formula, family in [("T ~ B+C", "binomial"), ("Y ~ B+C", "gaussian")]:
+            for weights in [None, self.weights]:
+                expected = fit_glm(data, formula, family, weights)
+                designs = DesignCache()
+                fitted = fit_glm(data, formula, family, weights, designs, discrete={"B", "C"})
+                self.assertTrue(np.allclose(expected.params.values, fitted.params.values, atol=1e-8))
+                self.assertTrue(np.allclose(expected.predict(data), fitted.predict(data), atol=1e-8))
+
+                # the fit used the four patterns of B and C
+                unique, inverse = designs.patterns(data, ["B", "C"])
+                self.assertEqual((4, 3), unique.shape)
+                self.assertTrue((unique[inverse] == designs.design(data, ["B", "C"])).all())
+
+    def test_predict_assigned(self):
+        for formula, family in [("T ~ A+B", "binomial"), ("Y ~ A+B+T", "gaussian")]:
+            fitted = fit_glm(self.data, formula, family, discrete={"B"})
+            predictions = fitted.predict_assigned(self.data, "B", [1, 0])
+            for value in [1, 0]:
+                expected = fitted.predict(self.data.assign(B=value))
+                self.assertTrue(np.allclose(expected, predictions[value]))
+
+            # covariates that are not in the model do not change the predictions
+            predictions = fitted.predict_assigned(self.data, "C", [1, 0])
+            self.assertTrue(np.allclose(fitted.predict(self.data), predictions[1]))
+            self.assertFalse(np.shares_memory(predictions[1], predictions[0]))
+
+    def test_design_cache(self):
+        designs = DesignCache()
+        X = designs.design(self.data, ["A", "B"])
+        self.assertIs(X, designs.design(self.data, ["A", "B"]))
+        self.assertEqual((len(self.data), 3), X.shape)
+
+        # a different data frame gets its own matrices and predictions follow its index
+        shifted = self.data.copy()
+        shifted.index = shifted.index + 10
+        self.assertIsNot(X, designs.design(shifted, ["A", "B"]))
+        fitted = fit_glm(self.data, "T ~ A+B", "binomial", designs=designs)
+        self.assertTrue((fitted.predict(shifted).index == shifted.index).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
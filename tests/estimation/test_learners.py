@@ -0,0 +1,104 @@
+import unittest
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from ananke.graphs import ADMG
+from ananke.estimation import CausalEffect
+from ananke.estimation.glm import fit_gaussian, fit_logistic
+from ananke.estimation.learners import (LEARNERS, LearnerStrategy, LogisticLearner, RidgeLearner,
+                                        SparseLogisticLearner, make_learner, predict_batch, register_learner)
+
+
+class CountingRidge(RidgeLearner):
+
+    calls = 0
+
+    def predict(self, X):
+        CountingRidge.calls += 1
+        return super().predict(X)
+
+
+class TestLearners(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        size = 1000
+        C = np.random.normal(0, 1, size)
+        D = np.random.binomial(1, 0.4, size)
+        T = np.random.binomial(1, expit(0.5 * C - D), size)
+        Y = 1 + T + C - D + np.random.normal(0, 1, size)
+        self.data = pd.DataFrame({'C': C, 'D': D, 'T': T, 'Y': Y})
+        self.X = self.data[['C', 'D']].to_numpy(dtype=float)
+        self.weights = np.random.poisson(1, size).astype(float)
+
+    def test_learners(self):
+        Z = np.column_stack([np.ones(len(self.X)), self.X])
+        T, Y = self.data['T'].to_numpy(dtype=float), self.data['Y'].to_numpy()
+
+        # without penalties the learners match the GLMs
+        ridge = RidgeLearner(alpha=0).fit(self.X, Y, self.weights)
+        expected = fit_gaussian(Z, Y, self.weights)
+        self.assertTrue(np.allclose(expected, np.concatenate([[ridge.intercept_], ridge.coef_])))
+        logistic = LogisticLearner().fit(self.X, T, self.weights)
+        self.assertTrue(np.allclose(fit_logistic(Z, T, self.weights), logistic.coef_))
+        sparse = SparseLogisticLearner(alpha=0, max_iter=20000, tol=1e-10).fit(self.X, T, self.weights)
+        self.assertTrue(np.allclose(logistic.coef_, sparse.coef_, atol=1e-4))
+
+        # a large L1 penalty removes every coefficient but the intercept
+        sparse = SparseLogisticLearner(alpha=1).fit(self.X, T)
+        self.assertTrue(np.allclose(0, sparse.coef_[1:]))
+        self.assertAlmostEqual(np.mean(T), sparse.predict(self.X)[0], places=4)
+
+        # designs are stacked and predicted in one call
+        predictions = predict_batch(ridge, [self.X, self.X[:10]])
+        self.assertEqual([len(self.X), 10], [len(p) for p in predictions])
+        self.assertTrue(np.allclose(ridge.predict(self.X[:10]), predictions[1]))
+
+    def test_registry(self):
+        self.assertIsInstance(make_learner("ridge", "continuous"), RidgeLearner)
+        with self.assertRaises(ValueError):
+            make_learner("ridge", "binary")
+        with self.assertRaises(ValueError):
+            make_learner("forest", "binary")
+        with self.assertRaises(ValueError):
+            register_learner("nothing")
+
+        # the counterfactual designs are predicted in one batch
+        register_learner("counting-ridge", continuous=CountingRidge)
+        try:
+            fitted = LearnerStrategy("counting-ridge", "continuous")(self.data, "Y ~ T+C+D")
+            CountingRidge.calls = 0
+            predictions = fitted.predict_assigned(self.data, 'T', [1, 0])
+            self.assertEqual(1, CountingRidge.calls)
+            self.assertTrue(np.allclose(fitted.predict(self.data.assign(T=0)), predictions[0]))
+        finally:
+            del LEARNERS["counting-ridge"]
+
+        # covariates that are not in the model give each value its own predictions
+        fitted = LearnerStrategy("ridge", "continuous")(self.data, "Y ~ T+C")
+        predictions = fitted.predict_assigned(self.data, 'D', [1, 0])
+        self.assertTrue(np.allclose(predictions[1], predictions[0]))
+        self.assertFalse(np.shares_memory(predictions[1], predictions[0]))
+
+        # strategies using the same learner are equal, so they share fits in the nuisance cache
+        self.assertEqual(LearnerStrategy("ridge", "continuous"), LearnerStrategy("ridge", "continuous"))
+        self.assertNotEqual(LearnerStrategy("ridge", "continuous"), LearnerStrategy(RidgeLearner(), "continuous"))
+
+    def test_causal_effect(self):
+        G = ADMG(['C', 'D', 'T', 'Y'], [('C', 'T'), ('D', 'T'), ('C', 'Y'), ('D', 'Y'), ('T', 'Y')])
+        ace = CausalEffect(G, 'T', 'Y')
+        expected = ace.compute_effect(self.data, "aipw")
+
+        # learners are used by name or as objects, and agree with the GLMs when they are not penalized
+        self.assertAlmostEqual(expected, ace.compute_effect(self.data, "aipw", "logistic", RidgeLearner(alpha=0)))
+        self.assertAlmostEqual(expected, ace.compute_effect(self.data, "aipw", "glm-binary", "glm-continuous"))
+        estimate = ace.compute_effect(self.data, "aipw", "sparse-logistic", "ridge", n_folds=2)
+        self.assertTrue(abs(expected - estimate) < 0.1)
+
+        with self.assertRaises(ValueError):
+            ace.compute_effect(self.data, "aipw", model_binary="forest")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from ananke.graphs import ADMG
+from ananke.estimation import CausalEffect, MultiOutcomeEffect
+
+
+class TestMultiOutcomeEffect(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        size = 1000
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        M = np.random.binomial(1, expit(T - C), size)
+        Y1 = 1 + T + C + np.random.normal(0, 1, size)
+        Y2 = M - C + np.random.normal(0, 1, size)
+        Y3 = np.random.binomial(1, expit(M + C), size)
+        self.data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'Y1': Y1, 'Y2': Y2, 'Y3': Y3})
+        self.outcomes = ['Y1', 'Y2', 'Y3']
+
+    def test_a_fixable(self):
+        G = ADMG(['C', 'T', 'M', 'Y1', 'Y2', 'Y3'],
+                 [('C', 'T'), ('C', 'M'), ('T', 'M'), ('C', 'Y1'), ('T', 'Y1'), ('C', 'Y2'), ('M', 'Y2'),
+                  ('C', 'Y3'), ('M', 'Y3')])
+        multi = MultiOutcomeEffect(G, 'T', self.outcomes)
+        expected = [CausalEffect(G, 'T', Y).compute_effect(self.data, "aipw", n_bootstraps=4, random_state=0)
+                    for Y in self.outcomes]
+
+        table = multi.compute_effects(self.data, "aipw", n_bootstraps=4, random_state=0)
+        self.assertEqual(self.outcomes, list(table.index))
+        self.assertTrue(np.allclose(expected, table.values))
+
+        # the graph analysis and the propensity score are shared, only the outcome regressions are fit per outcome
+        effects = multi.effects
+        self.assertIs(effects['Y1']._analyze_graph()["mp"], effects['Y3']._analyze_graph()["mp"])
+        multi.nuisance_cache.clear()
+        parallel = multi.compute_effects(self.data, "aipw", n_jobs=2)
+        self.assertTrue(np.allclose(table["estimate"], parallel["estimate"]))
+        self.assertEqual(1 + len(self.outcomes), multi.nuisance_cache.stats["misses"])
+
+        table = multi.compute_effects(self.data, "aipw", ci="if")
+        self.assertTrue((table["lower"] < table["estimate"]).all() and (table["estimate"] < table["upper"]).all())
+
+        with self.assertRaises(ValueError):
+            MultiOutcomeEffect(G, 'T', ['Y1', 'Y1'])
+        with self.assertRaises(ValueError):
+            multi.compute_effects(self.data, "eff-ipw")
+        with self.assertRaises(ValueError):
+            CausalEffect(G, 'M', 'Y2', shared=effects['Y1'])
+
+    def test_p_fixable(self):
+        G = ADMG(['C', 'T', 'M', 'Y1', 'Y2'],
+                 [('C', 'T'), ('C', 'Y1'), ('C', 'Y2'), ('T', 'M'), ('M', 'Y1'), ('M', 'Y2')],
+                 [('T', 'Y1'), ('T', 'Y2')])
+        multi = MultiOutcomeEffect(G, 'T', ['Y1', 'Y2'])
+        table = multi.compute_effects(self.data, "apipw")
+        for Y in ['Y1', 'Y2']:
+            self.assertAlmostEqual(CausalEffect(G, 'T', Y).compute_effect(self.data, "apipw"), table.loc[Y, "estimate"])
+
+    def test_nested_kernels(self):
+        G = ADMG(['C', 'T', 'A', 'D', 'E', 'Y1', 'Y2'],
+                 [('C', 'T'), ('C', 'A'), ('T', 'Y1'), ('T', 'Y2'), ('A', 'Y1'), ('D', 'Y1'), ('A', 'Y2'),
+                  ('D', 'Y2'), ('E', 'Y2')],
+                 [('T', 'A'), ('A', 'D'), ('T', 'E')])
+        multi = MultiOutcomeEffect(G, 'T', ['Y1', 'Y2'])
+        first, second = multi.effects['Y1'], multi.effects['Y2']
+        self.assertEqual({'A', 'D'}, first.one_id.ystar & G.district('T'))
+        self.assertEqual({'A', 'D', 'E'}, second.one_id.ystar & G.district('T'))
+
+        # both outcomes have the district {A, D}, but order it differently and so factorize its kernel differently
+        first.n_order = ['C', 'T', 'A', 'D', 'E', 'Y1', 'Y2']
+        second.n_order = ['C', 'T', 'D', 'A', 'E', 'Y1', 'Y2']
+        district = {'A', 'D'}
+        self.assertIn(district, first._analyze_graph()["districts"])
+        self.assertIn(district, second._analyze_graph()["districts"])
+        self.assertIn(('A', 'A ~ C'), first._compile_kernel(district)["district"])
+        self.assertIn(('D', 'D ~ C'), second._compile_kernel(district)["district"])
+
+if __name__ == '__main__':
+    unittest.main()
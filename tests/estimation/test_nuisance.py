@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from ananke.graphs import ADMG
+from ananke.estimation import CausalEffect
+from ananke.estimation import nuisance
+from ananke.estimation.nuisance import NuisanceCache
+
+
+class TestNuisanceCache(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        Y = 1 + T + C + np.random.normal(0, 1, size)
+        self.data = pd.DataFrame({'C': C, 'T': T, 'Y': Y, 'Z': np.random.normal(0, 1, size)})
+        self.fits = []
+
+    def fit(self, data, formula, weights=None):
+        self.fits.append(formula)
+        return formula, data[formula.split(" ~ ")[0]].sum(), weights
+
+    def test_keys(self):
+        cache = NuisanceCache()
+        first = cache.fit(self.fit, self.data, "T ~ C")
+        self.assertIs(first, cache.fit(self.fit, self.data.copy(), "T ~ C"))
+        self.assertEqual({"hits": 1, "misses": 1, "evictions": 0}, cache.stats)
+
+        # columns not used by the formula do not matter, but changes to the used columns and weights do
+        self.data['Z'] = 0
+        cache.fit(self.fit, self.data, "T ~ C")
+        self.data['C'] = self.data['C'] + 1
+        cache.fit(self.fit, self.data, "T ~ C")
+        cache.fit(self.fit, self.data, "T ~ C", np.ones(len(self.data)))
+        cache.fit(self.fit, self.data, "T ~ C", 2 * np.ones(len(self.data)))
+        cache.fit(self.fit, self.data, "T ~ C", 2 * np.ones(len(self.data)))
+        self.assertEqual({"hits": 3, "misses": 4, "evictions": 0}, cache.stats)
+        self.assertEqual(4, len(self.fits))
+
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.stats["hits"])
+
+    def test_hashes_once(self):
+        cache = NuisanceCache()
+        weights = np.ones(len(self.data))
+        with mock.patch.object(nuisance, "column_token", wraps=nuisance.column_token) as token, \
+                mock.patch.object(nuisance, "weights_token", wraps=nuisance.weights_token) as weights_token:
+            for formula in ["T ~ C", "T ~ C", "Y ~ T + C"]:
+                cache.fit(self.fit, self.data, formula, weights)
+
+            # each column and the weights are hashed once, and only a replaced column is hashed again
+            self.assertEqual(3, token.call_count)
+            self.assertEqual(1, weights_token.call_count)
+            self.data['C'] = self.data['C'] + 1
+            cache.fit(self.fit, self.data, "T ~ C", weights)
+            self.assertEqual(4, token.call_count)
+        self.assertEqual({"hits": 1, "misses": 3, "evictions": 0}, cache.stats)
+
+    def test_eviction(self):
+        cache = NuisanceCache(maxsize=2)
+        for formula in ["T ~ C", "Y ~ C", "T ~ C", "Y ~ T + C", "Y ~ C"]:
+            cache.fit(self.fit, self.data, formula)
+        self.assertEqual({"hits": 1, "misses": 4, "evictions": 2}, cache.stats)
+
+        disabled = NuisanceCache(maxsize=0)
+        disabled.fit(self.fit, self.data, "T ~ C")
+        disabled.fit(self.fit, self.data, "T ~ C")
+        self.assertEqual(0, len(disabled))
+
+    def test_shared_across_estimators(self):
+        G = ADMG(['C', 'T', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'Y')])
+        ace = CausalEffect(G, 'T', 'Y')
+        ace.nuisance_cache.maxsize = 0
+        uncached = [ace.compute_effect(self.data, estimator) for estimator in ["ipw", "gformula", "aipw"]]
+
+        ace.nuisance_cache.maxsize = 64
+        cached = [ace.compute_effect(self.data, estimator) for estimator in ["ipw", "gformula", "aipw"]]
+
+        # aipw reuses the propensity score from ipw and the outcome regression from the g-formula
+        self.assertTrue(np.allclose(uncached, cached))
+        self.assertEqual({"hits": 2, "misses": 2, "evictions": 0}, ace.nuisance_cache.stats)
+
+        # bootstrap replicates fit in caches of their own, leaving the fits to the data in place
+        ace.nuisance_cache.maxsize = 2
+        cached = list(ace.nuisance_cache._models.values())
+        ace.compute_effect(self.data, "aipw", n_bootstraps=4, random_state=0, bootstrap="multinomial")
+        self.assertEqual(cached, list(ace.nuisance_cache._models.values()))
+        self.assertEqual(0, ace.nuisance_cache.stats["evictions"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from ananke.graphs import ADMG
+from ananke.estimation import CausalEffect
+from ananke.estimation.plan import EstimationPlan
+
+
+class TestEstimationPlan(unittest.TestCase):
+
+    def test_run(self):
+        plan = EstimationPlan()
+        plan.add("a", "fit", ("A",))
+        plan.add("b", "fit", ("B",))
+        plan.add("c", "estimate", ("C",), ["a", "b"])
+        self.assertEqual("a", plan.add("a", "fit", ("A",)))
+        self.assertEqual(3, len(plan))
+        self.assertEqual(["a", "b"], [step.name for step in plan.of_kind("fit")])
+        with self.assertRaises(ValueError):
+            plan.add("d", "estimate", (), ["e"])
+
+        lock = threading.Lock()
+        order, active = [], []
+
+        def execute(step, inputs):
+            with lock:
+                active.append(step.name)
+                order.append(step.name)
+            time.sleep(0.05)
+            with lock:
+                concurrent = len(active)
+                active.remove(step.name)
+            return concurrent
+
+        # the independent fits run concurrently and the estimate runs after both
+        results = plan.run(execute, n_jobs=2)
+        self.assertEqual("c", order[-1])
+        self.assertEqual(2, max(results["a"], results["b"]))
+        self.assertEqual(1, results["c"])
+
+        order.clear()
+        plan.run(execute)
+        self.assertEqual(["a", "b", "c"], order)
+
+    def test_fit_results(self):
+        np.random.seed(0)
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        Y = 1 + T + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'Y': Y})
+        G = ADMG(['C', 'T', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'Y')])
+        ace = CausalEffect(G, 'T', 'Y')
+        expected = [ace.compute_effect(data, estimator) for estimator in ["ipw", "gformula", "aipw"]]
+
+        fits = []
+
+        def model_binary(data, formula, weights=None):
+            fits.append(formula)
+            return ace._fit_binary_glm(data, formula, weights)
+
+        def model_continuous(data, formula, weights=None):
+            fits.append(formula)
+            return ace._fit_continuous_glm(data, formula, weights)
+
+        # the estimates use the models of the fit steps even if nothing is cached, so each is fit once
+        ace.nuisance_cache.maxsize = 0
+        table = ace.compute_effects(data, ["ipw", "gformula", "aipw"], model_binary, model_continuous)
+        self.assertTrue(np.allclose(expected, table["estimate"]))
+        self.assertEqual(2, len(fits))
+        self.assertEqual(sorted(set(fits)), sorted(fits))
+
+    def test_nested(self):
+        np.random.seed(0)
+        vertices = ['C', 'T', 'M', 'L', 'Y']
+        di_edges = [('C', 'T'), ('C', 'M'), ('C', 'L'), ('C', 'Y'), ('T', 'M'), ('M', 'L'), ('L', 'Y')]
+        bi_edges = [('T', 'L'), ('M', 'Y')]
+        G = ADMG(vertices, di_edges, bi_edges)
+
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        M = np.random.binomial(1, expit(T - C), size)
+        L = np.random.binomial(1, expit(M + C), size)
+        Y = 1 + L + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'L': L, 'Y': Y})
+
+        ace = CausalEffect(G, 'T', 'Y')
+        individual = [ace.compute_effect(data, estimator) for estimator in ["n-ipw", "anipw"]]
+
+        # the plan is compiled once, with kernel steps that the estimates depend on
+        ace.nuisance_cache.clear()
+        table = ace.compute_effects(data, ["n-ipw", "anipw"], n_jobs=2)
+        self.assertTrue(np.allclose(individual, table["estimate"]))
+        plan = ace._compile_plan(["n-ipw", "anipw"])
+        self.assertIs(plan, ace._compile_plan(["n-ipw", "anipw"]))
+        kernels = [step.name for step in plan.of_kind("kernel")]
+        self.assertTrue(len(kernels) > 0)
+        for step in plan.of_kind("estimate"):
+            self.assertTrue(set(kernels).issubset(step.dependencies))
+
+        # both estimates reuse the kernels fit by the plan, for the point estimates and every bootstrap replicate
+        with mock.patch.object(ace, "_fit_intrinsic_kernel", wraps=ace._fit_intrinsic_kernel) as fit_kernel:
+            table = ace.compute_effects(data, ["n-ipw", "anipw"], n_bootstraps=2, random_state=0,
+                                        bootstrap="multinomial")
+        self.assertEqual(3 * len(kernels), fit_kernel.call_count)
+        self.assertTrue(np.allclose(individual, table["estimate"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+
+from ananke.graphs import ADMG
+from ananke.estimation import CausalEffect
+from ananke.estimation.projection import ProjectionEngine
+
+
+class TestProjectionEngine(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        size = 500
+        A = np.random.normal(0, 1, size)
+        B = np.random.binomial(1, 0.4, size)
+        C = A + np.random.normal(0, 1, size)
+        self.data = pd.DataFrame({'A': A, 'B': B, 'C': C, 'D': 2 * A - B})
+        self.beta = 1 + A - 2 * B + C ** 2 + np.random.normal(0, 1, size)
+        self.weights = np.random.poisson(1, size).astype(float)
+
+    def fit(self, covariates, weights=None):
+        formula = "beta ~ " + "+".join(covariates) if covariates else "beta ~ 1"
+        data = self.data.assign(beta=self.beta)
+        model = sm.GLM.from_formula(formula, data=data, family=sm.families.Gaussian(), freq_weights=weights).fit()
+        return np.asarray(model.predict(data))
+
+    def test_matches_statsmodels(self):
+        for weights in [None, self.weights]:
+            engine = ProjectionEngine(self.data, ['A', 'B', 'C', 'D'], {'beta': self.beta}, weights)
+            self.assertTrue(np.allclose(self.fit(['A', 'B'], weights), engine.project('beta', ['A', 'B'])))
+            self.assertTrue(np.allclose(self.fit([], weights), engine.project('beta', [])))
+
+            # the bordered update for an additional covariate matches a direct fit
+            pred_S, pred_SV = engine.project('beta', ['A'], 'C')
+            self.assertTrue(np.allclose(self.fit(['A'], weights), pred_S))
+            self.assertTrue(np.allclose(self.fit(['A', 'C'], weights), pred_SV))
+
+    def test_collinear(self):
+        engine = ProjectionEngine(self.data, ['A', 'B', 'C', 'D'], {'beta': self.beta})
+
+        # D is a linear function of A and B, so adding it does not change the projection
+        pred_S, pred_SV = engine.project('beta', ['A', 'B'], 'D')
+        self.assertTrue(np.allclose(pred_S, pred_SV))
+        self.assertTrue(np.allclose(self.fit(['A', 'B', 'D']), engine.project('beta', ['A', 'B', 'D'])))
+
+    def test_custom_model(self):
+        np.random.seed(0)
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, 1 / (1 + np.exp(-C)), size)
+        M = np.random.normal(T, 1, size)
+        Y = 1 + M + C + np.random.normal(0, 1, size)
+        data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'Y': Y})
+        G = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')], [('T', 'Y')])
+        ace = CausalEffect(G, 'T', 'Y')
+
+        def model_continuous(data, formula, weights=None):
+            return sm.GLM.from_formula(formula, data=data, family=sm.families.Gaussian(),
+                                       freq_weights=weights).fit()
+
+        # projections through the engine agree with fitting each projection with the modeling strategy
+        for estimator in ["apipw", "eff-apipw"]:
+            self.assertAlmostEqual(ace.compute_effect(data, estimator),
+                                   ace.compute_effect(data, estimator, model_continuous=model_continuous))
+
+
+if __name__ == '__main__':
+    unittest.main()
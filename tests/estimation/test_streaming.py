@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from ananke.graphs import ADMG
+from ananke.estimation import CausalEffect
+from ananke.estimation.glm import fit_glm
+from ananke.estimation.streaming import StreamingGLM, chunk_reader, fit_streaming, stream_state_spaces
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        size = 2000
+        C = np.random.normal(0, 1, size)
+        D = np.random.binomial(1, 0.4, size)
+        T = np.random.binomial(1, expit(0.5 * C - D), size)
+        Y = 1 + T + C - D + np.random.normal(0, 1, size)
+        Yb = np.random.binomial(1, expit(T + C - D), size)
+        self.data = pd.DataFrame({'C': C, 'D': D, 'T': T, 'Y': Y, 'Yb': Yb})
+        self.chunks = [self.data.iloc[start:start + 300] for start in range(0, size, 300)]
+
+    def test_fit_streaming(self):
+        reader = chunk_reader(self.chunks)
+        models = [StreamingGLM('T', ['C', 'D'], "binomial"), StreamingGLM('Y', ['T', 'C', 'D'], "gaussian")]
+        fitted = fit_streaming(reader, models)
+        for model, formula, family in zip(fitted, ["T ~ C+D", "Y ~ T+C+D"], ["binomial", "gaussian"]):
+            expected = fit_glm(self.data, formula, family)
+            self.assertTrue(np.allclose(expected.params.values, model.params.values, atol=1e-8))
+
+        # the Gaussian GLM needs a single pass and the logistic regression one pass per iteration
+        self.assertEqual(1, models[1].n_passes)
+        self.assertTrue(models[0].n_passes > 1)
+        self.assertEqual({'C': 'continuous', 'D': 'binary', 'T': 'binary'},
+                         stream_state_spaces(reader, ['C', 'D', 'T']))
+
+    def test_compute_effect_streaming(self):
+        for outcome in ['Y', 'Yb']:
+            G = ADMG(['C', 'D', 'T', outcome], [('C', 'T'), ('D', 'T'), ('C', outcome), ('D', outcome),
+                                                ('T', outcome)])
+            ace = CausalEffect(G, 'T', outcome)
+            for estimator in ["ipw", "gformula", "aipw"]:
+                expected = ace.compute_effect(self.data, estimator)
+                self.assertAlmostEqual(expected, ace.compute_effect_streaming(self.chunks, estimator), places=6)
+                self.assertAlmostEqual(expected, ace.compute_effect_streaming(self.data, estimator, chunksize=500),
+                                       places=6)
+
+            # files are read in chunks, once per pass
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "data.csv")
+                self.data.to_csv(path, index=False)
+                self.assertAlmostEqual(ace.compute_effect(self.data, "aipw"),
+                                       ace.compute_effect_streaming(path, "aipw", chunksize=700), places=6)
+
+        # single use iterators cannot be read once per pass
+        with self.assertRaises(ValueError):
+            ace.compute_effect_streaming(iter(self.chunks), "aipw")
+        with self.assertRaises(ValueError):
+            ace.compute_effect_streaming(self.chunks, "eff-aipw")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from scipy.special import expit
+
+from ananke.graphs import ADMG
+from ananke.estimation import CausalEffect
+from ananke.estimation.workspace import Workspace
+
+
+class TestWorkspace(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        size = 500
+        C = np.random.normal(0, 1, size)
+        T = np.random.binomial(1, expit(0.5 * C), size)
+        M = np.random.binomial(1, expit(T - C), size)
+        Y = 1 + M + C + np.random.normal(0, 1, size)
+        self.data = pd.DataFrame({'C': C, 'T': T, 'M': M, 'Y': Y})
+
+    def test_columns(self):
+        workspace = Workspace(self.data)
+        self.assertTrue(np.shares_memory(workspace.frame['C'].values, self.data['C'].values))
+
+        # scratch columns are only added to the workspace
+        workspace.add('ones', np.ones(len(self.data)))
+        workspace.add('beta', np.zeros(len(self.data)))
+        self.assertIn('beta', workspace)
+        self.assertEqual(['ones', 'beta'], workspace.scratch)
+        self.assertEqual(['C', 'T', 'M', 'Y'], list(self.data.columns))
+
+    def test_does_not_modify_data(self):
+        G = ADMG(['C', 'T', 'M', 'Y'], [('C', 'T'), ('C', 'Y'), ('T', 'M'), ('M', 'Y')], [('T', 'Y')])
+        ace = CausalEffect(G, 'T', 'Y')
+        original = self.data.copy()
+
+        def model_continuous(data, formula, weights=None):
+            return sm.GLM.from_formula(formula, data=data, family=sm.families.Gaussian(),
+                                       freq_weights=weights).fit()
+
+        # neither the column of ones nor the pseudo-outcomes of the projections are added to the data
+        ace.compute_effect(self.data, "eff-apipw")
+        ace.compute_effect(self.data, "apipw", model_continuous=model_continuous)
+        pd.testing.assert_frame_equal(original, self.data)
+
+        # concurrent estimations with separate effects can share the data
+        def estimate(estimator):
+            return CausalEffect(G, 'T', 'Y').compute_effect(self.data, estimator)
+
+        expected = [ace.compute_effect(self.data, estimator) for estimator in ["p-ipw", "d-ipw", "apipw"] * 2]
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            estimates = list(executor.map(estimate, ["p-ipw", "d-ipw", "apipw"] * 2))
+        self.assertTrue(np.allclose(expected, estimates))
+        pd.testing.assert_frame_equal(original, self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from ananke.graphs import MissingADMG
+
+
+class TestMissingADMG(unittest.TestCase):
+
+    def test_variable_registry(self):
+        vertices = ['X_1', 'X_2', 'R_1', 'R_2', 'Xp_1', 'Xp_2', 'C']
+        di_edges = [('X_1', 'R_2'), ('C', 'X_1')]
+        G = MissingADMG(vertices, di_edges)
+
+        self.assertEqual(['X_1', 'X_2'], G.counterfactuals)
+        self.assertEqual(['R_1', 'R_2'], G.indicators)
+        self.assertEqual(['Xp_1', 'Xp_2'], G.proxies)
+        self.assertEqual('R_1', G.indicator_of('X_1'))
+        self.assertEqual('Xp_2', G.proxy_of('X_2'))
+        self.assertEqual('X_2', G.counterfactual_of('R_2'))
+        self.assertEqual(('X_1', 'R_1', 'Xp_1'), tuple(G.missing_variables['1']))
+
+        # proxies have the counterfactual and the indicator as parents
+        self.assertEqual({'X_1', 'R_1'}, G.parents(['Xp_1']))
+        self.assertEqual({'X_2', 'R_2'}, G.parents(['Xp_2']))
+        self.assertIn(('R_2', 'Xp_2'), G.di_edges)
+        self.assertIn(G.vertices['Xp_1'], G.vertices['R_1'].children)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import copy
+import tempfile
+import unittest
+
+from ananke.graphs import ADMG
+from ananke.identification import IdentificationCache, OneLineID, canonical_labeling
+
+
+def relabel(G, mapping):
+    return ADMG([mapping[v] for v in G.vertices],
+                [(mapping[u], mapping[v]) for u, v in G.di_edges],
+                [(mapping[u], mapping[v]) for u, v in G.bi_edges])
+
+
+def is_valid_fixing_order(G, order):
+    G = copy.deepcopy(G)
+    for v in order:
+        if len(G.descendants([v]).intersection(G.district(v))) != 1:
+            return False
+        G.fix([v])
+    return True
+
+
+class TestIdentificationCache(unittest.TestCase):
+
+    def setUp(self):
+        vertices = ['A', 'B', 'C', 'D', 'Y']
+        di_edges = [('A', 'B'), ('A', 'D'), ('B', 'C'), ('C', 'Y'), ('B', 'D'), ('D', 'Y')]
+        bi_edges = [('A', 'C'), ('B', 'Y'), ('B', 'D')]
+        self.G = ADMG(vertices, di_edges, bi_edges)
+        self.mapping = {'A': 'treat', 'B': 'x1', 'C': 'x2', 'D': 'x3', 'Y': 'out'}
+        self.H = relabel(self.G, self.mapping)
+
+    def test_canonical_labeling(self):
+        _, encoding_G = canonical_labeling(self.G)
+        _, encoding_H = canonical_labeling(self.H)
+        self.assertEqual(encoding_G, encoding_H)
+
+        # different roles for the same vertex lead to different forms
+        _, encoding_A = canonical_labeling(self.G, {v: v == 'A' for v in self.G.vertices})
+        _, encoding_B = canonical_labeling(self.G, {v: v == 'B' for v in self.G.vertices})
+        self.assertNotEqual(encoding_A, encoding_B)
+
+    def test_relabeled_hit(self):
+        cache = IdentificationCache()
+        result_G = cache.one_line_id(self.G, ['A'], ['Y'])
+        result_H = cache.one_line_id(self.H, ['treat'], ['out'])
+        self.assertEqual({"hits": 1, "disk_hits": 0, "misses": 1, "evictions": 0}, cache.stats)
+
+        self.assertTrue(result_H.identified)
+        self.assertEqual(OneLineID(self.G, ['A'], ['Y']).id(), result_G.identified)
+        self.assertEqual({frozenset(self.mapping[v] for v in d) for d in result_G.fixing_orders},
+                         set(result_H.fixing_orders))
+        for district, order in result_H.fixing_orders.items():
+            self.assertEqual(set(self.H.vertices) - district, set(order))
+            self.assertTrue(is_valid_fixing_order(self.H, order))
+
+        # a different query on the same graph is a miss
+        self.assertFalse(cache.one_line_id(self.H, ['treat', 'x1'], ['out']).identified)
+        self.assertEqual(2, cache.stats["misses"])
+
+    def test_lru_and_persistent_tier(self):
+        with tempfile.TemporaryDirectory() as path:
+            cache = IdentificationCache(maxsize=1, path=path)
+            cache.one_line_id(self.G, ['A'], ['Y'])
+            cache.one_line_id(self.G, ['B'], ['Y'])
+            self.assertEqual(1, cache.stats["evictions"])
+
+            # a second cache (e.g. in another worker process) shares the files
+            other = IdentificationCache(path=path)
+            result = other.one_line_id(self.H, ['treat'], ['out'])
+            self.assertEqual(1, other.stats["disk_hits"])
+            self.assertTrue(result.identified)
+
+    def test_gid(self):
+        vertices = ["X_1", "X_2", "W", "Y"]
+        di_edges = [("X_1", "W"), ("W", "Y"), ("X_2", "Y")]
+        bi_edges = [("X_1", "W"), ("X_2", "Y"), ("X_1", "X_2")]
+        G = ADMG(vertices, di_edges, bi_edges)
+        mapping = {"X_1": "a", "X_2": "b", "W": "c", "Y": "d"}
+        H = relabel(G, mapping)
+
+        cache = IdentificationCache()
+        self.assertFalse(cache.one_line_gid(G, ["X_1", "X_2"], ["Y"]).identified)
+        result_G = cache.one_line_gid(G, ["X_1", "X_2"], ["Y"], [{"X_1"}, {"X_2"}])
+        result_H = cache.one_line_gid(H, ["a", "b"], ["d"], [{"b"}, {"a"}])
+        self.assertTrue(result_H.identified)
+        self.assertEqual(1, cache.stats["hits"])
+
+        # experiment indices refer to the caller's list of experiments
+        self.assertEqual({frozenset({"c"}): 1, frozenset({"d"}): 0}, result_H.sources)
+        self.assertEqual({frozenset({"W"}): 0, frozenset({"Y"}): 1}, result_G.sources)
+
+
+if __name__ == '__main__':
+    unittest.main()
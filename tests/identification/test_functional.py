@@ -0,0 +1,117 @@
+import copy
+import unittest
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from ananke.graphs import ADMG
+from ananke.identification import OneLineID, OneLineGID
+from ananke.identification import Distribution, Fix, Functional, FunctionalEvaluator, Kernel, fixing_chain
+
+
+class TestFunctional(unittest.TestCase):
+
+    def test_front_door(self):
+        np.random.seed(0)
+        size = 5000
+        U = np.random.binomial(1, 0.5, size)
+        A = np.random.binomial(1, expit(-0.5 + U), size)
+        M = np.random.binomial(1, expit(-1 + 2 * A), size)
+        Y = np.random.binomial(1, expit(-1 + 1.5 * M + U), size)
+        data = pd.DataFrame({"A": A, "M": M, "Y": Y})
+
+        G = ADMG(["A", "M", "Y"], [("A", "M"), ("M", "Y")], [("A", "Y")])
+        functional = OneLineID(G, ["A"], ["Y"]).functional_expression()
+        self.assertEqual(["M"], functional.summed)
+        self.assertEqual({frozenset({"M"}), frozenset({"Y"})}, {k.district for k in functional.kernels})
+
+        # compare against the front-door formula computed by hand
+        p_a = data["A"].value_counts(normalize=True)
+        p_m = data.groupby("A")["M"].mean()
+        p_y = data.groupby(["A", "M"])["Y"].mean()
+        truth = sum((p_m[1] if m else 1 - p_m[1]) * sum(p_a[a] * p_y[(a, m)] for a in [0, 1]) for m in [0, 1])
+
+        p_Y1 = functional.compile().evaluate(data, {"A": 1})
+        self.assertAlmostEqual(truth, p_Y1[1])
+        self.assertAlmostEqual(1, p_Y1.sum())
+
+    def test_backdoor(self):
+        np.random.seed(0)
+        size = 5000
+        C = np.random.randint(0, 3, size)
+        A = np.random.binomial(1, expit(-0.5 + 0.5 * C), size)
+        Y = np.random.binomial(1, expit(-1 + A + 0.5 * C), size)
+        data = pd.DataFrame({"C": C, "A": A, "Y": Y})
+
+        G = ADMG(["C", "A", "Y"], [("C", "A"), ("C", "Y"), ("A", "Y")])
+        evaluator = OneLineID(G, ["A"], ["Y"]).functional_expression().compile()
+
+        p_c = data["C"].value_counts(normalize=True)
+        p_y = data.groupby(["A", "C"])["Y"].mean()
+        for a in [0, 1]:
+            truth = sum(p_c[c] * p_y[(a, c)] for c in range(3))
+            self.assertAlmostEqual(truth, evaluator.evaluate(data, {"A": a})[1])
+
+    def test_irrelevant_descendants(self):
+        np.random.seed(0)
+        size = 5000
+        C = np.random.randint(0, 3, size)
+        A = np.random.binomial(1, expit(-0.5 + 0.5 * C), size)
+        Y = np.random.binomial(1, expit(-1 + A + 0.5 * C), size)
+        D1 = (Y + np.random.randint(0, 20, size)) % 20
+        D2 = (D1 + np.random.randint(0, 20, size)) % 20
+        data = pd.DataFrame({"C": C, "A": A, "Y": Y, "D1": D1, "D2": D2})
+
+        # descendants of the outcome are not ancestors of Y*, so they are summed out before any fixing
+        G = ADMG(["C", "A", "Y", "D1", "D2"], [("C", "A"), ("C", "Y"), ("A", "Y"), ("Y", "D1"), ("D1", "D2")],
+                 [("A", "D2")])
+        evaluator = OneLineID(G, ["A"], ["Y"]).functional_expression().compile()
+        self.assertEqual(["A", "C", "Y"], evaluator.variables)
+
+        G_small = ADMG(["C", "A", "Y"], [("C", "A"), ("C", "Y"), ("A", "Y")])
+        expected = OneLineID(G_small, ["A"], ["Y"]).functional_expression().compile().evaluate(data, {"A": 1})
+        self.assertTrue(np.allclose(expected, evaluator.evaluate(data, {"A": 1})))
+
+    def test_shared_kernels(self):
+        G = ADMG(["A", "B", "C"], [("A", "B"), ("A", "C")])
+        first, _ = fixing_chain(copy.deepcopy(G), ["B", "A"], Distribution(G.vertices))
+        second, _ = fixing_chain(copy.deepcopy(G), ["B", "C"], Distribution(G.vertices))
+        functional = Functional(["A"], ["C"], [], [Kernel({"C"}, {"A"}, first), Kernel({"A"}, set(), second)])
+        evaluator = FunctionalEvaluator(functional)
+
+        # the common prefix Φ_B p(V) is computed only once
+        fixes = [node for node in evaluator.steps if isinstance(node, Fix)]
+        self.assertEqual(3, len(fixes))
+        self.assertEqual(1, len([node for node in evaluator.steps if isinstance(node, Distribution)]))
+
+    def test_gid_experiments(self):
+        np.random.seed(0)
+        size = 20000
+        vertices = ["X_1", "X_2", "W", "Y"]
+        di_edges = [("X_1", "W"), ("W", "Y"), ("X_2", "Y")]
+        bi_edges = [("X_1", "W"), ("X_2", "Y"), ("X_1", "X_2")]
+        G = ADMG(vertices, di_edges, bi_edges)
+
+        def simulate(x1=None, x2=None):
+            U1 = np.random.binomial(1, 0.5, size)
+            U2 = np.random.binomial(1, 0.5, size)
+            U3 = np.random.binomial(1, 0.5, size)
+            X_1 = np.random.binomial(1, expit(-0.5 + U1 + U2), size) if x1 is None else np.full(size, x1)
+            X_2 = np.random.binomial(1, expit(0.5 - U2 + U3), size) if x2 is None else np.full(size, x2)
+            W = np.random.binomial(1, expit(-1 + 2 * X_1 - U1), size)
+            Y = np.random.binomial(1, expit(-1 + W + X_2 - U3), size)
+            return pd.DataFrame({"X_1": X_1, "X_2": X_2, "W": W, "Y": Y})
+
+        experiments = {frozenset({"X_1"}): pd.concat([simulate(x1=0), simulate(x1=1)], ignore_index=True),
+                       frozenset({"X_2"}): pd.concat([simulate(x2=0), simulate(x2=1)], ignore_index=True)}
+
+        gid = OneLineGID(G, ["X_1", "X_2"], ["Y"])
+        estimate = gid.functional_expression([{"X_1"}, {"X_2"}]).compile().evaluate(experiments,
+                                                                                     {"X_1": 1, "X_2": 0})
+        truth = simulate(x1=1, x2=0)["Y"].mean()
+        self.assertTrue(abs(estimate[1] - truth) < 0.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,6 +27,21 @@ class TestMissingID(unittest.TestCase):
         full_id = MissingFullID(mdag)
         self.assertFalse(full_id.id())
 
+    def test_colluding_paths(self):
+
+        vertices = ['X_1', 'X_2', 'X_3', 'R_1', 'R_2', 'R_3']
+        di_edges = [('X_1', 'R_2'), ('X_2', 'R_3'), ('X_3', 'R_1')]
+        bi_edges = [('R_1', 'R_2'), ('R_2', 'R_3')]
+        mdag = ADMG(vertices, di_edges, bi_edges)
+        full_id = MissingFullID(mdag)
+        self.assertEqual([('R_1', 'X_1'), ('R_2', 'X_2'), ('R_3', 'X_3')], full_id.colluding_paths())
+        self.assertFalse(full_id.id())
+
+        # the blankets computed from the district index agree with the graph
+        full_id._build_index()
+        for v in vertices:
+            self.assertEqual(mdag.markov_blanket([v]), full_id._markov_blanket({v}))
+
     def test_full_id_chain(self):
 
         vertices = ['X_1', 'X_2', 'X_3', 'R_1', 'R_2', 'R_3']
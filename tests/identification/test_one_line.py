@@ -1,3 +1,6 @@
+import copy
+import os
+import tempfile
 import unittest
 from ananke.identification import OneLineID
 from ananke.graphs import ADMG
@@ -18,7 +21,40 @@ class TestOneLine(unittest.TestCase):
         one_id.draw_swig()
         self.assertTrue(one_id.id())
         self.assertEqual({'Y', 'C', 'D', 'B'}, one_id.ystar)
-        one_id.export_intermediates()
+        with tempfile.TemporaryDirectory() as folder:
+            one_id.export_intermediates(folder)
+
+    def test_iter_intermediates(self):
+        vertices = ['A', 'B', 'C', 'D', 'Y']
+        di_edges = [('A', 'B'), ('A', 'D'), ('B', 'C'), ('C', 'Y'), ('B', 'D'), ('D', 'Y')]
+        bi_edges = [('A', 'C'), ('B', 'Y'), ('B', 'D')]
+        G = ADMG(vertices, di_edges, bi_edges)
+        one_id = OneLineID(G, ['A'], ['Y'])
+        self.assertTrue(one_id.id())
+
+        # every intermediate matches the CADMG obtained by fixing a fresh copy of the graph
+        n_steps = 0
+        for district, fixed, cadmg in one_id.iter_intermediates():
+            self.assertEqual(one_id.fixing_orders[district][:len(fixed)], fixed)
+            expected = copy.deepcopy(G)
+            expected.fix(fixed)
+            self.assertEqual(expected.di_edges, cadmg.di_edges)
+            self.assertEqual(expected.bi_edges, cadmg.bi_edges)
+            self.assertEqual(set(expected.fixed), set(cadmg.fixed))
+            n_steps += 1
+        self.assertEqual(sum(len(order) for order in one_id.fixing_orders.values()), n_steps)
+
+    def test_export_intermediates_source(self):
+        vertices = ["M", "A", "Y"]
+        di_edges = [("A", "M"), ("M", "Y")]
+        bi_edges = [("A", "Y")]
+        G = ADMG(vertices, di_edges, bi_edges)
+        one_id = OneLineID(G, ['A'], ['Y'])
+        one_id.id()
+        with tempfile.TemporaryDirectory() as folder:
+            paths = one_id.export_intermediates(folder, render=False)
+            self.assertEqual(4, len(paths))
+            self.assertEqual(sorted(os.path.basename(p) for p in paths), sorted(os.listdir(folder)))
 
     def test_BMAY_graph(self):
         vertices = ["B", "M", "A", "Y"]
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 
 from ananke.graphs import ADMG
@@ -95,6 +97,22 @@ class TestLinearGaussianSEM(unittest.TestCase):
 
         model.neg_loglikelihood(data)
 
+        # the data matrix is centred and ordered by vertex
+        matrix = data[list(G.vertices)].to_numpy()
+        self.assertTrue(np.allclose(matrix - matrix.mean(axis=0), model.X_))
+        self.assertTrue(np.allclose(np.cov(model.X_.T), model.S_))
+
+        # the data can be viewed from an array or memory-mapped file instead of a data frame
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.npy")
+            np.save(path, data[["D", "C", "B", "A"]].to_numpy())
+            mapped = LinearGaussianSEM(G, method="trust-exact").fit(path, columns=["D", "C", "B", "A"])
+            self.assertTrue(np.allclose(model.B_, mapped.B_, atol=1e-3))
+            self.assertTrue(np.allclose(model.omega_, mapped.omega_, atol=1e-3))
+            self.assertAlmostEqual(model.neg_loglikelihood(data),
+                                   model.neg_loglikelihood(data.to_numpy(), columns=list(data.columns)))
+            del mapped
+
         # computation of causal effects
         self.assertEqual(0, model.total_effect(["D"], ["A"]))
         self.assertAlmostEqual(-7.5, model.total_effect(["A"], ["D"]), delta=0.5)
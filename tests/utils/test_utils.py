@@ -1,6 +1,10 @@
+import os
+import tempfile
 import unittest
+import numpy as np
+import pandas as pd
 
-from ananke.utils import powerset
+from ananke.utils import as_columnar, map_columnar, mapped_file, powerset
 
 
 class TestUtils(unittest.TestCase):
@@ -10,6 +14,40 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(list(powerset([1, 2, 3])),
                          [(), (1, ), (2, ), (3, ), (1, 2), (1, 3), (2, 3), (1, 2, 3)])
 
+    def test_as_columnar(self):
+
+        values = np.arange(12, dtype=float).reshape(4, 3)
+        data = as_columnar(values, ['A', 'B', 'C'])
+        self.assertEqual(['A', 'B', 'C'], list(data.columns))
+        self.assertTrue(np.shares_memory(values, data['B'].values))
+        self.assertEqual(['X', 'B', 'C'], list(as_columnar(data, {'A': 'X'}).columns))
+        self.assertIs(data, as_columnar(data))
+
+        with self.assertRaises(ValueError):
+            as_columnar(values, ['A', 'B'])
+        with self.assertRaises(ValueError):
+            as_columnar(values)
+        with self.assertRaises(ValueError):
+            as_columnar([1, 2, 3])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.npy")
+            np.save(path, values)
+
+            # .npy files are mapped read-only, and the file is recorded so it can be mapped again
+            data = as_columnar(path, default_columns=['A', 'B', 'C'])
+            pd.testing.assert_frame_equal(data, map_columnar(mapped_file(data)))
+            with self.assertRaises(ValueError):
+                data['A'].values[0] = 1
+
+            # data no longer viewing the whole file is not mapped again
+            self.assertIsNone(mapped_file(data.iloc[:2]))
+            self.assertIsNone(mapped_file(data.assign(A=0.0)))
+            extended = data.copy(deep=False)
+            extended['ones'] = 1.0
+            self.assertIsNotNone(mapped_file(extended))
+            del data, extended
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file